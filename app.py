@@ -1,14 +1,34 @@
-from flask import Flask, render_template, request, jsonify
+from startup import startup_timer
+
+with startup_timer.step("import flask"):
+    from flask import Flask, Response, g, render_template, request, jsonify, send_file, stream_with_context
 import os
 import asyncio
-import aiohttp
+import contextvars
 import json
+import logging
+import mimetypes
 from datetime import datetime, timedelta
 import random
-from openai import OpenAI
-from models.recommendation_model import ProductRecommendationModel
 import threading
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+with startup_timer.step("import recommendation model"):
+    from models.recommendation_model import ProductRecommendationModel
+from shadow import load_shadow_evaluator
+from forecast_cache import ForecastCache
+from llm_cache import forecast_fingerprint, recommendation_key, load_recommendation_cache
+from weather_scoring import recommend_installation_day
+from singleflight import AsyncSingleFlight, SingleFlight
+import metrics
+import structured_logging
+from door_images import COLORS, SLAT_COUNTS, DoorImageCache, parse_variant
+from order_store import OrderStore
+from assets import AssetManifest, CACHE_MAX_AGE, DOOR_IMAGE_SIZES
+import upstream
+
+# openai, aiohttp and requests are imported on first use so workers boot quickly
 
 # Load environment variables from .env file if it exists
 def load_env_file():
@@ -23,161 +43,402 @@ def load_env_file():
                     value = value.strip('"\'')
                     os.environ[key] = value
 
-load_env_file()
+with startup_timer.step("load .env"):
+    load_env_file()
+
+# Request-path logging goes through a queue to a background writer thread
+structured_logging.setup_logging()
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-# Initialize OpenAI client
+# OpenAI client is created lazily on first use
 openai_key = os.getenv('OPENAI_API_KEY')
 if not openai_key:
-    print("Warning: OPENAI_API_KEY not found. Weather recommendations will not work.")
-    client = None
-else:
-    client = OpenAI(api_key=openai_key)
+    print("Warning: OPENAI_API_KEY not found. Installation recommendations will use the local weather rules.")
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    """Return the shared OpenAI client, importing the SDK on first use"""
+    global _openai_client
+    if not openai_key:
+        return None
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=openai_key)
+    return _openai_client
+
+# The ASGI app (asgi.py) awaits OpenAI through an AsyncOpenAI client bound to its event loop
+_async_openai_client = None
+_async_openai_client_key = None
+
+def get_async_openai_client():
+    """Return this process's AsyncOpenAI client for the running event loop, importing the SDK on first use"""
+    global _async_openai_client, _async_openai_client_key
+    if not openai_key:
+        return None
+    key = (os.getpid(), asyncio.get_running_loop())
+    if _async_openai_client is None or _async_openai_client_key != key:
+        from openai import AsyncOpenAI
+        _async_openai_client = AsyncOpenAI(api_key=openai_key)
+        _async_openai_client_key = key
+    return _async_openai_client
 
-# Initialize ML model with error handling
+async def close_async_clients():
+    """Close the event loop's upstream connections (ASGI lifespan shutdown)"""
+    global _async_openai_client
+    if _async_openai_client is not None:
+        await _async_openai_client.close()
+        _async_openai_client = None
+    await upstream.close_async_session()
+
+# Initialize ML model with error handling. The serving process never trains:
+# artifacts come from `python initialize_app.py`. Under gunicorn --preload this
+# runs once in the master and the forked workers share the loaded arrays.
 try:
-    recommendation_model = ProductRecommendationModel()
+    with startup_timer.step("load recommendation model"):
+        recommendation_model = ProductRecommendationModel(train_if_missing=False)
     print("✓ ML model loaded successfully")
 except Exception as e:
     print(f"⚠️ ML model failed to load: {e}")
     print("⚠️ Using fallback recommendations")
     recommendation_model = None
 
+# Optional shadow scoring of candidate models against live traffic
+with startup_timer.step("load shadow candidates"):
+    shadow_evaluator = load_shadow_evaluator()
+
 # Independence, Ohio coordinates
 INDEPENDENCE_LAT = 41.382
 INDEPENDENCE_LON = -81.641
 
+NWS_HEADERS = {'User-Agent': 'GarageDoorApp/1.0'}
+
+# National Weather Service API root; point it at a stand-in server for load tests
+NWS_BASE_URL = os.getenv('NWS_BASE_URL', 'https://api.weather.gov').rstrip('/')
+
+# NWS responses are cached in SQLite so every worker shares one copy of the forecast
+if os.getenv('FORECAST_CACHE_ENABLED', '1') != '0':
+    with startup_timer.step("open forecast cache"):
+        forecast_cache = ForecastCache(os.getenv('FORECAST_CACHE_PATH', 'data/forecast_cache.sqlite3'))
+else:
+    forecast_cache = None
+
+# Rendered door previews: in-memory LRU over a disk cache, warmed with the stock images
+DOOR_IMAGE_CACHE_BYTES = int(os.getenv('DOOR_IMAGE_CACHE_MB', '16')) * 1024 * 1024
+DOOR_IMAGE_DISK_CACHE_BYTES = int(os.getenv('DOOR_IMAGE_DISK_CACHE_MB', '64')) * 1024 * 1024
+door_image_cache = DoorImageCache(os.getenv('DOOR_IMAGE_CACHE_DIR', 'data/door_cache'),
+                                  max_bytes=DOOR_IMAGE_CACHE_BYTES, max_disk_bytes=DOOR_IMAGE_DISK_CACHE_BYTES)
+with startup_timer.step("warm door images"):
+    door_image_cache.warm()
+
+# Fingerprinted, precompressed static assets from `python assets.py`
+with startup_timer.step("load asset manifest"):
+    asset_manifest = AssetManifest.load(os.getenv('ASSET_BUILD_DIR', 'static/build'))
+app.jinja_env.globals.update(asset_url=asset_manifest.url, asset_srcset=asset_manifest.srcset)
+
+# Orders are committed durably to SQLite, batched across concurrent submissions
+with startup_timer.step("open order store"):
+    order_store = OrderStore(os.getenv('ORDER_DB_PATH', 'data/orders.sqlite3'))
+
+# Recommended products stored with an order, and the fields kept for each
+MAX_ORDER_RECOMMENDATIONS = 20
+ORDER_PRODUCT_FIELDS = ('key', 'name', 'price', 'description')
+
+# Orders feed incremental model updates every INCREMENTAL_TRAINING_INTERVAL seconds; off (0) unless set
+INCREMENTAL_TRAINING_INTERVAL = float(os.getenv('INCREMENTAL_TRAINING_INTERVAL', '0'))
+incremental_scheduler = None
+if recommendation_model and INCREMENTAL_TRAINING_INTERVAL > 0:
+    from models import incremental
+    if incremental.AVAILABLE:
+        incremental_scheduler = incremental.IncrementalScheduler(INCREMENTAL_TRAINING_INTERVAL, order_store)
+    else:
+        log.warning("Incremental training is off: it needs fcntl file locks, which this platform lacks")
+
+# Maximum number of configurations accepted by /configure/batch in one request
+MAX_BATCH_SIZE = 500
+
+# Installation recommendations memoized by forecast and delivery dates
+llm_cache = load_recommendation_cache()
+
+# Concurrent identical upstream calls share one request: uncached NWS fetches by URL,
+# OpenAI completions by forecast and delivery dates
+upstream_flight = SingleFlight()
+llm_flight = SingleFlight()
+
+# The same coalescing for the ASGI app's coroutines
+async_upstream_flight = AsyncSingleFlight()
+async_llm_flight = AsyncSingleFlight()
+
+# Threads used to run the independent stages of /configure concurrently
+PIPELINE_THREADS = int(os.getenv('PIPELINE_THREADS', '8'))
+_pipeline_executor = None
+_pipeline_executor_pid = None
+_pipeline_executor_lock = threading.Lock()
+
+def get_pipeline_executor():
+    """Return this process's stage executor, created on first use (threads don't survive a fork)"""
+    global _pipeline_executor, _pipeline_executor_pid
+    if _pipeline_executor is None or _pipeline_executor_pid != os.getpid():
+        with _pipeline_executor_lock:
+            if _pipeline_executor is None or _pipeline_executor_pid != os.getpid():
+                _pipeline_executor = ThreadPoolExecutor(max_workers=PIPELINE_THREADS, thread_name_prefix='configure')
+                _pipeline_executor_pid = os.getpid()
+    return _pipeline_executor
+
+def timed_stage(name, func, *args):
+    """Run one pipeline stage, recording its duration for Server-Timing and /metrics"""
+    with metrics.stage(name):
+        return func(*args)
+
+def submit_stage(name, func, *args):
+    """Run a timed stage on the stage executor in a copy of the request's context"""
+    context = contextvars.copy_context()
+    return get_pipeline_executor().submit(context.run, timed_stage, name, func, *args)
+
+# Products the rule-based fallback recommends from
+FALLBACK_PRODUCTS = {
+    'garage_door_opener': {
+        'name': 'Smart Garage Door Opener',
+        'price': 299.99,
+        'description': 'WiFi-enabled opener with smartphone app control'
+    },
+    'remote_control': {
+        'name': 'Universal Remote Control (2-pack)',
+        'price': 49.99,
+        'description': 'Compatible remote controls with rolling code technology'
+    },
+    'safety_sensors': {
+        'name': 'Photoelectric Safety Sensors',
+        'price': 79.99,
+        'description': 'Infrared safety beam sensors for enhanced protection'
+    },
+    'weather_stripping': {
+        'name': 'Premium Weather Seal Kit',
+        'price': 34.99,
+        'description': 'Complete weather stripping kit for energy efficiency'
+    }
+}
+
 def get_fallback_recommendations(color, slate_width, windows):
     """Fallback recommendations when ML model fails"""
-    products = {
-        'garage_door_opener': {
-            'name': 'Smart Garage Door Opener',
-            'price': 299.99,
-            'description': 'WiFi-enabled opener with smartphone app control'
-        },
-        'remote_control': {
-            'name': 'Universal Remote Control (2-pack)',
-            'price': 49.99,
-            'description': 'Compatible remote controls with rolling code technology'
-        },
-        'safety_sensors': {
-            'name': 'Photoelectric Safety Sensors',
-            'price': 79.99,
-            'description': 'Infrared safety beam sensors for enhanced protection'
-        },
-        'weather_stripping': {
-            'name': 'Premium Weather Seal Kit',
-            'price': 34.99,
-            'description': 'Complete weather stripping kit for energy efficiency'
+    # Basic rule-based recommendations: always these basics
+    keys = ['garage_door_opener', 'remote_control', 'safety_sensors']
+    
+    # Add weather stripping for wide doors or white doors (premium choice)
+    if slate_width == 'wide' or color == 'white':
+        keys.append('weather_stripping')
+    
+    # Each product carries its key, like model recommendations, so it can be ordered
+    return [dict(FALLBACK_PRODUCTS[key], key=key) for key in keys]
+
+def order_product_keys():
+    """Keys of the products an order may include: the model's catalog and the fallback products"""
+    if recommendation_model:
+        return recommendation_model.products.keys() | FALLBACK_PRODUCTS.keys()
+    return FALLBACK_PRODUCTS.keys()
+
+def get_recommendations(color, slate_width, windows):
+    """Get ML recommendations for a configuration, falling back to rules if the model is unavailable"""
+    if recommendation_model:
+        try:
+            with metrics.stage('model_inference'):
+                recommendations = recommendation_model.predict(color, slate_width, windows)
+            if shadow_evaluator:
+                shadow_evaluator.submit(
+                    {'color': color, 'slate_width': slate_width, 'windows': windows},
+                    recommendations
+                )
+            return recommendations
+        except Exception as e:
+            log.warning("ML model error: %s, using fallback", e)
+    metrics.FALLBACKS.labels('recommendations').inc()
+    with metrics.stage('fallback'):
+        return get_fallback_recommendations(color, slate_width, windows)
+
+def compute_delivery():
+    """Pick a delivery date (1-6 days out) and the two following installation days"""
+    delivery_days = random.randint(1, 6)
+    today = datetime.now()
+    delivery_date = today + timedelta(days=delivery_days)
+    delivery_plus_1 = delivery_date + timedelta(days=1)
+    delivery_plus_2 = delivery_date + timedelta(days=2)
+    
+    log.debug("Delivery in %d days: %s (options %s, %s)", delivery_days, delivery_date.date(),
+              delivery_plus_1.date(), delivery_plus_2.date())
+    
+    return {
+        'delivery_days': delivery_days,
+        'delivery_date': delivery_date,
+        'delivery_plus_1': delivery_plus_1,
+        'delivery_plus_2': delivery_plus_2
+    }
+
+def format_delivery(delivery):
+    """Return the delivery fields of the /configure response"""
+    return {
+        'delivery_date': delivery['delivery_date'].strftime('%B %d'),
+        'delivery_days': delivery['delivery_days'],
+        'delivery_options': {
+            'option1': delivery['delivery_date'].strftime('%A, %B %d'),
+            'option2': delivery['delivery_plus_1'].strftime('%A, %B %d'),
+            'option3': delivery['delivery_plus_2'].strftime('%A, %B %d')
         }
     }
+
+def fetch_nws_json(url, timeout=upstream.DEFAULT_TIMEOUT):
+    """GET a National Weather Service URL as JSON, through the shared cache when enabled"""
+    if forecast_cache:
+        return forecast_cache.get_json(url, headers=NWS_HEADERS, timeout=timeout)
     
-    # Basic rule-based recommendations
-    recommendations = []
+    def fetch():
+        response = upstream.get(url, headers=NWS_HEADERS, timeout=timeout)
+        if response.status_code == 200:
+            return response.json()
+        log.warning("Weather API returned status %d for %s", response.status_code, url)
+        return None
     
-    # Always recommend these basics
-    recommendations.append(products['garage_door_opener'])
-    recommendations.append(products['remote_control'])
-    recommendations.append(products['safety_sensors'])
+    return upstream_flight.do(url, fetch)
+
+async def fetch_nws_json_async(url, timeout=upstream.DEFAULT_TIMEOUT):
+    """fetch_nws_json() for the ASGI app, awaiting the upstream call"""
+    if forecast_cache:
+        return await forecast_cache.get_json_async(url, headers=NWS_HEADERS, timeout=timeout)
     
-    # Add weather stripping for wide doors or white doors (premium choice)
-    if slate_width == 'wide' or color == 'white':
-        recommendations.append(products['weather_stripping'])
+    async def fetch():
+        response = await upstream.get_async(url, headers=NWS_HEADERS, timeout=timeout)
+        if response.status_code == 200:
+            return json.loads(response.text)
+        log.warning("Weather API returned status %d for %s", response.status_code, url)
+        return None
     
-    return recommendations
+    return await async_upstream_flight.do(url, fetch)
 
 def get_weather_grid_info():
     """Get the grid information for Independence, Ohio from NWS"""
     try:
-        import requests
-        url = f"https://api.weather.gov/points/{INDEPENDENCE_LAT},{INDEPENDENCE_LON}"
-        response = requests.get(url, headers={'User-Agent': 'GarageDoorApp/1.0'})
-        if response.status_code == 200:
-            data = response.json()
+        url = f"{NWS_BASE_URL}/points/{INDEPENDENCE_LAT},{INDEPENDENCE_LON}"
+        with metrics.stage('grid_lookup'):
+            data = fetch_nws_json(url)
+        if data:
             return {
                 'gridId': data['properties']['gridId'],
                 'gridX': data['properties']['gridX'],
                 'gridY': data['properties']['gridY']
             }
     except Exception as e:
-        print(f"Error getting grid info: {e}")
+        log.warning("Error getting grid info: %s", e)
+    return None
+
+async def get_weather_grid_info_async():
+    """get_weather_grid_info() for the ASGI app"""
+    try:
+        url = f"{NWS_BASE_URL}/points/{INDEPENDENCE_LAT},{INDEPENDENCE_LON}"
+        with metrics.stage('grid_lookup'):
+            data = await fetch_nws_json_async(url)
+        if data:
+            return {
+                'gridId': data['properties']['gridId'],
+                'gridX': data['properties']['gridX'],
+                'gridY': data['properties']['gridY']
+            }
+    except Exception as e:
+        log.warning("Error getting grid info: %s", e)
     return None
 
 def fetch_weather_forecast_sync():
     """Fetch weather forecast from National Weather Service (synchronous)"""
     try:
-        import requests
-        
         grid_info = get_weather_grid_info()
         if not grid_info:
-            print("Failed to get grid info for Independence, Ohio")
+            log.warning("Failed to get grid info for Independence, Ohio")
             return None
             
-        url = f"https://api.weather.gov/gridpoints/{grid_info['gridId']}/{grid_info['gridX']},{grid_info['gridY']}/forecast"
-        print(f"Fetching weather from: {url}")
+        url = f"{NWS_BASE_URL}/gridpoints/{grid_info['gridId']}/{grid_info['gridX']},{grid_info['gridY']}/forecast"
+        log.debug("Fetching weather from %s", url)
         
-        headers = {'User-Agent': 'GarageDoorApp/1.0'}
-        response = requests.get(url, headers=headers, timeout=15)
-        
-        if response.status_code == 200:
-            data = response.json()
-            periods = data['properties']['periods'][:6]  # Get next 6 periods
-            print(f"Successfully fetched {len(periods)} weather periods")
+        with metrics.stage('forecast_fetch'):
+            data = fetch_nws_json(url)
+        if data:
+            periods = data['properties']['periods']
+            log.debug("Fetched %d weather periods", len(periods))
             return periods
-        else:
-            print(f"Weather API returned status: {response.status_code}")
             
     except Exception as e:
-        print(f"Error fetching weather: {e}")
+        log.warning("Error fetching weather: %s", e)
     return None
 
 async def fetch_weather_forecast():
-    """Fetch weather forecast from National Weather Service"""
+    """Fetch weather forecast from National Weather Service (awaited, for the ASGI app)
+    
+    Same cache, single-flight and retries as fetch_weather_forecast_sync(), on the
+    aiohttp session, so waiting on the NWS holds no thread.
+    """
     try:
-        grid_info = get_weather_grid_info()
+        grid_info = await get_weather_grid_info_async()
         if not grid_info:
+            log.warning("Failed to get grid info for Independence, Ohio")
             return None
             
-        url = f"https://api.weather.gov/gridpoints/{grid_info['gridId']}/{grid_info['gridX']},{grid_info['gridY']}/forecast"
-        
-        async with aiohttp.ClientSession() as session:
-            headers = {'User-Agent': 'GarageDoorApp/1.0'}
-            async with session.get(url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return data['properties']['periods'][:6]  # Get next 6 periods
+        url = f"{NWS_BASE_URL}/gridpoints/{grid_info['gridId']}/{grid_info['gridX']},{grid_info['gridY']}/forecast"
+        log.debug("Fetching weather from %s", url)
+        
+        with metrics.stage('forecast_fetch'):
+            data = await fetch_nws_json_async(url)
+        if data:
+            return data['properties']['periods']
     except Exception as e:
-        print(f"Error fetching weather: {e}")
+        log.warning("Error fetching weather: %s", e)
     return None
 
-def generate_weather_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
-    """Use OpenAI to generate weather description and installation recommendation"""
-    try:
-        if not client:
-            return {
-                'description': "Weather information is currently unavailable (OpenAI API key not configured).",
-                'recommendation': "We recommend scheduling installation on a clear day when possible."
-            }
-            
-        if not weather_data:
-            print("No weather data available from National Weather Service")
-            return {
-                'description': "Weather information is currently unavailable for Independence, Ohio.",
-                'recommendation': "We recommend scheduling installation on a clear day when possible."
-            }
-        
-        print(f"Processing weather data with OpenAI for {len(weather_data)} periods")
-        
-        # Format weather data for OpenAI
-        weather_text = ""
-        for period in weather_data:
-            weather_text += f"{period['name']}: {period['detailedForecast']}\n"
-        
-        print("Weather data for OpenAI:")
-        print(weather_text)
-        
-        prompt = f"""Based on the following weather forecast for Independence, Ohio, write a single paragraph recommending the best day for garage door installation.
+# Shown whenever a specific installation day can't be recommended
+DEFAULT_INSTALLATION_ADVICE = "We recommend scheduling installation on a clear day when possible."
+
+# 'rules' scores installation days locally in microseconds; 'llm' opts into OpenAI prose,
+# which still falls back to the rules when the key is missing or OpenAI fails or times out
+WEATHER_RECOMMENDATION_MODE = os.getenv('WEATHER_RECOMMENDATION_MODE', 'rules')
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', '10'))
+
+# The rules score the whole forecast (about 14 periods, 7 days); the OpenAI prompt only needs the next 6
+LLM_PROMPT_PERIODS = 6
+
+def get_llm_client():
+    """Return the OpenAI client when LLM recommendations are enabled and configured"""
+    if WEATHER_RECOMMENDATION_MODE != 'llm':
+        return None
+    return get_openai_client()
+
+def get_async_llm_client():
+    """get_llm_client() for the ASGI app"""
+    if WEATHER_RECOMMENDATION_MODE != 'llm':
+        return None
+    return get_async_openai_client()
+
+def weather_unavailable_response(weather_data):
+    """Return the canned response when the forecast is unavailable, else None"""
+    if not weather_data:
+        log.info("No weather data available from National Weather Service")
+        metrics.FALLBACKS.labels('weather_unavailable').inc()
+        return {
+            'description': "Weather information is currently unavailable for Independence, Ohio.",
+            'recommendation': DEFAULT_INSTALLATION_ADVICE
+        }
+    return None
+
+def build_weather_prompt(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """Build the OpenAI prompt asking for the best of the three installation days"""
+    # Format weather data for OpenAI
+    weather_text = ""
+    for period in weather_data[:LLM_PROMPT_PERIODS]:
+        weather_text += f"{period['name']}: {period['detailedForecast']}\n"
+    
+    log.debug("Weather data for OpenAI (%d periods):\n%s", min(len(weather_data), LLM_PROMPT_PERIODS), weather_text,
+              extra={'log_type': 'weather_text'})
+    
+    return f"""Based on the following weather forecast for Independence, Ohio, write a single paragraph recommending the best day for garage door installation.
 
 The garage door will be DELIVERED on {delivery_date.strftime('%A, %B %d')}. Installation can only happen on or after the delivery date.
 
@@ -190,117 +451,605 @@ Weather forecast:
 {weather_text}
 
 Write one paragraph starting with "For your garage door installation..." that explains which specific day from the THREE OPTIONS ABOVE is best and why. Only recommend dates on or after {delivery_date.strftime('%A, %B %d')} since that's when the door arrives. Focus on which of these three specific dates has the best weather conditions for outdoor installation work."""
+
+def clean_weather_recommendation(content):
+    """Turn the raw OpenAI completion into the displayed recommendation paragraph"""
+    # Clean up the response - remove any numbering or formatting
+    content = content.replace('1.', '').replace('2.', '')
+    content = content.replace('**', '')  # Remove markdown bold
+    content = content.strip()
+    
+    # Since we're only asking for one paragraph, use the entire response
+    recommendation = content
+    
+    # Ensure proper formatting
+    if not recommendation.lower().startswith('for your garage door'):
+        if 'recommend' in recommendation.lower() or 'best' in recommendation.lower():
+            recommendation = f"For your garage door installation, {recommendation.lower()}"
+    
+    return {
+        'description': '',  # No weather description, only recommendation
+        'recommendation': recommendation.strip()
+    }
+
+def rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """Pick the installation day with the local scoring engine"""
+    try:
+        with metrics.stage('rules'):
+            result = recommend_installation_day(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+        log.info("Rule-based installation day: %s", result['best_date'], extra={'fields': {'scores': result['scores']}})
+        return {'description': result['description'], 'recommendation': result['recommendation']}
+    except Exception as e:
+        log.warning("Error scoring weather: %s", e)
+        return {'description': '', 'recommendation': DEFAULT_INSTALLATION_ADVICE}
+
+def generate_weather_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """Generate the installation recommendation, with OpenAI when enabled or the local rules otherwise"""
+    try:
+        unavailable = weather_unavailable_response(weather_data)
+        if unavailable:
+            return unavailable
         
-        print("Sending request to OpenAI...")
+        client = get_llm_client()
+        if not client:
+            return rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
         
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=400,
-            temperature=0.7
-        )
+        # Identical forecast and delivery dates always produce the same prompt
+        forecast_hash = forecast_fingerprint(weather_data[:LLM_PROMPT_PERIODS])
+        cache_key = recommendation_key(forecast_hash, delivery_date, delivery_plus_1, delivery_plus_2)
+        if llm_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        def complete():
+            prompt = build_weather_prompt(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+            
+            log.debug("Sending request to OpenAI")
+            
+            with metrics.stage('openai'):
+                response = client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=400,
+                    temperature=0.7,
+                    timeout=OPENAI_TIMEOUT
+                )
+            
+            content = response.choices[0].message.content
+            log.debug("OpenAI response: %s", content, extra={'log_type': 'openai_response'})
+            
+            weather_info = clean_weather_recommendation(content)
+            if llm_cache:
+                llm_cache.put(cache_key, forecast_hash, weather_info)
+            return weather_info
+        
+        # Concurrent requests for the same prompt wait for one completion
+        return llm_flight.do(cache_key, complete)
+            
+    except Exception as e:
+        log.warning("Error with OpenAI: %s, using rule-based recommendation", e)
+        metrics.UPSTREAM_ERRORS.labels('openai', type(e).__name__).inc()
+        metrics.FALLBACKS.labels('weather_rules').inc()
+        return rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+
+def stream_weather_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """Stream the installation recommendation from OpenAI
+    
+    Yields ('token', text) for each completion delta as it arrives, then a final
+    ('done', weather_info) with the cleaned paragraph in the /configure shape.
+    """
+    try:
+        unavailable = weather_unavailable_response(weather_data)
+        if unavailable:
+            yield 'done', unavailable
+            return
         
-        content = response.choices[0].message.content
-        print(f"OpenAI response: {content}")
+        client = get_llm_client()
+        if not client:
+            yield 'done', rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+            return
         
-        # Clean up the response - remove any numbering or formatting
-        content = content.replace('1.', '').replace('2.', '')
-        content = content.replace('**', '')  # Remove markdown bold
-        content = content.strip()
+        forecast_hash = forecast_fingerprint(weather_data[:LLM_PROMPT_PERIODS])
+        cache_key = recommendation_key(forecast_hash, delivery_date, delivery_plus_1, delivery_plus_2)
+        if llm_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                yield 'done', cached
+                return
         
-        # Since we're only asking for one paragraph, use the entire response
-        recommendation = content
+        # If the same completion is already streaming for another request, wait for its final text
+        call, is_leader = llm_flight.begin(cache_key)
+        if not is_leader:
+            yield 'done', llm_flight.join(call)
+            return
         
-        # Ensure proper formatting
-        if not recommendation.lower().startswith('for your garage door'):
-            if 'recommend' in recommendation.lower() or 'best' in recommendation.lower():
-                recommendation = f"For your garage door installation, {recommendation.lower()}"
+        # Followers must be released even if the client disconnects mid-stream
+        outcome = {'error': RuntimeError("OpenAI stream ended early")}
+        try:
+            prompt = build_weather_prompt(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+            
+            log.debug("Streaming request to OpenAI")
+            
+            openai_start = time.perf_counter()
+            stream = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=400,
+                temperature=0.7,
+                stream=True,
+                timeout=OPENAI_TIMEOUT
+            )
+            
+            parts = []
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield 'token', delta
+            metrics.record_stage('openai', time.perf_counter() - openai_start)
+            
+            content = ''.join(parts)
+            log.debug("OpenAI response: %s", content, extra={'log_type': 'openai_response'})
+            
+            weather_info = clean_weather_recommendation(content)
+            if llm_cache:
+                llm_cache.put(cache_key, forecast_hash, weather_info)
+            outcome = {'result': weather_info}
+        except Exception as e:
+            outcome = {'error': e}
+            raise
+        finally:
+            llm_flight.finish(cache_key, call, result=outcome.get('result'), error=outcome.get('error'))
         
-        return {
-            'description': '',  # No weather description, only recommendation
-            'recommendation': recommendation.strip()
-        }
+        yield 'done', weather_info
+        
+    except Exception as e:
+        log.warning("Error with OpenAI: %s, using rule-based recommendation", e)
+        metrics.UPSTREAM_ERRORS.labels('openai', type(e).__name__).inc()
+        metrics.FALLBACKS.labels('weather_rules').inc()
+        yield 'done', rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+
+async def generate_weather_recommendation_async(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """generate_weather_recommendation() for the ASGI app, awaiting the OpenAI completion"""
+    try:
+        unavailable = weather_unavailable_response(weather_data)
+        if unavailable:
+            return unavailable
+        
+        client = get_async_llm_client()
+        if not client:
+            return rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+        
+        forecast_hash = forecast_fingerprint(weather_data[:LLM_PROMPT_PERIODS])
+        cache_key = recommendation_key(forecast_hash, delivery_date, delivery_plus_1, delivery_plus_2)
+        if llm_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        async def complete():
+            prompt = build_weather_prompt(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+            
+            log.debug("Sending request to OpenAI")
+            
+            with metrics.stage('openai'):
+                response = await client.chat.completions.create(
+                    model="gpt-3.5-turbo",
+                    messages=[{"role": "user", "content": prompt}],
+                    max_tokens=400,
+                    temperature=0.7,
+                    timeout=OPENAI_TIMEOUT
+                )
+            
+            content = response.choices[0].message.content
+            log.debug("OpenAI response: %s", content, extra={'log_type': 'openai_response'})
+            
+            weather_info = clean_weather_recommendation(content)
+            if llm_cache:
+                llm_cache.put(cache_key, forecast_hash, weather_info)
+            return weather_info
+        
+        return await async_llm_flight.do(cache_key, complete)
             
     except Exception as e:
-        print(f"Error with OpenAI: {e}")
-        return {
-            'description': f"Error processing weather information for Independence, Ohio: {str(e)}",
-            'recommendation': "We recommend scheduling installation on a clear day when possible."
-        }
+        log.warning("Error with OpenAI: %s, using rule-based recommendation", e)
+        metrics.UPSTREAM_ERRORS.labels('openai', type(e).__name__).inc()
+        metrics.FALLBACKS.labels('weather_rules').inc()
+        return rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+
+async def stream_weather_recommendation_async(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """stream_weather_recommendation() for the ASGI app, as an async generator of the same events"""
+    try:
+        unavailable = weather_unavailable_response(weather_data)
+        if unavailable:
+            yield 'done', unavailable
+            return
+        
+        client = get_async_llm_client()
+        if not client:
+            yield 'done', rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+            return
+        
+        forecast_hash = forecast_fingerprint(weather_data[:LLM_PROMPT_PERIODS])
+        cache_key = recommendation_key(forecast_hash, delivery_date, delivery_plus_1, delivery_plus_2)
+        if llm_cache:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                yield 'done', cached
+                return
+        
+        future, is_leader = async_llm_flight.begin(cache_key)
+        if not is_leader:
+            yield 'done', await async_llm_flight.join(future)
+            return
+        
+        outcome = {'error': RuntimeError("OpenAI stream ended early")}
+        try:
+            prompt = build_weather_prompt(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+            
+            log.debug("Streaming request to OpenAI")
+            
+            openai_start = time.perf_counter()
+            stream = await client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=400,
+                temperature=0.7,
+                stream=True,
+                timeout=OPENAI_TIMEOUT
+            )
+            
+            parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield 'token', delta
+            metrics.record_stage('openai', time.perf_counter() - openai_start)
+            
+            content = ''.join(parts)
+            log.debug("OpenAI response: %s", content, extra={'log_type': 'openai_response'})
+            
+            weather_info = clean_weather_recommendation(content)
+            if llm_cache:
+                llm_cache.put(cache_key, forecast_hash, weather_info)
+            outcome = {'result': weather_info}
+        except Exception as e:
+            outcome = {'error': e}
+            raise
+        finally:
+            async_llm_flight.finish(cache_key, future, result=outcome.get('result'), error=outcome.get('error'))
+        
+        yield 'done', weather_info
+        
+    except Exception as e:
+        log.warning("Error with OpenAI: %s, using rule-based recommendation", e)
+        metrics.UPSTREAM_ERRORS.labels('openai', type(e).__name__).inc()
+        metrics.FALLBACKS.labels('weather_rules').inc()
+        yield 'done', rule_based_recommendation(weather_data, delivery_date, delivery_plus_1, delivery_plus_2)
+
+@app.before_request
+def start_request_context():
+    g.request_start = time.perf_counter()
+    g.request_id = structured_logging.start_request(request.headers.get('X-Request-ID'))
+    metrics.begin_request()
+    if incremental_scheduler:
+        incremental_scheduler.ensure_started()
+
+@app.after_request
+def finish_request_context(response):
+    """Record request latency, report the stage timings in a Server-Timing header and echo the request id"""
+    start = g.get('request_start')
+    if start is None:
+        return response
+    response.headers['X-Request-ID'] = g.request_id
+    elapsed = time.perf_counter() - start
+    metrics.REQUEST_SECONDS.labels(request.endpoint or 'unmatched').observe(elapsed)
+    
+    # Streamed responses send their headers before the stages have run
+    timings = metrics.current_timings()
+    if timings and not response.is_streamed:
+        response.headers['Server-Timing'] = metrics.server_timing_header(dict(timings, total=elapsed * 1000))
+    return response
 
 @app.route('/')
 def index():
     """Render the main configurator page"""
-    return render_template('index.html')
+    return render_template('index.html', door_images=asset_manifest.images(), door_image_sizes=DOOR_IMAGE_SIZES)
 
 @app.route('/configure', methods=['POST'])
 def configure():
-    """Handle configuration request with concurrent processing"""
+    """Handle configuration request with concurrent processing
+    
+    Recommendations and the weather fetch (grid lookup then forecast) run in
+    parallel on the stage executor while delivery dates are computed here. Only
+    the OpenAI call waits, since it needs both the forecast and the dates.
+    """
     try:
         data = request.json
         color = data.get('color')
         slate_width = data.get('slate_width') 
         windows = data.get('windows')
         
-        # Generate delivery timeline (1-6 days)
-        delivery_days = random.randint(1, 6)
-        today = datetime.now()
-        delivery_date = today + timedelta(days=delivery_days)
-        delivery_plus_1 = delivery_date + timedelta(days=1)
-        delivery_plus_2 = delivery_date + timedelta(days=2)
-        
-        print(f"Today: {today.strftime('%A, %B %d')}")
-        print(f"Delivery in {delivery_days} days: {delivery_date.strftime('%A, %B %d')}")
-        print(f"Option 2: {delivery_plus_1.strftime('%A, %B %d')}")
-        print(f"Option 3: {delivery_plus_2.strftime('%A, %B %d')}")
+        start = time.perf_counter()
         
-        # Get ML recommendations (synchronous)
-        if recommendation_model:
-            try:
-                recommendations = recommendation_model.predict(color, slate_width, windows == 'yes')
-            except Exception as e:
-                print(f"ML model error: {e}, using fallback")
-                recommendations = get_fallback_recommendations(color, slate_width, windows == 'yes')
-        else:
-            recommendations = get_fallback_recommendations(color, slate_width, windows == 'yes')
+        # Independent stages
+        recommendations_future = submit_stage(
+            'recommendations', get_recommendations, color, slate_width, windows == 'yes'
+        )
+        weather_future = submit_stage('weather', fetch_weather_forecast_sync)
+        delivery = timed_stage('delivery', compute_delivery)
+        delivery_date = delivery['delivery_date']
+        delivery_plus_1 = delivery['delivery_plus_1']
+        delivery_plus_2 = delivery['delivery_plus_2']
         
-        # Fetch weather data (synchronous)
+        # Dependent stage: the installation recommendation needs the forecast and the dates
         try:
-            weather_data = fetch_weather_forecast_sync()
+            weather_data = weather_future.result()
         except Exception as e:
-            print(f"Weather fetch error: {e}")
+            log.warning("Weather fetch error: %s", e)
             weather_data = None
         
-        # Generate weather recommendation using OpenAI
-        weather_info = generate_weather_recommendation(
+        weather_info = timed_stage(
+            'weather_recommendation', generate_weather_recommendation,
             weather_data, delivery_date, delivery_plus_1, delivery_plus_2
         )
         
+        recommendations = recommendations_future.result()
+        
         result = {
             'recommendations': recommendations,
-            'delivery_date': delivery_date.strftime('%B %d'),
-            'delivery_days': delivery_days,
             'weather_description': weather_info['description'],
             'weather_recommendation': weather_info['recommendation'],
-            'delivery_options': {
-                'option1': delivery_date.strftime('%A, %B %d'),
-                'option2': delivery_plus_1.strftime('%A, %B %d'),
-                'option3': delivery_plus_2.strftime('%A, %B %d')
-            }
+            **format_delivery(delivery)
         }
         
-        return jsonify(result)
+        with metrics.stage('json_encode'):
+            response = jsonify(result)
+        
+        if log.isEnabledFor(logging.INFO):
+            timings = {name: round(ms, 1) for name, ms in metrics.current_timings().items()}
+            log.info("Configure stage timings", extra={'fields': {
+                'timings_ms': timings, 'total_ms': round((time.perf_counter() - start) * 1000, 1)
+            }})
+        return response
         
     except Exception as e:
-        print(f"Error in configure: {e}")
+        log.exception("Error in configure")
         return jsonify({'error': str(e)}), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/configure/stream', methods=['POST'])
+def configure_stream():
+    """Streaming variant of /configure using Server-Sent Events
+    
+    Events, in order:
+    - configuration: recommendations and delivery fields, sent as soon as the model answers
+    - token: {"text": ...} for each piece of the OpenAI installation recommendation
+    - done: weather_description and weather_recommendation, the final cleaned paragraph
+    - error: {"error": ...} if the request fails part-way
+    """
+    data = request.get_json(silent=True) or {}
+    color = data.get('color')
+    slate_width = data.get('slate_width')
+    windows = data.get('windows')
+    
+    # Start the slow weather fetch before anything else
+    weather_future = submit_stage('weather', fetch_weather_forecast_sync)
+    
+    def generate():
+        try:
+            recommendations = get_recommendations(color, slate_width, windows == 'yes')
+            delivery = compute_delivery()
+            yield sse_event('configuration', {'recommendations': recommendations, **format_delivery(delivery)})
+            
+            try:
+                weather_data = weather_future.result()
+            except Exception as e:
+                log.warning("Weather fetch error: %s", e)
+                weather_data = None
+            
+            for kind, payload in stream_weather_recommendation(
+                    weather_data, delivery['delivery_date'], delivery['delivery_plus_1'], delivery['delivery_plus_2']):
+                if kind == 'token':
+                    yield sse_event('token', {'text': payload})
+                else:
+                    yield sse_event('done', {
+                        'weather_description': payload['description'],
+                        'weather_recommendation': payload['recommendation']
+                    })
+        except Exception as e:
+            log.exception("Error in configure stream")
+            yield sse_event('error', {'error': str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/configure/batch', methods=['POST'])
+def configure_batch():
+    """Return product recommendations for many configurations in one request
+    
+    Accepts {"configurations": [{"color", "slate_width", "windows"}, ...]} with at
+    most MAX_BATCH_SIZE items. Responds with one JSON array in the same order, each
+    item holding either "recommendations" or a per-item "error".
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        configurations = data.get('configurations') if isinstance(data, dict) else None
+        
+        if not isinstance(configurations, list):
+            return jsonify({'error': 'Request body must include a "configurations" list'}), 400
+        if len(configurations) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch size {len(configurations)} exceeds maximum of {MAX_BATCH_SIZE}'}), 413
+        
+        # Normalize windows the same way /configure does ('yes'/'no'), also accepting booleans
+        normalized = []
+        for config in configurations:
+            if isinstance(config, dict):
+                config = dict(config)
+                windows = config.get('windows')
+                if windows in ('yes', 'no'):
+                    config['windows'] = windows == 'yes'
+            normalized.append(config)
+        
+        if recommendation_model:
+            try:
+                results = recommendation_model.predict_batch(normalized)
+            except Exception as e:
+                log.warning("ML batch error: %s, using fallback", e)
+                results = None
+        else:
+            results = None
+        
+        if results is None:
+            results = []
+            for config in normalized:
+                if not isinstance(config, dict):
+                    results.append({'error': 'Configuration must be an object'})
+                    continue
+                results.append({'recommendations': get_fallback_recommendations(
+                    config.get('color'), config.get('slate_width'), config.get('windows')
+                )})
+        
+        for index, result in enumerate(results):
+            result['index'] = index
+        
+        return jsonify(results)
+        
+    except Exception as e:
+        log.exception("Error in configure batch")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/model/stats')
+def model_stats():
+    """Model version and load details for the worker that answers"""
+    if not recommendation_model:
+        return jsonify({'loaded': False})
+    stats = dict(recommendation_model.stats(), loaded=True)
+    if incremental_scheduler:
+        stats['incremental'] = incremental_scheduler.stats()
+    return jsonify(stats)
+
+@app.route('/shadow/summary')
+def shadow_summary():
+    """Rolling agreement and latency stats for shadow candidate models in this worker"""
+    if not shadow_evaluator:
+        return jsonify({'enabled': False})
+    return jsonify(dict(shadow_evaluator.summary(), enabled=True))
+
+@app.route('/cache/stats')
+def cache_stats():
+    """Forecast cache hit/miss counters for the worker that answers"""
+    if not forecast_cache:
+        return jsonify({'enabled': False})
+    return jsonify(dict(forecast_cache.stats(), enabled=True))
+
+@app.route('/images/door/<variant>.webp')
+def door_image(variant):
+    """Door preview composited from color, slat and window layers, e.g. /images/door/grey-narrow-windows.webp"""
+    options = parse_variant(variant)
+    if not options:
+        return jsonify({'error': f'Unknown door variant: {variant}'}), 404
+
+    data, etag = door_image_cache.get(*options)
+    response = Response(data, mimetype='image/webp')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
+
+@app.route('/assets/<path:filename>')
+def static_asset(filename):
+    """Fingerprinted static asset, sent precompressed when the client accepts it and cacheable forever"""
+    resolved = asset_manifest.resolve(filename, request.accept_encodings)
+    if not resolved:
+        return jsonify({'error': f'Unknown asset: {filename}'}), 404
+
+    path, encoding = resolved
+    # The type comes from the asset's own name, not the .br/.gz sibling sent
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], max_age=CACHE_MAX_AGE, conditional=True)
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+@app.route('/images/stats')
+def door_image_stats():
+    """Door image cache counters for the worker that answers"""
+    return jsonify(door_image_cache.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Stage latency histograms, fallback, cache and upstream error counters in Prometheus format"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
 @app.route('/order', methods=['POST'])
 def place_order():
-    """Handle order placement"""
+    """Save the order with its configuration and recommendations, answering once it is on disk
+    
+    Resending an order with the same Idempotency-Key header returns the first order
+    instead of placing another. If the commit doesn't finish in time the order is
+    still queued, so the answer is 202 with the key to resend it with.
+    """
     try:
-        data = request.json
-        order_id = f"GD{random.randint(10000, 99999)}"
+        data = request.get_json(silent=True) or {}
+        color = data.get('color')
+        slate_width = data.get('slate_width')
+        windows = data.get('windows')
+        if not isinstance(color, str) or color not in COLORS or not isinstance(slate_width, str) \
+                or slate_width not in SLAT_COUNTS or windows not in ('yes', 'no', True, False):
+            return jsonify({'error': 'An order needs a known color and slate_width, and windows ("yes" or "no")'}), 400
+        
+        recommendations = data.get('recommendations') or []
+        if not isinstance(recommendations, list):
+            return jsonify({'error': 'recommendations must be a list'}), 400
+        recommendations = [
+            {field: product[field] for field in ORDER_PRODUCT_FIELDS if field in product}
+            for product in recommendations[:MAX_ORDER_RECOMMENDATIONS] if isinstance(product, dict)
+        ]
+        # Keys become labels in the training event buffer, so only catalog products are accepted
+        product_keys = order_product_keys()
+        if not all(isinstance(product['key'], str) and product['key'] in product_keys
+                   for product in recommendations if 'key' in product):
+            return jsonify({'error': 'recommendations contain an unknown product key'}), 400
+        
+        # Keys of the recommended products added to the order
+        purchased = data.get('purchased') or []
+        if not isinstance(purchased, list) or not all(isinstance(key, str) and key in product_keys for key in purchased):
+            return jsonify({'error': 'purchased must be a list of product keys'}), 400
+        purchased = list(dict.fromkeys(purchased))[:MAX_ORDER_RECOMMENDATIONS]
+        
+        idempotency_key = request.headers.get('Idempotency-Key') or uuid.uuid4().hex
+        if len(idempotency_key) > 64:
+            return jsonify({'error': 'Idempotency-Key must be at most 64 characters'}), 400
+        
+        try:
+            with metrics.stage('order_commit'):
+                order_id = order_store.place(
+                    color, slate_width, windows in ('yes', True), recommendations,
+                    request_id=g.get('request_id'), purchased=purchased, idempotency_key=idempotency_key
+                )
+        except TimeoutError:
+            log.warning("Order commit still pending: %s", idempotency_key)
+            return jsonify({
+                'idempotency_key': idempotency_key,
+                'message': 'Your order was received and is still being saved.',
+                'status': 'pending'
+            }), 202
+        log.info("Order placed: %s", order_id)
         
         return jsonify({
             'order_id': order_id,
@@ -309,8 +1058,16 @@ def place_order():
         })
         
     except Exception as e:
+        log.exception("Error placing order")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/orders/stats')
+def order_stats():
+    """Order store commit and batch-size counters for the worker that answers"""
+    return jsonify(order_store.stats())
+
+startup_timer.report()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+ASGI entry point for the garage door configurator
+/configure and /configure/stream spend almost all of their time waiting on the
+National Weather Service and OpenAI. Here they are coroutines: the forecast comes
+from the fetch_weather_forecast() coroutine and the installation recommendation
+from AsyncOpenAI, so a request waiting on upstream holds no thread and one worker
+can keep hundreds of them in flight. Model inference, which can take milliseconds
+on a lookup-table miss, runs on the stage executor so it never stalls the event
+loop. Every other route is fast local work and is
+answered by the Flask app itself through a small WSGI bridge on a bounded thread
+pool, so routes, templates and JSON are the same in both modes.
+
+    gunicorn --config gunicorn.conf.py --worker-class asgi asgi:app
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app as flask_app
+import metrics
+import structured_logging
+
+log = logging.getLogger(__name__)
+
+# Threads answering the routes handed to Flask, per worker
+WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '8'))
+
+def json_body(payload):
+    """Encode a payload the way the Flask app's jsonify does"""
+    return (flask_app.app.json.dumps(payload, indent=None, separators=(',', ':')) + '\n').encode('utf-8')
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+    def json(self):
+        """The JSON body, like Flask's request.json: an error unless the content type is JSON"""
+        if not self.headers.get('content-type', '').startswith('application/json'):
+            raise ValueError("415 Unsupported Media Type: Did not attempt to load JSON data because "
+                             "the request Content-Type was not 'application/json'.")
+        return json.loads(self.body)
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+def _header_list(headers):
+    return [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+async def send_response(send, status, body, headers):
+    await send({'type': 'http.response.start', 'status': status, 'headers': _header_list(headers)})
+    await send({'type': 'http.response.body', 'body': body})
+
+def start_request(request, endpoint):
+    """What the Flask app's before_request does, for the routes served here"""
+    request_id = structured_logging.start_request(request.headers.get('x-request-id'))
+    metrics.begin_request()
+    if flask_app.incremental_scheduler:
+        flask_app.incremental_scheduler.ensure_started()
+    return {'endpoint': endpoint, 'request_id': request_id, 'start': time.perf_counter()}
+
+def finish_request(context, headers, streamed=False):
+    """What the Flask app's after_request does: latency metric, request id and Server-Timing headers"""
+    elapsed = time.perf_counter() - context['start']
+    metrics.REQUEST_SECONDS.labels(context['endpoint']).observe(elapsed)
+    headers.append(('X-Request-ID', context['request_id']))
+    timings = metrics.current_timings()
+    if timings and not streamed:
+        headers.append(('Server-Timing', metrics.server_timing_header(dict(timings, total=elapsed * 1000))))
+    return headers
+
+async def timed(name, awaitable):
+    """Await one pipeline stage, recording its duration for Server-Timing and /metrics"""
+    with metrics.stage(name):
+        return await awaitable
+
+def run_stage(name, func, *args):
+    """Await a timed stage run on the app's stage executor, off the event loop"""
+    return asyncio.wrap_future(flask_app.submit_stage(name, func, *args))
+
+async def configure(request, send):
+    """POST /configure: the weather fetch and OpenAI call are awaited, local work runs on the stage executor"""
+    context = start_request(request, 'configure')
+    try:
+        data = request.json()
+        color = data.get('color')
+        slate_width = data.get('slate_width')
+        windows = data.get('windows')
+
+        start = time.perf_counter()
+
+        # The forecast is fetched while recommendations and delivery dates are computed
+        weather_task = asyncio.create_task(timed('weather', flask_app.fetch_weather_forecast()))
+        recommendations_future = run_stage(
+            'recommendations', flask_app.get_recommendations, color, slate_width, windows == 'yes'
+        )
+        delivery = await run_stage('delivery', flask_app.compute_delivery)
+        recommendations = await recommendations_future
+
+        try:
+            weather_data = await weather_task
+        except Exception as e:
+            log.warning("Weather fetch error: %s", e)
+            weather_data = None
+
+        weather_info = await timed('weather_recommendation', flask_app.generate_weather_recommendation_async(
+            weather_data, delivery['delivery_date'], delivery['delivery_plus_1'], delivery['delivery_plus_2']
+        ))
+
+        result = {
+            'recommendations': recommendations,
+            'weather_description': weather_info['description'],
+            'weather_recommendation': weather_info['recommendation'],
+            **flask_app.format_delivery(delivery)
+        }
+
+        with metrics.stage('json_encode'):
+            body = json_body(result)
+        status = 200
+
+        if log.isEnabledFor(logging.INFO):
+            timings = {name: round(ms, 1) for name, ms in metrics.current_timings().items()}
+            log.info("Configure stage timings", extra={'fields': {
+                'timings_ms': timings, 'total_ms': round((time.perf_counter() - start) * 1000, 1)
+            }})
+    except Exception as e:
+        log.exception("Error in configure")
+        body, status = json_body({'error': str(e)}), 500
+
+    headers = finish_request(context, [('Content-Type', 'application/json'), ('Content-Length', str(len(body)))])
+    await send_response(send, status, body, headers)
+
+async def configure_stream(request, send, receive):
+    """POST /configure/stream: the same Server-Sent Events as the Flask route, from an async generator"""
+    context = start_request(request, 'configure_stream')
+    try:
+        data = request.json() or {}
+    except ValueError:
+        data = {}
+    color = data.get('color')
+    slate_width = data.get('slate_width')
+    windows = data.get('windows')
+
+    # Start the slow weather fetch before anything else
+    weather_task = asyncio.create_task(timed('weather', flask_app.fetch_weather_forecast()))
+
+    async def events():
+        try:
+            recommendations_future = run_stage(
+                'recommendations', flask_app.get_recommendations, color, slate_width, windows == 'yes'
+            )
+            delivery = await run_stage('delivery', flask_app.compute_delivery)
+            recommendations = await recommendations_future
+            yield flask_app.sse_event('configuration', {
+                'recommendations': recommendations, **flask_app.format_delivery(delivery)
+            })
+
+            try:
+                weather_data = await weather_task
+            except Exception as e:
+                log.warning("Weather fetch error: %s", e)
+                weather_data = None
+
+            async for kind, payload in flask_app.stream_weather_recommendation_async(
+                    weather_data, delivery['delivery_date'], delivery['delivery_plus_1'], delivery['delivery_plus_2']):
+                if kind == 'token':
+                    yield flask_app.sse_event('token', {'text': payload})
+                else:
+                    yield flask_app.sse_event('done', {
+                        'weather_description': payload['description'],
+                        'weather_recommendation': payload['recommendation']
+                    })
+        except Exception as e:
+            log.exception("Error in configure stream")
+            yield flask_app.sse_event('error', {'error': str(e)})
+
+    headers = finish_request(context, [
+        ('Content-Type', 'text/event-stream; charset=utf-8'),
+        ('Cache-Control', 'no-cache'),
+        ('X-Accel-Buffering', 'no')
+    ], streamed=True)
+    await send({'type': 'http.response.start', 'status': 200, 'headers': _header_list(headers)})
+
+    async def stream():
+        async for event in events():
+            await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def wait_for_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    # Stop generating (and release any coalesced OpenAI waiters) if the client goes away
+    stream_task = asyncio.create_task(stream())
+    disconnect_task = asyncio.create_task(wait_for_disconnect())
+    try:
+        await asyncio.wait({stream_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (stream_task, disconnect_task, weather_task):
+            task.cancel()
+    if stream_task.done() and not stream_task.cancelled() and stream_task.exception():
+        log.warning("Configure stream ended early: %s", stream_task.exception())
+
+class WSGIBridge:
+    """Runs the Flask app for one ASGI request on a bounded thread pool
+
+    The request body is read before calling the app and the response is collected
+    whole, which suits the remaining routes: small JSON, pages, images and assets.
+    """
+
+    def __init__(self, wsgi_app, threads=WSGI_THREADS):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self._executor = None
+        self._executor_pid = None
+
+    def _get_executor(self):
+        """Return this process's executor (threads don't survive a fork)"""
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='wsgi')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def environ(self, scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name != 'CONTENT_LENGTH':
+                key = f"HTTP_{name}"
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _run(self, environ):
+        """Call the WSGI app and return (status, headers, body)"""
+        response = {}
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+            return written.append
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            body = b''.join(written) + b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], body
+
+    async def __call__(self, scope, receive, send):
+        body = await read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(self._get_executor(), self._run, self.environ(scope, body))
+        await send_response(send, status, body, headers)
+
+wsgi_bridge = WSGIBridge(flask_app.app)
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await flask_app.close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def app(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    route = (scope['method'], scope['path'])
+    if route == ('POST', '/configure') or route == ('POST', '/configure/stream'):
+        body = await read_body(receive)
+        if body is None:
+            return
+        request = Request(scope, body)
+        if route[1] == '/configure':
+            await configure(request, send)
+        else:
+            await configure_stream(request, send, receive)
+        return
+
+    await wsgi_bridge(scope, receive, send)
@@ -0,0 +1,234 @@
+"""
+Static asset build: fingerprinting, precompression and responsive images
+`python assets.py` (run by initialize_app.py) copies everything under static/ into
+static/build/ with a content hash in each filename, so a file's URL changes whenever
+its bytes do and browsers can cache it forever. Text assets get .gz and .br siblings
+compressed once at build time, and each image gets narrower WebP variants for srcset.
+manifest.json maps the source name (css/main.css) to what was built; the web app
+loads it once at startup to emit URLs and serve the files under /assets/.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+
+STATIC_DIR = 'static'
+BUILD_DIR = 'static/build'
+MANIFEST_FILE = 'manifest.json'
+
+# URL prefix the web app serves BUILD_DIR under
+URL_PREFIX = '/assets'
+
+# Built files never change, so they can be cached for a year without revalidation
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+# Assets worth compressing; images are already compressed
+TEXT_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+IMAGE_EXTENSIONS = {'.webp', '.png', '.jpg', '.jpeg'}
+
+# Precompressed siblings in order of preference, by Content-Encoding
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+# Widths of the responsive image variants; ones wider than the image are skipped
+IMAGE_WIDTHS = (480, 960)
+
+# Rendered width of the door preview (300px tall), for the img sizes attribute
+DOOR_IMAGE_SIZES = '(max-width: 480px) 100vw, 440px'
+
+HASH_LENGTH = 12
+
+def fingerprint(name, data, suffix=''):
+    """Return name with a content hash before the extension: css/main.css -> css/main.1a2b3c4d5e6f.css"""
+    stem, extension = os.path.splitext(name)
+    return f"{stem}{suffix}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}"
+
+def _write_file(path, data):
+    """Write a built file; content-addressed names mean an existing file is already correct"""
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+def compress(data):
+    """Return {encoding: compressed bytes} for the encodings that make data smaller"""
+    compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    brotli = _brotli()
+    if brotli:
+        compressed['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in compressed.items() if len(body) < len(data)}
+
+def image_variants(data, widths=IMAGE_WIDTHS):
+    """Return (width, height, {variant width: WebP bytes}) for an image's narrower variants"""
+    import io
+    from PIL import Image
+    from door_images import WEBP_QUALITY
+
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+    variants = {}
+    for width in widths:
+        if width >= image.width:
+            continue
+        height = round(image.height * width / image.width)
+        output = io.BytesIO()
+        image.convert('RGB').resize((width, height), Image.LANCZOS).save(output, format='WEBP', quality=WEBP_QUALITY)
+        variants[width] = output.getvalue()
+    return image.width, image.height, variants
+
+def _source_files(static_dir, build_dir):
+    """Yield the names of the files to build, relative to static_dir"""
+    for root, directories, names in os.walk(static_dir):
+        directories[:] = sorted(d for d in directories
+                                if os.path.abspath(os.path.join(root, d)) != os.path.abspath(build_dir))
+        for name in sorted(names):
+            if not name.startswith('.'):
+                yield os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, '/')
+
+def built_files(manifest):
+    """Return every file a manifest refers to, relative to the build directory"""
+    files = set()
+    for entry in manifest.get('assets', {}).values():
+        files.add(entry['file'])
+        files.update(entry['file'] + ENCODINGS[encoding] for encoding in entry.get('encodings', ()))
+        files.update(entry.get('variants', {}).values())
+    return files
+
+def read_manifest(build_dir=BUILD_DIR):
+    try:
+        with open(os.path.join(build_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def build(static_dir=STATIC_DIR, build_dir=BUILD_DIR, widths=IMAGE_WIDTHS):
+    """Build every static asset into build_dir and write its manifest; returns the manifest
+
+    Files referenced by neither the new manifest nor the previous one are removed, so
+    pages rendered just before a deploy can still load the assets they point at.
+    """
+    previous = read_manifest(build_dir)
+    assets = {}
+    for name in _source_files(static_dir, build_dir):
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        entry = {'file': fingerprint(name, data), 'bytes': len(data)}
+        _write_file(os.path.join(build_dir, entry['file']), data)
+
+        extension = os.path.splitext(name)[1].lower()
+        if extension in TEXT_EXTENSIONS:
+            compressed = compress(data)
+            for encoding, body in compressed.items():
+                _write_file(os.path.join(build_dir, entry['file'] + ENCODINGS[encoding]), body)
+            entry['encodings'] = [encoding for encoding in ENCODINGS if encoding in compressed]
+        elif extension in IMAGE_EXTENSIONS:
+            entry['width'], entry['height'], variants = image_variants(data, widths)
+            entry['variants'] = {}
+            for width, body in variants.items():
+                # A variant is only useful if it is a smaller download than the original
+                if len(body) >= len(data):
+                    continue
+                variant_file = fingerprint(name, body, suffix=f"-{width}w")
+                _write_file(os.path.join(build_dir, variant_file), body)
+                entry['variants'][str(width)] = variant_file
+        assets[name] = entry
+
+    manifest = {'assets': assets}
+    tmp_path = os.path.join(build_dir, f"{MANIFEST_FILE}.tmp-{os.getpid()}")
+    os.makedirs(build_dir, exist_ok=True)
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(build_dir, MANIFEST_FILE))
+
+    keep = built_files(manifest) | built_files(previous) | {MANIFEST_FILE}
+    for root, _, names in os.walk(build_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, build_dir).replace(os.sep, '/') not in keep:
+                os.remove(path)
+    return manifest
+
+class AssetManifest:
+    """The built assets as seen by the web app: URLs for templates and files for /assets/"""
+
+    def __init__(self, manifest, build_dir=BUILD_DIR, url_prefix=URL_PREFIX):
+        self.assets = manifest.get('assets', {})
+        self.build_dir = build_dir
+        self.url_prefix = url_prefix
+        # Fingerprinted file -> (source name, available encodings)
+        self.files = {entry['file']: (name, entry.get('encodings', [])) for name, entry in self.assets.items()}
+        for name, entry in self.assets.items():
+            self.files.update({variant: (name, []) for variant in entry.get('variants', {}).values()})
+
+    @classmethod
+    def load(cls, build_dir=BUILD_DIR, url_prefix=URL_PREFIX):
+        """Load the manifest; without a build, every URL falls back to /static/"""
+        return cls(read_manifest(build_dir), build_dir, url_prefix)
+
+    def __bool__(self):
+        return bool(self.assets)
+
+    def url(self, name):
+        """URL of a source asset such as css/main.css"""
+        entry = self.assets.get(name)
+        if entry is None:
+            return f"/static/{name}"
+        return f"{self.url_prefix}/{entry['file']}"
+
+    def srcset(self, name):
+        """srcset listing an image's responsive variants and the original, or '' without a build"""
+        entry = self.assets.get(name)
+        if entry is None or 'width' not in entry:
+            return ''
+        candidates = [(int(width), file) for width, file in entry['variants'].items()]
+        candidates.append((entry['width'], entry['file']))
+        return ', '.join(f"{self.url_prefix}/{file} {width}w" for width, file in sorted(candidates))
+
+    def images(self, directory='images'):
+        """Return {stem: {'src', 'srcset'}} for the built images in a directory, e.g. the door previews"""
+        prefix = f"{directory}/"
+        return {
+            os.path.splitext(name[len(prefix):])[0]: {'src': self.url(name), 'srcset': self.srcset(name)}
+            for name, entry in self.assets.items()
+            if name.startswith(prefix) and 'width' in entry
+        }
+
+    def resolve(self, file, accept_encodings=None):
+        """Return (path, encoding) of the file to send for a fingerprinted name, or None if unknown
+
+        encoding is the precompressed variant the client accepts (werkzeug Accept),
+        preferring brotli, or None for the file itself.
+        """
+        known = self.files.get(file)
+        if known is None:
+            return None
+        path = os.path.join(self.build_dir, file)
+        for encoding in ENCODINGS:
+            if encoding in known[1] and accept_encodings is not None and accept_encodings.quality(encoding) > 0:
+                return path + ENCODINGS[encoding], encoding
+        return path, None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fingerprint, precompress and resize the static assets")
+    parser.add_argument('--static', default=STATIC_DIR, help='source directory')
+    parser.add_argument('--build', default=BUILD_DIR, help='output directory')
+    args = parser.parse_args()
+
+    manifest = build(args.static, args.build)
+    for name, entry in sorted(manifest['assets'].items()):
+        extras = entry.get('encodings', []) + [f"{width}w" for width in entry.get('variants', {})]
+        print(f"  {name} -> {entry['file']}" + (f" ({', '.join(extras)})" if extras else ''))
+    if not _brotli():
+        print("Note: brotli is not installed, so only gzip variants were written")
+    print(f"Built {len(manifest['assets'])} assets into {args.build}")
@@ -0,0 +1,300 @@
+"""
+Micro-benchmarks for the recommendation and response-building hot paths
+Each benchmark is warmed up, then timed over repeated batches of calls with the
+garbage collector paused, and reported as per-call statistics. Results are written
+as JSON so runs can be compared:
+
+    python benchmark.py run --output baseline.json
+    python benchmark.py compare baseline.json current.json --threshold 0.10
+
+compare exits with status 1 when the median of any benchmark present in both
+files is more than the threshold slower than the baseline.
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Every configuration the configurator form can produce
+CONFIGURATIONS = list(itertools.product(('grey', 'white'), ('narrow', 'wide'), (False, True)))
+
+class Benchmark:
+    def __init__(self, name, func, repeat=30, warmup=3, min_batch_time=0.02):
+        self.name = name
+        self.func = func
+        self.repeat = repeat
+        self.warmup = warmup
+        self.min_batch_time = min_batch_time
+
+    def _time_batch(self, number):
+        func = self.func
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            return time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _calibrate(self):
+        """Pick calls per batch so each batch lasts at least min_batch_time"""
+        number = 1
+        while True:
+            elapsed = self._time_batch(number)
+            if elapsed >= self.min_batch_time or number >= 1_000_000:
+                return number
+            number *= 10 if elapsed < self.min_batch_time / 10 else 2
+
+    def run(self):
+        for _ in range(self.warmup):
+            self.func()
+        number = self._calibrate()
+        samples = [self._time_batch(number) / number for _ in range(self.repeat)]
+        return summarize(samples, number)
+
+def summarize(samples, number):
+    """Per-call statistics in microseconds"""
+    samples = sorted(s * 1e6 for s in samples)
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    mean = statistics.fmean(samples)
+    stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    return {
+        'unit': 'us',
+        'median': quartiles[1],
+        'mean': mean,
+        'stdev': stdev,
+        'rel_stdev': stdev / mean if mean else 0.0,
+        'min': samples[0],
+        'max': samples[-1],
+        'iqr': quartiles[2] - quartiles[0],
+        'repeat': len(samples),
+        'calls_per_repeat': number
+    }
+
+@contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+@contextmanager
+def _quiet():
+    """Silence the model's and app's progress prints while benchmarking"""
+    stdout = sys.stdout
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdout = stdout
+
+def build_benchmarks(scratch, include_training=True):
+    """Create the benchmarks against a model trained in the scratch directory
+
+    Training data, artifacts and the app's runtime files are written under scratch
+    so the repo's data/ and models/ are neither read nor overwritten.
+    """
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, repo_dir)
+
+    from generate_data import save_training_data
+    from models.recommendation_model import ProductRecommendationModel
+    with _quiet(), _working_directory(scratch):
+        save_training_data()
+        model = ProductRecommendationModel()
+    # Keep the model on its scratch artifacts; relative paths would resolve against the repo
+    for attr in ('model_path', 'encoders_path', 'forest_path', 'registry_dir'):
+        setattr(model, attr, os.path.join(scratch, getattr(model, attr)))
+
+    # The app module sets up caches, the order store and the incremental trainer at
+    # import; keep all of them away from the repo's data/ and model registry
+    os.environ.setdefault('FORECAST_CACHE_ENABLED', '0')
+    os.environ.setdefault('DOOR_IMAGE_CACHE_DIR', os.path.join(scratch, 'door_cache'))
+    os.environ.setdefault('ORDER_DB_PATH', os.path.join(scratch, 'orders.sqlite3'))
+    os.environ.setdefault('INCREMENTAL_TRAINING_INTERVAL', '0')
+    # Set up logging before stdout is silenced, or log lines would go to the closed devnull
+    import structured_logging
+    structured_logging.setup_logging()
+    with _quiet(), _working_directory(repo_dir):
+        import app
+
+    configurations = itertools.cycle(CONFIGURATIONS)
+
+    def predict():
+        model.predict(*next(configurations))
+
+    def predict_live():
+        model._predict_live(*next(configurations))
+
+    def predict_batch():
+        model.predict_batch([
+            {'color': color, 'slate_width': slate_width, 'windows': windows}
+            for color, slate_width, windows in CONFIGURATIONS
+        ])
+
+    def load_model():
+        with _quiet(), _working_directory(scratch):
+            model.load_model()
+
+    def train_model():
+        with _quiet(), _working_directory(scratch):
+            model.train_model()
+
+    def fallback_recommendations():
+        app.get_fallback_recommendations(*next(configurations))
+
+    delivery_date = datetime(2025, 6, 2)
+    configure_result = {
+        'recommendations': model.predict('grey', 'wide', True),
+        'weather_description': '',
+        'weather_recommendation': (
+            "For your garage door installation, we recommend Tuesday, June 03. The forecast is sunny, "
+            "with a high near 74°F, a 2% chance of precipitation and winds up to 10 mph. Monday looks "
+            "less suitable: chance showers and thunderstorms, with a high near 69°F, a 60% chance of "
+            "precipitation and winds up to 15 mph."
+        ),
+        **app.format_delivery({
+            'delivery_days': 3,
+            'delivery_date': delivery_date,
+            'delivery_plus_1': delivery_date + timedelta(days=1),
+            'delivery_plus_2': delivery_date + timedelta(days=2)
+        })
+    }
+
+    def configure_json():
+        app.app.json.dumps(configure_result)
+
+    benchmarks = [
+        Benchmark('predict', predict),
+        Benchmark('predict_live', predict_live),
+        Benchmark('predict_batch_8', predict_batch),
+        Benchmark('load_model', load_model, repeat=15),
+        Benchmark('get_fallback_recommendations', fallback_recommendations),
+        Benchmark('configure_json', configure_json)
+    ]
+    if include_training:
+        benchmarks.append(Benchmark('train_model', train_model, repeat=5, warmup=1, min_batch_time=0))
+    return benchmarks
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(only=None, include_training=True):
+    """Run the suite and return the results document"""
+    import numpy as np
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='garage-bench-') as scratch:
+        for benchmark in build_benchmarks(scratch, include_training):
+            if only and benchmark.name not in only:
+                continue
+            stats = benchmark.run()
+            results[benchmark.name] = stats
+            print(f"{benchmark.name:30s} median {format_time(stats['median']):>10s}  "
+                  f"±{stats['rel_stdev'] * 100:5.1f}%  min {format_time(stats['min']):>10s}  "
+                  f"({stats['repeat']}x{stats['calls_per_repeat']})")
+
+    return {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'benchmarks': results
+    }
+
+def format_time(us):
+    if us >= 1e6:
+        return f"{us / 1e6:.2f} s"
+    if us >= 1e3:
+        return f"{us / 1e3:.2f} ms"
+    return f"{us:.2f} us"
+
+def compare_results(baseline, current, threshold=0.10, metric='median'):
+    """Print the change of each shared benchmark and return the names that regressed"""
+    regressions = []
+    for name in sorted(set(baseline['benchmarks']) & set(current['benchmarks'])):
+        before = baseline['benchmarks'][name][metric]
+        after = current['benchmarks'][name][metric]
+        change = (after - before) / before if before else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:30s} {format_time(before):>10s} -> {format_time(after):>10s}  "
+              f"{change * 100:+7.1f}%{'  REGRESSION' if regressed else ''}")
+
+    for name in sorted(set(baseline['benchmarks']) ^ set(current['benchmarks'])):
+        print(f"{name:30s} only in {'baseline' if name in baseline['benchmarks'] else 'current'} results")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--output', help='write results JSON to this file')
+    run_parser.add_argument('--only', help='comma-separated benchmark names')
+    run_parser.add_argument('--skip-training', action='store_true', help='leave out train_model')
+
+    compare_parser = commands.add_parser('compare', help='compare results against a baseline')
+    compare_parser.add_argument('baseline', help='baseline results JSON')
+    compare_parser.add_argument('current', nargs='?', help='current results JSON (default: run the suite now)')
+    compare_parser.add_argument('--threshold', type=float, default=0.10,
+                                help='allowed slowdown as a fraction of the baseline (default 0.10)')
+    compare_parser.add_argument('--metric', default='median', choices=('median', 'mean', 'min'))
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        only = set(args.only.split(',')) if args.only else None
+        results = run_benchmarks(only, include_training=not args.skip_training)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_benchmarks(set(baseline['benchmarks']),
+                                 include_training='train_model' in baseline['benchmarks'])
+        print()
+
+    regressions = compare_results(baseline, current, args.threshold, args.metric)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Columnar on-disk tables
+A table is a directory with one .npy file per column plus meta.json listing the
+columns, their dtypes and, for categorical columns, the category labels behind the
+integer codes. Columns are preallocated with open_memmap and filled chunk by chunk,
+so writing never holds more than one chunk in memory, and reading memory-maps the
+files with no parsing.
+
+CSV files can be converted into a table once (convert_csv) and reused until the
+CSV changes (load_csv_cached).
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# CSV rows parsed per chunk when converting
+CSV_CHUNK_ROWS = 500_000
+
+class ColumnarWriter:
+    """Write a table of n_rows rows, one chunk of rows at a time
+
+    columns maps each name to (dtype, categories); categories is a list of labels
+    for categorical columns (stored as integer codes) or None. The table is built
+    in a temporary directory and moved into place by close(), so readers never see
+    a partly written table. attrs is an optional JSON-serializable dict kept in
+    meta.json.
+    """
+
+    def __init__(self, path, n_rows, columns, attrs=None):
+        self.path = path
+        self.n_rows = n_rows
+        self.columns = columns
+        self.attrs = attrs or {}
+        self.rows_written = 0
+        self._tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+        os.makedirs(self._tmp_path)
+        self._arrays = {
+            name: np.lib.format.open_memmap(
+                os.path.join(self._tmp_path, f"{name}.npy"), mode='w+', dtype=dtype, shape=(n_rows,)
+            )
+            for name, (dtype, _) in columns.items()
+        }
+
+    def write(self, chunk):
+        """Append a chunk given as {column: array}; every column must be present and the same length"""
+        length = len(next(iter(chunk.values())))
+        end = self.rows_written + length
+        if end > self.n_rows:
+            raise ValueError(f"Chunk overflows the table: {end} > {self.n_rows} rows")
+        for name, array in self._arrays.items():
+            array[self.rows_written:end] = chunk[name]
+        self.rows_written = end
+
+    def close(self):
+        if self.rows_written != self.n_rows:
+            raise ValueError(f"Table incomplete: wrote {self.rows_written} of {self.n_rows} rows")
+        for array in self._arrays.values():
+            array.flush()
+        self._arrays = {}
+
+        meta = {
+            'version': FORMAT_VERSION,
+            'n_rows': self.n_rows,
+            'columns': {
+                name: {'dtype': np.dtype(dtype).str, 'categories': categories}
+                for name, (dtype, categories) in self.columns.items()
+            },
+            'attrs': self.attrs
+        }
+        with open(os.path.join(self._tmp_path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        # Swap the finished table in; the old one is removed only after the rename
+        old_path = f"{self.path}.old-{os.getpid()}"
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(self._tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar table version in {path}: {meta.get('version')}")
+    return meta
+
+def load_columnar(path, columns=None, mmap=True):
+    """Return ({column: array}, meta); arrays are read-only memory maps unless mmap=False"""
+    meta = read_meta(path)
+    names = columns or list(meta['columns'])
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+        for name in names
+    }
+    return arrays, meta
+
+def decode(meta, name, codes):
+    """Map a categorical column's codes back to their labels"""
+    categories = meta['columns'][name]['categories']
+    return np.asarray(categories, dtype=object)[codes]
+
+def source_signature(path):
+    """Return the size and modification time of a file, used to detect when a table's source changed"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _count_csv_rows(csv_path):
+    """Count data rows by counting newlines, without parsing"""
+    lines = 0
+    last = b'\n'
+    with open(csv_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+def _encode_categorical(values, categories):
+    """Return codes for a pandas categorical Series, appending labels not yet in categories"""
+    index = {label: i for i, label in enumerate(categories)}
+    for label in values.cat.categories:
+        label = str(label)
+        if label not in index:
+            index[label] = len(categories)
+            categories.append(label)
+    if values.hasnans:
+        raise ValueError(f"Column {values.name} has missing values")
+    mapping = np.array([index[str(label)] for label in values.cat.categories], dtype=np.int64)
+    return mapping[values.cat.codes.to_numpy()]
+
+def convert_csv(csv_path, path, columns, chunk_rows=CSV_CHUNK_ROWS):
+    """Convert a CSV file into a columnar table, parsing it chunk by chunk
+
+    columns is a ColumnarWriter spec for the CSV columns to keep. Categorical
+    columns are coded in the order of the labels given; labels not listed are
+    appended as they are found, sorted within each chunk. The CSV's signature is kept in the
+    table's attrs so load_csv_cached can tell when it is out of date.
+    """
+    import pandas as pd
+
+    signature = source_signature(csv_path)
+    # Copy the category lists: they grow as new labels are found
+    columns = {
+        name: (dtype, list(categories) if categories is not None else None)
+        for name, (dtype, categories) in columns.items()
+    }
+    writer = ColumnarWriter(path, _count_csv_rows(csv_path), columns, attrs={'source': signature})
+
+    # pandas reads categorical columns as string labels plus codes, so codes don't depend on type inference
+    dtypes = {name: pd.CategoricalDtype() for name, (_, categories) in columns.items() if categories is not None}
+    for frame in pd.read_csv(csv_path, usecols=list(columns), dtype=dtypes, chunksize=chunk_rows):
+        chunk = {}
+        for name, (dtype, categories) in columns.items():
+            if categories is None:
+                chunk[name] = frame[name].to_numpy(dtype=dtype)
+                continue
+            codes = _encode_categorical(frame[name], categories)
+            if len(categories) > np.iinfo(dtype).max + 1:
+                raise ValueError(f"Column {name} has more labels than {np.dtype(dtype).name} codes can hold")
+            chunk[name] = codes.astype(dtype)
+        writer.write(chunk)
+    writer.close()
+
+def load_csv_cached(csv_path, path, columns, chunk_rows=CSV_CHUNK_ROWS):
+    """Return load_columnar(path) for a table converted from csv_path, converting first if it is missing or stale"""
+    try:
+        meta = read_meta(path)
+    except (OSError, ValueError):
+        meta = None
+    current = (
+        meta is not None
+        and meta.get('attrs', {}).get('source') == source_signature(csv_path)
+        and all(name in meta['columns'] for name in columns)
+    )
+    if not current:
+        convert_csv(csv_path, path, columns, chunk_rows)
+    return load_columnar(path, list(columns))
@@ -0,0 +1,280 @@
+"""
+Layered garage door preview rendering
+A preview is composited from independent layers (door color, slat pattern, window
+overlay) on top of the wall and frame taken from the stock photos, so new colors or
+window styles don't need a static file for every combination. Rendered variants are
+kept in a size-bounded in-memory LRU backed by a size-bounded disk cache, and the eight stock
+images in static/images/ are served as-is as the precomputed warm set.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import metrics
+
+# Bump when the rendering changes so stale disk cache entries are not reused
+RENDER_VERSION = 1
+
+STATIC_IMAGE_DIR = 'static/images'
+
+# Stock photo supplying the wall, frame and driveway around the door
+SURROUND_IMAGE = 'white-wide.webp'
+
+# Door panel area inside the frame of the stock photos: (left, top, right, bottom)
+DOOR_BOX = (65, 51, 1127, 765)
+
+# Door colors as RGB
+COLORS = {
+    'grey': (84, 88, 94),
+    'white': (250, 250, 250),
+    'black': (38, 39, 41),
+    'brown': (104, 74, 50),
+    'sand': (198, 182, 150),
+    'green': (58, 78, 64)
+}
+
+# Number of horizontal slats for each slat width
+SLAT_COUNTS = {
+    'narrow': 25,
+    'wide': 10
+}
+
+# Window styles by the suffix used in image names; the form's "yes" maps to "windows"
+WINDOW_STYLES = ('windows', 'panoramic')
+
+WEBP_QUALITY = 85
+
+def parse_variant(name):
+    """Split a variant name like 'grey-narrow-windows' into (color, slate_width, window_style)
+
+    Returns None if any part is not a known option.
+    """
+    parts = name.split('-')
+    if len(parts) not in (2, 3):
+        return None
+    color, slate_width = parts[0], parts[1]
+    window_style = parts[2] if len(parts) == 3 else None
+    if color not in COLORS or slate_width not in SLAT_COUNTS:
+        return None
+    if window_style is not None and window_style not in WINDOW_STYLES:
+        return None
+    return color, slate_width, window_style
+
+def variant_name(color, slate_width, window_style=None):
+    return f"{color}-{slate_width}-{window_style}" if window_style else f"{color}-{slate_width}"
+
+def _door_size():
+    left, top, right, bottom = DOOR_BOX
+    return right - left, bottom - top
+
+@lru_cache(maxsize=1)
+def _surround_layer():
+    from PIL import Image
+    with Image.open(os.path.join(STATIC_IMAGE_DIR, SURROUND_IMAGE)) as image:
+        return image.convert('RGBA')
+
+@lru_cache(maxsize=None)
+def _color_layer(color):
+    """Solid door color with a soft top-to-bottom shade"""
+    from PIL import Image, ImageDraw
+    width, height = _door_size()
+    layer = Image.new('RGBA', (width, height), COLORS[color] + (255,))
+    draw = ImageDraw.Draw(layer)
+    for y in range(height):
+        shade = int(18 * y / height)
+        r, g, b = COLORS[color]
+        draw.line([(0, y), (width, y)], fill=(max(0, r - shade), max(0, g - shade), max(0, b - shade), 255))
+    return layer
+
+@lru_cache(maxsize=None)
+def _slat_layer(slate_width):
+    """Transparent layer with a groove and highlight at every slat boundary"""
+    from PIL import Image, ImageDraw
+    width, height = _door_size()
+    layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    count = SLAT_COUNTS[slate_width]
+    for i in range(1, count):
+        y = round(i * height / count)
+        draw.line([(0, y), (width, y)], fill=(0, 0, 0, 150), width=2)
+        draw.line([(0, y + 2), (width, y + 2)], fill=(255, 255, 255, 60), width=1)
+    return layer
+
+@lru_cache(maxsize=None)
+def _window_layer(window_style):
+    """Transparent layer with the window row across the top panel"""
+    from PIL import Image, ImageDraw
+    width, height = _door_size()
+    layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(layer)
+    margin, top, bottom = 23, 9, 107
+    glass = (70, 74, 80, 255)
+    frame = (20, 20, 22, 255)
+    muntin = (225, 225, 225, 255)
+
+    if window_style == 'panoramic':
+        draw.rectangle([margin, top, width - margin, bottom], fill=glass, outline=frame, width=4)
+        return layer
+
+    panes = 6
+    pane_width = (width - 2 * margin) / panes
+    for i in range(panes):
+        left = round(margin + i * pane_width)
+        right = round(margin + (i + 1) * pane_width)
+        draw.rectangle([left, top, right, bottom], fill=glass, outline=frame, width=3)
+        center_x = (left + right) // 2
+        center_y = (top + bottom) // 2
+        draw.line([(center_x, top + 3), (center_x, bottom - 3)], fill=muntin, width=4)
+        draw.line([(left + 3, center_y), (right - 3, center_y)], fill=muntin, width=4)
+    return layer
+
+def render_door(color, slate_width, window_style=None):
+    """Composite the door layers onto the surround and return WebP bytes"""
+    from PIL import Image
+    door = Image.alpha_composite(_color_layer(color), _slat_layer(slate_width))
+    if window_style:
+        door = Image.alpha_composite(door, _window_layer(window_style))
+
+    image = _surround_layer().copy()
+    image.paste(door, DOOR_BOX[:2])
+    output = io.BytesIO()
+    image.convert('RGB').save(output, format='WEBP', quality=WEBP_QUALITY)
+    return output.getvalue()
+
+def _stock_image_path(color, slate_width, window_style):
+    """Path of the stock photo for this variant, if it is one of the original eight"""
+    if window_style not in (None, 'windows'):
+        return None
+    path = os.path.join(STATIC_IMAGE_DIR, f"{variant_name(color, slate_width, window_style)}.webp")
+    return path if os.path.exists(path) else None
+
+class DoorImageCache:
+    """Size-bounded LRU of rendered variants in memory, backed by a size-bounded disk cache"""
+
+    def __init__(self, cache_dir, max_bytes=16 * 1024 * 1024, max_disk_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # name -> (data, etag)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'stock_hits': 0, 'renders': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _remember(self, name, data):
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if name in self._entries:
+                self._size -= len(self._entries[name][0])
+            self._entries[name] = (data, etag)
+            self._entries.move_to_end(name)
+            self._size += len(data)
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+        return data, etag
+
+    def _disk_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.v{RENDER_VERSION}.webp")
+
+    def _prune_disk(self, keep):
+        """Delete the least recently used files until the disk cache fits in max_disk_bytes
+
+        Reads touch a file's mtime, so files from an old RENDER_VERSION go first. Other
+        workers share the directory, so files may vanish while we look at them.
+        """
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.webp') or entry.path == keep:
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        try:
+            total += os.path.getsize(keep)
+        except FileNotFoundError:
+            pass
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def _read_disk(self, name):
+        """Return a variant's bytes from the disk cache and mark it recently used, or None"""
+        path = self._disk_path(name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Missing, or pruned by another worker between the open and the touch
+            return None
+        return data
+
+    def get(self, color, slate_width, window_style=None):
+        """Return (webp_bytes, etag) for a variant, rendering it only on a full miss"""
+        name = variant_name(color, slate_width, window_style)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry:
+                self._entries.move_to_end(name)
+                self.counters['memory_hits'] += 1
+                metrics.CACHE_LOOKUPS.labels('door_image', 'memory_hits').inc()
+                return entry
+            render_lock = self._render_locks.setdefault(name, threading.Lock())
+
+        # One thread renders a variant while others wait for it
+        with render_lock:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry:
+                    self.counters['memory_hits'] += 1
+                    metrics.CACHE_LOOKUPS.labels('door_image', 'memory_hits').inc()
+                    return entry
+
+            stock_path = _stock_image_path(color, slate_width, window_style)
+            if stock_path:
+                counter = 'stock_hits'
+                with open(stock_path, 'rb') as f:
+                    data = f.read()
+            else:
+                data = self._read_disk(name)
+                counter = 'disk_hits'
+                if data is None:
+                    counter = 'renders'
+                    data = render_door(color, slate_width, window_style)
+                    tmp_path = f"{self._disk_path(name)}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, self._disk_path(name))
+                    self._prune_disk(keep=self._disk_path(name))
+
+            with self._lock:
+                self.counters[counter] += 1
+            metrics.CACHE_LOOKUPS.labels('door_image', counter).inc()
+            return self._remember(name, data)
+
+    def warm(self):
+        """Load the stock images into memory"""
+        for color in COLORS:
+            for slate_width in SLAT_COUNTS:
+                for window_style in (None, 'windows'):
+                    if _stock_image_path(color, slate_width, window_style):
+                        self.get(color, slate_width, window_style)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self._size, max_bytes=self.max_bytes)
@@ -0,0 +1,245 @@
+"""
+Persistent HTTP cache for National Weather Service responses
+Entries live in a local SQLite database shared by every gunicorn worker. Freshness
+comes from the response's Cache-Control/Expires headers, and stale entries are
+revalidated with If-None-Match/If-Modified-Since. Refreshes are single-flight
+across threads and, through a lock file, across workers. get_json_async() is the
+same lookup for the ASGI app, with the upstream call awaited.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import metrics
+import upstream
+from singleflight import AsyncSingleFlight, SingleFlight
+
+log = logging.getLogger(__name__)
+
+# Lifetime used when a response carries no usable caching headers
+DEFAULT_TTL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+)
+"""
+
+def _parse_http_date(value):
+    """Parse an HTTP date header to a Unix timestamp, or None"""
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+def cache_lifetime(headers, now=None):
+    """Return how many seconds a response may be served from cache
+
+    Follows Cache-Control (no-store/no-cache, s-maxage, max-age minus Age) and
+    falls back to Expires relative to Date. Returns None when neither is present.
+    """
+    now = time.time() if now is None else now
+    cache_control = headers.get('Cache-Control', '')
+    directives = {}
+    for part in cache_control.split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    if 'no-store' in directives or 'no-cache' in directives:
+        return 0
+
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            try:
+                max_age = int(directives[name])
+            except ValueError:
+                continue
+            try:
+                age = int(headers.get('Age', 0))
+            except ValueError:
+                age = 0
+            return max(0, max_age - age)
+
+    expires = _parse_http_date(headers.get('Expires'))
+    if expires is not None:
+        date = _parse_http_date(headers.get('Date'))
+        return max(0, expires - (date if date is not None else now))
+
+    return None
+
+class ForecastCache:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Parsed JSON per URL, reused while the stored entry is unchanged
+        self._parsed = {}
+        self.counters = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stale_served': 0, 'errors': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One upstream refresh per URL at a time, on this host
+        self.flight = SingleFlight(lock_dir=f"{path}.locks")
+        self.async_flight = AsyncSingleFlight(lock_dir=f"{path}.locks")
+        with self._connect() as connection:
+            connection.execute(SCHEMA)
+
+    def _connect(self):
+        """Return a connection for this thread, reopening after a fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+        metrics.CACHE_LOOKUPS.labels('forecast', name).inc()
+
+    def get(self, url):
+        row = self._connect().execute(
+            'SELECT body, etag, last_modified, fetched_at, expires_at FROM entries WHERE url = ?', (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at, expires_at = row
+        return {'body': body, 'etag': etag, 'last_modified': last_modified,
+                'fetched_at': fetched_at, 'expires_at': expires_at}
+
+    def put(self, url, body, etag, last_modified, fetched_at, expires_at):
+        self._connect().execute(
+            'INSERT OR REPLACE INTO entries (url, body, etag, last_modified, fetched_at, expires_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (url, body, etag, last_modified, fetched_at, expires_at)
+        )
+
+    def touch(self, url, expires_at):
+        """Extend the lifetime of an entry after a 304 Not Modified"""
+        self._connect().execute('UPDATE entries SET expires_at = ? WHERE url = ?', (expires_at, url))
+
+    def _decode(self, url, entry):
+        """Parse an entry's body, reusing the previous parse if it hasn't changed"""
+        cached = self._parsed.get(url)
+        if cached and cached[0] == entry['fetched_at']:
+            return cached[1]
+        data = json.loads(entry['body'])
+        self._parsed[url] = (entry['fetched_at'], data)
+        return data
+
+    def get_json(self, url, headers=None, timeout=upstream.DEFAULT_TIMEOUT):
+        """Return the JSON body for url, from cache when fresh, else from the network"""
+        entry = self.get(url)
+        if entry and entry['expires_at'] > time.time():
+            self._count('hits')
+            return self._decode(url, entry)
+
+        # Concurrent misses for the same URL share one upstream call
+        return self.flight.do(url, lambda: self._refresh(url, headers, timeout), cross_process=True)
+
+    async def get_json_async(self, url, headers=None, timeout=upstream.DEFAULT_TIMEOUT):
+        """get_json() for the event loop: a miss awaits the upstream call instead of blocking"""
+        entry = self.get(url)
+        if entry and entry['expires_at'] > time.time():
+            self._count('hits')
+            return self._decode(url, entry)
+
+        return await self.async_flight.do(url, lambda: self._refresh_async(url, headers, timeout), cross_process=True)
+
+    def _conditional_headers(self, entry, headers):
+        """Request headers for a refresh, revalidating the stored entry if there is one"""
+        request_headers = dict(headers or {})
+        if entry:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        return request_headers
+
+    def _refresh(self, url, headers, timeout):
+        """Fetch or revalidate url upstream; called by one thread per host at a time"""
+        # Another worker may have refreshed the entry while we waited for the lock
+        now = time.time()
+        entry = self.get(url)
+        if entry and entry['expires_at'] > now:
+            self._count('hits')
+            return self._decode(url, entry)
+
+        try:
+            response = upstream.get(url, headers=self._conditional_headers(entry, headers), timeout=timeout)
+        except Exception as e:
+            log.warning("Error fetching %s: %s", url, e)
+            response = None
+        return self._store(url, entry, now, response)
+
+    async def _refresh_async(self, url, headers, timeout):
+        now = time.time()
+        entry = self.get(url)
+        if entry and entry['expires_at'] > now:
+            self._count('hits')
+            return self._decode(url, entry)
+
+        try:
+            response = await upstream.get_async(url, headers=self._conditional_headers(entry, headers), timeout=timeout)
+        except Exception as e:
+            log.warning("Error fetching %s: %s", url, e)
+            response = None
+        return self._store(url, entry, now, response)
+
+    def _store(self, url, entry, now, response):
+        """Record an upstream response (None if the call failed) and return the JSON to serve"""
+        if response is not None:
+            lifetime = cache_lifetime(response.headers, now)
+            expires_at = now + (DEFAULT_TTL if lifetime is None else lifetime)
+
+            if response.status_code == 304 and entry:
+                self.touch(url, expires_at)
+                self._count('revalidated')
+                return self._decode(url, entry)
+
+            if response.status_code == 200:
+                data = json.loads(response.text)
+                self.put(url, response.text, response.headers.get('ETag'),
+                         response.headers.get('Last-Modified'), now, expires_at)
+                self._parsed[url] = (now, data)
+                self._count('misses')
+                return data
+
+            log.warning("%s returned status %d", url, response.status_code)
+
+        self._count('errors')
+        if entry:
+            # Upstream failed; a stale forecast is better than none
+            self._count('stale_served')
+            return self._decode(url, entry)
+        return None
+
+    def stats(self):
+        """Return hit/miss counters for this process plus the shared entry count"""
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses'] + counters['revalidated']
+        entries = self._connect().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        return dict(
+            counters,
+            pid=os.getpid(),
+            entries=entries,
+            single_flight=self.flight.stats(),
+            async_single_flight=self.async_flight.stats(),
+            hit_ratio=counters['hits'] / lookups if lookups else None
+        )
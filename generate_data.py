@@ -1,186 +1,259 @@
-import pandas as pd
-import numpy as np
-import random
+import argparse
 import os
 
-def generate_synthetic_data():
-    """Generate synthetic data for garage door product recommendations"""
-    
-    # Set seeds for reproducibility
-    np.random.seed(42)
-    random.seed(42)
-    
-    # Define product catalog
-    products = {
-        'garage_door_opener': {
-            'name': 'Smart Garage Door Opener',
-            'price': 299.99,
-            'category': 'automation'
-        },
-        'remote_control': {
-            'name': 'Universal Remote Control (2-pack)',
-            'price': 49.99,
-            'category': 'automation'
-        },
-        'safety_sensors': {
-            'name': 'Photoelectric Safety Sensors',
-            'price': 79.99,
-            'category': 'safety'
-        },
-        'weather_stripping': {
-            'name': 'Premium Weather Seal Kit',
-            'price': 34.99,
-            'category': 'weatherization'
-        },
-        'smart_controller': {
-            'name': 'Smart Home Controller Hub',
-            'price': 199.99,
-            'category': 'automation'
-        },
-        'backup_battery': {
-            'name': 'Emergency Backup Battery',
-            'price': 149.99,
-            'category': 'power'
-        },
-        'keypad_entry': {
-            'name': 'Wireless Keypad Entry',
-            'price': 89.99,
-            'category': 'security'
-        },
-        'installation_kit': {
-            'name': 'Professional Installation Hardware Kit',
-            'price': 124.99,
-            'category': 'installation'
-        },
-        'insulation_kit': {
-            'name': 'Garage Door Insulation Kit',
-            'price': 119.99,
-            'category': 'weatherization'
-        },
-        'maintenance_kit': {
-            'name': 'Annual Maintenance Kit',
-            'price': 59.99,
-            'category': 'maintenance'
-        }
+import numpy as np
+
+from columnar import ColumnarWriter
+
+# Define product catalog
+PRODUCTS = {
+    'garage_door_opener': {
+        'name': 'Smart Garage Door Opener',
+        'price': 299.99,
+        'category': 'automation'
+    },
+    'remote_control': {
+        'name': 'Universal Remote Control (2-pack)',
+        'price': 49.99,
+        'category': 'automation'
+    },
+    'safety_sensors': {
+        'name': 'Photoelectric Safety Sensors',
+        'price': 79.99,
+        'category': 'safety'
+    },
+    'weather_stripping': {
+        'name': 'Premium Weather Seal Kit',
+        'price': 34.99,
+        'category': 'weatherization'
+    },
+    'smart_controller': {
+        'name': 'Smart Home Controller Hub',
+        'price': 199.99,
+        'category': 'automation'
+    },
+    'backup_battery': {
+        'name': 'Emergency Backup Battery',
+        'price': 149.99,
+        'category': 'power'
+    },
+    'keypad_entry': {
+        'name': 'Wireless Keypad Entry',
+        'price': 89.99,
+        'category': 'security'
+    },
+    'installation_kit': {
+        'name': 'Professional Installation Hardware Kit',
+        'price': 124.99,
+        'category': 'installation'
+    },
+    'insulation_kit': {
+        'name': 'Garage Door Insulation Kit',
+        'price': 119.99,
+        'category': 'weatherization'
+    },
+    'maintenance_kit': {
+        'name': 'Annual Maintenance Kit',
+        'price': 59.99,
+        'category': 'maintenance'
+    }
+}
+
+# Configuration options and customer profile values, in code order
+COLORS = ['grey', 'white']
+SLATE_WIDTHS = ['narrow', 'wide']
+BUDGETS = ['low', 'medium', 'high']
+
+PRODUCT_KEYS = list(PRODUCTS)
+CATEGORIES = sorted({product['category'] for product in PRODUCTS.values()})
+PRODUCT_CATEGORY_CODES = np.array([CATEGORIES.index(PRODUCTS[key]['category']) for key in PRODUCT_KEYS])
+PRODUCT_PRICES = np.array([PRODUCTS[key]['price'] for key in PRODUCT_KEYS])
+
+# Column layout of the generated table: one row per (sample, product)
+COLUMNS = {
+    'color': (np.uint8, COLORS),
+    'slate_width': (np.uint8, SLATE_WIDTHS),
+    'windows': (np.bool_, None),
+    'customer_budget': (np.uint8, BUDGETS),
+    'tech_savvy': (np.bool_, None),
+    'security_conscious': (np.bool_, None),
+    'product': (np.uint8, PRODUCT_KEYS),
+    'product_category': (np.uint8, CATEGORIES),
+    'product_price': (np.float64, None),
+    'recommended': (np.uint8, None)
+}
+
+DEFAULT_SAMPLES = 2000
+DEFAULT_SEED = 42
+
+# Samples generated per chunk; each chunk has its own seed derived from the run's
+# seed, so a given seed and chunk size always produce the same rows
+CHUNK_SAMPLES = 50_000
+
+def _category_mask(category):
+    return np.array([PRODUCTS[key]['category'] == category for key in PRODUCT_KEYS])
+
+def product_probabilities(white, wide, windows, budget, tech_savvy, security_conscious):
+    """Recommendation probability of every product for each sample, as an (n_samples, n_products) array
+
+    Inputs are per-sample arrays: booleans, and budget codes indexing BUDGETS.
+    """
+    automation = _category_mask('automation')
+    security = _category_mask('security')
+    weatherization = _category_mask('weatherization')
+    installation = _category_mask('installation')
+    is_product = {key: np.array([k == key for k in PRODUCT_KEYS]) for key in PRODUCT_KEYS}
+
+    white = white[:, None]
+    wide = wide[:, None]
+    windows = windows[:, None]
+    tech_savvy = tech_savvy[:, None]
+    security_conscious = security_conscious[:, None]
+    high_budget = (budget == BUDGETS.index('high'))[:, None]
+    low_budget = (budget == BUDGETS.index('low'))[:, None]
+
+    # Base 30% chance
+    probability = np.full((len(budget), len(PRODUCT_KEYS)), 0.3)
+
+    # Adjust based on configuration
+    probability += 0.1 * white  # White doors are premium
+    probability += windows * (0.15 + 0.2 * automation + 0.15 * security)  # Windows suggest higher-end preferences
+    probability += wide * (0.2 * weatherization + 0.1 * installation)  # Wider doors need more accessories
+
+    # Adjust based on customer profile
+    probability += 0.2 * high_budget - 0.15 * low_budget
+    probability += 0.25 * (tech_savvy & automation)
+    probability += 0.3 * (security_conscious & security)
+
+    # Product-specific adjustments
+    probability += 0.3 * is_product['garage_door_opener']  # Very popular
+    probability += 0.25 * is_product['remote_control']  # Very common
+    probability += 0.2 * is_product['safety_sensors']  # Safety is important
+    probability += 0.15 * (wide & is_product['weather_stripping'])
+    probability += 0.2 * (windows & tech_savvy & is_product['smart_controller'])
+    probability += 0.15 * (high_budget & is_product['backup_battery'])
+
+    # Cap probability at 0.9
+    return np.minimum(probability, 0.9)
+
+def generate_chunk(rng, n_samples):
+    """Sample n_samples configurations and customer profiles, with one row per product each
+
+    Returns {column: array} with n_samples * len(PRODUCT_KEYS) rows, categorical
+    columns as codes into their COLUMNS categories.
+    """
+    # Random configuration and customer profile, each option equally likely
+    color = rng.integers(0, len(COLORS), n_samples, dtype=np.uint8)
+    slate_width = rng.integers(0, len(SLATE_WIDTHS), n_samples, dtype=np.uint8)
+    windows = rng.random(n_samples) < 0.5
+    customer_budget = rng.integers(0, len(BUDGETS), n_samples, dtype=np.uint8)
+    tech_savvy = rng.random(n_samples) < 0.5
+    security_conscious = rng.random(n_samples) < 0.5
+
+    probability = product_probabilities(
+        color == COLORS.index('white'), slate_width == SLATE_WIDTHS.index('wide'),
+        windows, customer_budget, tech_savvy, security_conscious
+    )
+    recommended = (rng.random(probability.shape) < probability).astype(np.uint8)
+
+    n_products = len(PRODUCT_KEYS)
+    return {
+        'color': np.repeat(color, n_products),
+        'slate_width': np.repeat(slate_width, n_products),
+        'windows': np.repeat(windows, n_products),
+        'customer_budget': np.repeat(customer_budget, n_products),
+        'tech_savvy': np.repeat(tech_savvy, n_products),
+        'security_conscious': np.repeat(security_conscious, n_products),
+        'product': np.tile(np.arange(n_products, dtype=np.uint8), n_samples),
+        'product_category': np.tile(PRODUCT_CATEGORY_CODES.astype(np.uint8), n_samples),
+        'product_price': np.tile(PRODUCT_PRICES, n_samples),
+        'recommended': recommended.ravel()
     }
-    
-    # Configuration options
-    colors = ['grey', 'white']
-    slate_widths = ['narrow', 'wide']
-    window_options = [True, False]
-    
-    data = []
-    
-    # Generate 2000 samples
-    for i in range(2000):
-        # Random configuration
-        color = random.choice(colors)
-        slate_width = random.choice(slate_widths)
-        windows = random.choice(window_options)
-        
-        # Generate customer preferences based on realistic scenarios
-        customer_budget = random.choice(['low', 'medium', 'high'])
-        tech_savvy = random.choice([True, False])
-        security_conscious = random.choice([True, False])
-        
-        # Base probability for each product
-        product_probabilities = {}
-        
-        for product_key, product_info in products.items():
-            base_prob = 0.3  # Base 30% chance
-            
-            # Adjust based on configuration
-            if color == 'white':  # White doors are premium
-                base_prob += 0.1
-            
-            if windows:  # Windows suggest higher-end preferences
-                base_prob += 0.15
-                if product_info['category'] == 'automation':
-                    base_prob += 0.2
-                if product_info['category'] == 'security':
-                    base_prob += 0.15
-            
-            if slate_width == 'wide':  # Wider doors need more accessories
-                if product_info['category'] == 'weatherization':
-                    base_prob += 0.2
-                if product_info['category'] == 'installation':
-                    base_prob += 0.1
-            
-            # Adjust based on customer profile
-            if customer_budget == 'high':
-                base_prob += 0.2
-            elif customer_budget == 'low':
-                base_prob -= 0.15
-            
-            if tech_savvy and product_info['category'] == 'automation':
-                base_prob += 0.25
-            
-            if security_conscious and product_info['category'] == 'security':
-                base_prob += 0.3
-            
-            # Product-specific adjustments
-            if product_key == 'garage_door_opener':
-                base_prob += 0.3  # Very popular
-            elif product_key == 'remote_control':
-                base_prob += 0.25  # Very common
-            elif product_key == 'safety_sensors':
-                base_prob += 0.2  # Safety is important
-            elif product_key == 'weather_stripping':
-                if slate_width == 'wide':
-                    base_prob += 0.15
-            elif product_key == 'smart_controller':
-                if windows and tech_savvy:
-                    base_prob += 0.2
-            elif product_key == 'backup_battery':
-                if customer_budget == 'high':
-                    base_prob += 0.15
-            
-            # Cap probability at 0.9
-            product_probabilities[product_key] = min(base_prob, 0.9)
-        
-        # Generate recommendations for this configuration
-        for product_key, probability in product_probabilities.items():
-            # Determine if this product is recommended
-            is_recommended = random.random() < probability
-            
-            data.append({
-                'color': color,
-                'slate_width': slate_width,
-                'windows': windows,
-                'customer_budget': customer_budget,
-                'tech_savvy': tech_savvy,
-                'security_conscious': security_conscious,
-                'product': product_key,
-                'product_category': products[product_key]['category'],
-                'product_price': products[product_key]['price'],
-                'recommended': 1 if is_recommended else 0
-            })
-    
-    return pd.DataFrame(data)
-
-def save_training_data():
-    """Generate and save training data"""
+
+def iter_chunks(n_samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED, chunk_samples=CHUNK_SAMPLES):
+    """Yield generate_chunk() results covering n_samples samples"""
+    for index, start in enumerate(range(0, n_samples, chunk_samples)):
+        rng = np.random.default_rng([seed, index])
+        yield generate_chunk(rng, min(chunk_samples, n_samples - start))
+
+def decode_chunk(chunk):
+    """Replace a chunk's categorical codes with their labels"""
+    decoded = dict(chunk)
+    for name, (_, categories) in COLUMNS.items():
+        if categories is not None:
+            decoded[name] = np.asarray(categories, dtype=object)[chunk[name]]
+    return decoded
+
+def generate_synthetic_data(n_samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED):
+    """Generate synthetic data for garage door product recommendations as a DataFrame"""
+    import pandas as pd
+
+    chunks = [pd.DataFrame(decode_chunk(chunk)) for chunk in iter_chunks(n_samples, seed)]
+    return pd.concat(chunks, ignore_index=True)
+
+def save_training_data(n_samples=DEFAULT_SAMPLES, seed=DEFAULT_SEED, csv_path='data/product_recommendations.csv',
+                       columnar_path=None, chunk_samples=CHUNK_SAMPLES):
+    """Generate training data chunk by chunk, streaming it to CSV and/or a columnar table
+
+    Memory use is bounded by one chunk regardless of n_samples.
+    """
+    import pandas as pd
+
+    if not csv_path and not columnar_path:
+        raise ValueError("Nothing to write: give a CSV path, a columnar path or both")
     print("Generating synthetic training data...")
-    
+
     # Create data directory
-    os.makedirs('data', exist_ok=True)
-    
-    # Generate data
-    df = generate_synthetic_data()
-    
-    # Save to CSV
-    df.to_csv('data/product_recommendations.csv', index=False)
-    
-    print(f"Generated {len(df)} training samples")
-    print(f"Configurations: {len(df[['color', 'slate_width', 'windows']].drop_duplicates())} unique")
-    print(f"Products: {len(df['product'].unique())} different products")
-    print("Data saved to data/product_recommendations.csv")
-    
+    for path in (csv_path, columnar_path):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    n_rows = n_samples * len(PRODUCT_KEYS)
+    columnar_writer = ColumnarWriter(columnar_path, n_rows, COLUMNS) if columnar_path else None
+    csv_file = open(f"{csv_path}.tmp", 'w', newline='') if csv_path else None
+
+    # Rows and recommendations per product, for the summary
+    rows = np.zeros(len(PRODUCT_KEYS), dtype=np.int64)
+    recommended = np.zeros(len(PRODUCT_KEYS), dtype=np.int64)
+    try:
+        for index, chunk in enumerate(iter_chunks(n_samples, seed, chunk_samples)):
+            if csv_file:
+                pd.DataFrame(decode_chunk(chunk)).to_csv(csv_file, header=index == 0, index=False)
+            if columnar_writer:
+                columnar_writer.write(chunk)
+            rows += np.bincount(chunk['product'], minlength=len(PRODUCT_KEYS))
+            recommended += np.bincount(chunk['product'], weights=chunk['recommended'],
+                                       minlength=len(PRODUCT_KEYS)).astype(np.int64)
+    finally:
+        if csv_file:
+            csv_file.close()
+
+    # Readers only ever see complete files
+    if csv_path:
+        os.replace(f"{csv_path}.tmp", csv_path)
+    if columnar_writer:
+        columnar_writer.close()
+
+    print(f"Generated {n_rows} training samples")
+    print(f"Configurations: {len(COLORS) * len(SLATE_WIDTHS) * 2} possible")
+    print(f"Products: {len(PRODUCT_KEYS)} different products")
+    for path in (csv_path, columnar_path):
+        if path:
+            print(f"Data saved to {path}")
+
     # Display sample statistics
     print("\nRecommendation rates by product:")
-    recommendation_rates = df.groupby('product')['recommended'].mean().sort_values(ascending=False)
-    for product, rate in recommendation_rates.items():
-        print(f"  {product}: {rate:.1%}")
+    rates = recommended / np.maximum(rows, 1)
+    for index in np.argsort(-rates, kind='stable'):
+        print(f"  {PRODUCT_KEYS[index]}: {rates[index]:.1%}")
 
 if __name__ == "__main__":
-    save_training_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate synthetic garage door product recommendation data")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES,
+                        help=f"customer samples to generate, {len(PRODUCT_KEYS)} rows each (default {DEFAULT_SAMPLES})")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--csv', default='data/product_recommendations.csv', help="CSV output path ('' to skip)")
+    parser.add_argument('--columnar', help='also write a columnar table (directory of .npy files) here')
+    parser.add_argument('--chunk-samples', type=int, default=CHUNK_SAMPLES, help='samples generated per chunk')
+    args = parser.parse_args()
+    save_training_data(args.samples, args.seed, args.csv or None, args.columnar, args.chunk_samples)
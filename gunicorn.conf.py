@@ -0,0 +1,36 @@
+"""
+Gunicorn configuration for the garage door configurator
+
+The app is preloaded in the master process so the recommendation model is loaded
+once and shared copy-on-write with every forked worker. The same configuration
+serves the ASGI entry point: `gunicorn --config gunicorn.conf.py --worker-class asgi asgi:app`.
+"""
+
+import gc
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '2'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+# Each worker writes its metric samples to files here so /metrics can merge every
+# worker's counters and histograms. Must be set before the app imports prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', 'data/prometheus')
+
+def on_starting(server):
+    # Samples left by a previous run would be merged into this one
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+def when_ready(server):
+    # Move everything allocated while loading the app into the permanent
+    # generation, so garbage collection in workers doesn't touch (and copy)
+    # the shared pages
+    if preload_app:
+        gc.freeze()
+
+def child_exit(server, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
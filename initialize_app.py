@@ -40,10 +40,15 @@ def generate_training_data():
 def train_model():
     """Train the ML model"""
     try:
-        # Check if model files exist
-        if os.path.exists('models/recommendation_model.pkl') and os.path.exists('models/encoders.pkl'):
+        # Check if model files exist, including the compact forest used for serving
+        if (os.path.exists('models/recommendation_model.pkl') and os.path.exists('models/encoders.pkl')
+                and (os.path.exists('models/recommendation_forest')
+                     or os.path.exists('models/recommendation_forest.npz'))):
             print("✓ ML model already trained")
             return True
+        if os.path.exists('models/registry/CURRENT'):
+            print("✓ ML model published in models/registry")
+            return True
             
         print("Training ML model...")
         from models.recommendation_model import ProductRecommendationModel
@@ -82,11 +87,23 @@ def check_images():
         print("✓ All garage door images found")
         return True
 
+def build_static_assets():
+    """Fingerprint, precompress and resize the static assets into static/build"""
+    try:
+        from assets import build, BUILD_DIR
+        manifest = build()
+        print(f"✓ Built {len(manifest['assets'])} static assets into {BUILD_DIR}")
+    except Exception as e:
+        print(f"✗ Error building static assets: {e}")
+        print("   The app will serve the unversioned files from static/")
+        return False
+    return True
+
 def check_environment():
     """Check environment variables"""
     if not os.getenv('OPENAI_API_KEY'):
         print("⚠️  OPENAI_API_KEY environment variable not set")
-        print("   Weather recommendations will not work without it")
+        print("   Installation recommendations will use the local weather rules without it")
         print("   Set it with: export OPENAI_API_KEY='your-key-here'")
         return False
     else:
@@ -117,7 +134,10 @@ def main():
     # Step 5: Check images
     images_ok = check_images()
     
-    # Step 6: Check environment
+    # Step 6: Build static assets
+    build_static_assets()
+    
+    # Step 7: Check environment
     env_ok = check_environment()
     
     print("\n" + "=" * 50)
@@ -0,0 +1,77 @@
+"""
+Memoization of OpenAI installation recommendations
+The completion depends only on the forecast periods and the delivery dates, so results
+are content-addressed on a hash of both. Entries expire after a TTL, are dropped as
+soon as a different forecast is seen, and the cache is bounded in size.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+def forecast_fingerprint(weather_data):
+    """Hash the normalized text of the forecast periods"""
+    digest = hashlib.sha256()
+    for period in weather_data:
+        name = ' '.join(str(period.get('name', '')).split())
+        forecast = ' '.join(str(period.get('detailedForecast', '')).split())
+        digest.update(f"{name}\x1f{forecast}\x1e".encode('utf-8'))
+    return digest.hexdigest()
+
+def recommendation_key(forecast_hash, *dates):
+    """Build the cache key from a forecast fingerprint and the delivery-date triple"""
+    date_part = '|'.join(date.strftime('%Y-%m-%d') for date in dates)
+    return hashlib.sha256(f"{forecast_hash}|{date_part}".encode('utf-8')).hexdigest()
+
+class RecommendationCache:
+    def __init__(self, max_entries=64, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (forecast_hash, expires_at, value), oldest first
+        self._entries = OrderedDict()
+        self._current_forecast = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                metrics.CACHE_LOOKUPS.labels('llm', 'misses').inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.CACHE_LOOKUPS.labels('llm', 'hits').inc()
+            return dict(entry[2])
+
+    def put(self, key, forecast_hash, value):
+        with self._lock:
+            if forecast_hash != self._current_forecast:
+                # The forecast changed, so answers for the old one are obsolete
+                self._entries = OrderedDict(
+                    (k, entry) for k, entry in self._entries.items() if entry[0] == forecast_hash
+                )
+                self._current_forecast = forecast_hash
+            self._entries[key] = (forecast_hash, time.monotonic() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+def load_recommendation_cache():
+    """Build the cache from LLM_CACHE_SIZE / LLM_CACHE_TTL, or return None when LLM_CACHE_SIZE=0"""
+    max_entries = int(os.getenv('LLM_CACHE_SIZE', '64'))
+    if max_entries <= 0:
+        return None
+    return RecommendationCache(max_entries=max_entries, ttl=float(os.getenv('LLM_CACHE_TTL', '3600')))
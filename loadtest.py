@@ -0,0 +1,563 @@
+"""
+End-to-end load test for /configure and /order
+Starts local stand-ins for api.weather.gov and the OpenAI chat completions API,
+runs the app under gunicorn pointed at them (NWS_BASE_URL, OPENAI_BASE_URL), and
+drives it at a fixed concurrency. Prints p50/p95/p99 latency, throughput and error
+counts per endpoint, plus how many calls reached each fake upstream.
+
+    python loadtest.py run --concurrency 32 --duration 30 --workers 4
+    python loadtest.py run --nws-latency lognormal:120,0.5 --openai-latency fixed:800 --error-rate 0.02
+    python loadtest.py run --asgi --concurrency 300          # the ASGI entry point (asgi.py)
+    python loadtest.py run --target http://localhost:5000    # app already running
+    python loadtest.py serve                                 # only the fake upstreams
+
+Real upstream responses can be recorded once and replayed with their original
+bodies and cache headers:
+
+    python loadtest.py record --output data/loadtest_recording.json
+    python loadtest.py run --replay data/loadtest_recording.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NWS_GRID = {'gridId': 'CLE', 'gridX': 86, 'gridY': 64}
+
+# Headers kept when recording real responses
+RECORDED_HEADERS = ('Content-Type', 'Cache-Control', 'Expires', 'ETag', 'Last-Modified')
+
+CONFIGURATIONS = [
+    {'color': color, 'slate_width': slate_width, 'windows': windows}
+    for color in ('grey', 'white') for slate_width in ('narrow', 'wide') for windows in ('no', 'yes')
+]
+
+def parse_latency(spec):
+    """Build a sampler returning seconds from 'fixed:MS', 'uniform:LOW_MS,HIGH_MS' or 'lognormal:MEDIAN_MS,SIGMA'"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: random.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Bad latency spec {spec!r}; use fixed:MS, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+
+def synthetic_forecast(now=None):
+    """Fourteen NWS-style day/night periods starting today"""
+    now = now or datetime.now()
+    start = now.replace(hour=6, minute=0, second=0, microsecond=0)
+    conditions = ['Sunny', 'Partly Cloudy', 'Chance Showers And Thunderstorms', 'Mostly Sunny', 'Rain Likely']
+    periods = []
+    for i in range(14):
+        begins = start + timedelta(hours=12 * i)
+        is_daytime = i % 2 == 0
+        day_name = begins.strftime('%A') if i > 1 else ('Today' if is_daytime else 'Tonight')
+        forecast = conditions[(i // 2) % len(conditions)]
+        precipitation = 60 if 'Rain' in forecast or 'Showers' in forecast else 5
+        temperature = 72 - (i // 2) % 4 * 3 if is_daytime else 55
+        periods.append({
+            'number': i + 1,
+            'name': day_name if is_daytime else f"{day_name} Night" if i > 1 else day_name,
+            'startTime': begins.isoformat() + '-04:00',
+            'endTime': (begins + timedelta(hours=12)).isoformat() + '-04:00',
+            'isDaytime': is_daytime,
+            'temperature': temperature,
+            'temperatureUnit': 'F',
+            'probabilityOfPrecipitation': {'unitCode': 'wmoUnit:percent', 'value': precipitation},
+            'windSpeed': '5 to 10 mph',
+            'windDirection': 'SW',
+            'shortForecast': forecast,
+            'detailedForecast': f"{forecast}, with a {'high' if is_daytime else 'low'} near {temperature}."
+        })
+    return periods
+
+class FakeUpstream:
+    """Threaded HTTP server standing in for the NWS and OpenAI APIs
+
+    Every request waits for a latency drawn from the endpoint's distribution and
+    fails with a 503 at error_rate. In replay mode responses come from a recording
+    (keyed by method and path) instead of being generated.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, nws_latency='fixed:0', openai_latency='fixed:0',
+                 error_rate=0.0, forecast_max_age=60, recording=None):
+        self.nws_latency = parse_latency(nws_latency)
+        self.openai_latency = parse_latency(openai_latency)
+        self.error_rate = error_rate
+        self.forecast_max_age = forecast_max_age
+        self.recording = recording
+        self.counts = {}
+        self._counts_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, name):
+        with self._counts_lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _handler_class(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                upstream.handle(self, 'GET')
+
+            def do_POST(self):
+                upstream.handle(self, 'POST')
+
+        return Handler
+
+    def handle(self, handler, method):
+        path = handler.path.split('?')[0]
+        body = handler.rfile.read(int(handler.headers.get('Content-Length') or 0)) if method == 'POST' else b''
+
+        if path.startswith('/points/'):
+            endpoint, latency = 'nws_points', self.nws_latency
+        elif path.startswith('/gridpoints/'):
+            endpoint, latency = 'nws_forecast', self.nws_latency
+        elif path.endswith('/chat/completions') and method == 'POST':
+            endpoint, latency = 'openai_chat', self.openai_latency
+        else:
+            self._count('unknown')
+            return self._send(handler, 404, {'Content-Type': 'application/json'}, b'{"error": "not found"}')
+
+        self._count(endpoint)
+        time.sleep(latency())
+        if self.error_rate and random.random() < self.error_rate:
+            self._count(f"{endpoint}_errors")
+            return self._send(handler, 503, {'Content-Type': 'application/json'}, b'{"error": "injected failure"}')
+
+        if self.recording is not None:
+            recorded = self.recording.get(f"{method} {path}")
+            if recorded is None:
+                self._count(f"{endpoint}_unrecorded")
+                return self._send(handler, 404, {'Content-Type': 'application/json'}, b'{"error": "not recorded"}')
+            return self._send(handler, recorded['status'], recorded['headers'], recorded['body'].encode('utf-8'))
+
+        if endpoint == 'nws_points':
+            return self._send_json(handler, self._points(), {'Cache-Control': 'public, max-age=86400'})
+        if endpoint == 'nws_forecast':
+            return self._send_json(handler, {'properties': {'periods': synthetic_forecast()}},
+                                   {'Cache-Control': f"public, max-age={self.forecast_max_age}"})
+
+        request = json.loads(body or b'{}')
+        if request.get('stream'):
+            return self._send_chat_stream(handler, request)
+        return self._send_json(handler, self._chat_completion(request))
+
+    def _points(self):
+        grid = f"{NWS_GRID['gridId']}/{NWS_GRID['gridX']},{NWS_GRID['gridY']}"
+        return {'properties': dict(NWS_GRID, forecast=f"{self.url}/gridpoints/{grid}/forecast")}
+
+    def _chat_text(self):
+        day = (datetime.now() + timedelta(days=2)).strftime('%A, %B %d')
+        return (f"For your garage door installation, {day} looks best: it is forecast to be mostly "
+                f"sunny with light winds and little chance of rain, which is ideal for outdoor work.")
+
+    def _chat_completion(self, request):
+        return {
+            'id': 'chatcmpl-loadtest',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': self._chat_text()},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 200, 'completion_tokens': 40, 'total_tokens': 240}
+        }
+
+    def _send_chat_stream(self, handler, request):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Connection', 'close')
+        handler.end_headers()
+        for word in self._chat_text().split(' '):
+            chunk = {
+                'id': 'chatcmpl-loadtest',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': request.get('model', 'gpt-3.5-turbo'),
+                'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]
+            }
+            handler.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.close_connection = True
+
+    def _send_json(self, handler, payload, headers=None):
+        self._send(handler, 200, dict(headers or {}, **{'Content-Type': 'application/geo+json'}),
+                   json.dumps(payload).encode('utf-8'))
+
+    def _send(self, handler, status, headers, body):
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+def record_upstream(output, nws_base_url='https://api.weather.gov', openai_base_url='https://api.openai.com/v1'):
+    """Fetch the real points, forecast and (with OPENAI_API_KEY) chat responses and save them for replay"""
+    import requests
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import INDEPENDENCE_LAT, INDEPENDENCE_LON, NWS_HEADERS
+
+    recording = {}
+
+    def save(method, path, response):
+        recording[f"{method} {path}"] = {
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+            'body': response.text
+        }
+        print(f"Recorded {method} {path}: {response.status_code}, {len(response.content)} bytes")
+
+    points_path = f"/points/{INDEPENDENCE_LAT},{INDEPENDENCE_LON}"
+    response = requests.get(nws_base_url + points_path, headers=NWS_HEADERS, timeout=10)
+    save('GET', points_path, response)
+    properties = response.json()['properties']
+
+    forecast_path = f"/gridpoints/{properties['gridId']}/{properties['gridX']},{properties['gridY']}/forecast"
+    save('GET', forecast_path, requests.get(nws_base_url + forecast_path, headers=NWS_HEADERS, timeout=10))
+
+    api_key = os.getenv('OPENAI_API_KEY')
+    if api_key:
+        response = requests.post(
+            f"{openai_base_url}/chat/completions",
+            headers={'Authorization': f"Bearer {api_key}"},
+            json={
+                'model': 'gpt-3.5-turbo',
+                'messages': [{'role': 'user', 'content': 'For your garage door installation, which day this week is best?'}],
+                'max_tokens': 200
+            },
+            timeout=30
+        )
+        save('POST', '/v1/chat/completions', response)
+    else:
+        print("OPENAI_API_KEY not set; chat completions are not recorded")
+
+    with open(output, 'w') as f:
+        json.dump(recording, f, indent=2)
+    print(f"Recording written to {output}")
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+class LoadDriver:
+    """Closed-loop load: each of `concurrency` threads sends its next request as soon as the last returns"""
+
+    def __init__(self, target, concurrency=16, duration=30.0, requests_total=None, order_ratio=0.1, timeout=30.0):
+        self.target = target.rstrip('/')
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests_total = requests_total
+        self.order_ratio = order_ratio
+        self.timeout = timeout
+        self.results = {'configure': [], 'order': []}  # endpoint -> [(seconds, ok, status)]
+        self._lock = threading.Lock()
+        self._issued = 0
+
+    def _next_request(self):
+        with self._lock:
+            if self.requests_total is not None and self._issued >= self.requests_total:
+                return False
+            self._issued += 1
+            return True
+
+    def _worker(self, deadline):
+        import requests
+
+        session = requests.Session()
+        while time.monotonic() < deadline and self._next_request():
+            configuration = random.choice(CONFIGURATIONS)
+            if random.random() < self.order_ratio:
+                endpoint, path = 'order', '/order'
+                payload = dict(configuration, recommendations=[])
+            else:
+                endpoint, path = 'configure', '/configure'
+                payload = configuration
+
+            start = time.perf_counter()
+            try:
+                response = session.post(self.target + path, json=payload, timeout=self.timeout)
+                ok = response.status_code == 200 and 'error' not in response.json()
+                status = response.status_code
+            except Exception as e:
+                ok, status = False, type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.results[endpoint].append((elapsed, ok, status))
+
+    def run(self):
+        start = time.monotonic()
+        deadline = start + (self.duration if self.requests_total is None else float('inf'))
+        threads = [
+            threading.Thread(target=self._worker, args=(deadline,), name=f"load-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.monotonic() - start)
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in self.results.items():
+            latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+            errors = {}
+            for _, ok, status in samples:
+                if not ok:
+                    errors[str(status)] = errors.get(str(status), 0) + 1
+            endpoints[endpoint] = {
+                'requests': len(samples),
+                'errors': sum(errors.values()),
+                'errors_by_status': errors,
+                'throughput_rps': len(samples) / elapsed if elapsed else 0.0,
+                'latency_ms': {
+                    'p50': percentile(latencies, 0.50),
+                    'p95': percentile(latencies, 0.95),
+                    'p99': percentile(latencies, 0.99),
+                    'max': latencies[-1] if latencies else None,
+                    'mean': sum(latencies) / len(latencies) if latencies else None
+                }
+            }
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'concurrency': self.concurrency,
+            'elapsed_s': elapsed,
+            'requests': total,
+            'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+            'throughput_rps': total / elapsed if elapsed else 0.0,
+            'endpoints': endpoints
+        }
+
+def print_report(report, upstream_counts=None):
+    print(f"\n{report['requests']} requests in {report['elapsed_s']:.1f}s at concurrency {report['concurrency']}: "
+          f"{report['throughput_rps']:.1f} req/s, {report['errors']} errors")
+    print(f"{'endpoint':12s} {'requests':>9s} {'errors':>7s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for name, stats in report['endpoints'].items():
+        if not stats['requests']:
+            continue
+        latency = stats['latency_ms']
+        print(f"{name:12s} {stats['requests']:9d} {stats['errors']:7d} {stats['throughput_rps']:8.1f} "
+              f"{latency['p50']:9.1f} {latency['p95']:9.1f} {latency['p99']:9.1f} {latency['max']:9.1f}")
+        if stats['errors_by_status']:
+            print(f"{'':12s} errors by status: {stats['errors_by_status']}")
+    if upstream_counts is not None:
+        print(f"Fake upstream calls: {json.dumps(upstream_counts, sort_keys=True)}")
+
+def start_app(fake_url, port, workers, mode, extra_env=None, asgi=False):
+    """Run the app under gunicorn with its upstreams pointed at the fake server"""
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(workers),
+        NWS_BASE_URL=fake_url,
+        OPENAI_BASE_URL=f"{fake_url}/v1",
+        OPENAI_API_KEY=os.getenv('LOADTEST_OPENAI_API_KEY', 'sk-loadtest'),
+        WEATHER_RECOMMENDATION_MODE=mode,
+        **(extra_env or {})
+    )
+    server = ['--worker-class', 'asgi', 'asgi:app'] if asgi else ['app:app']
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--bind', f"127.0.0.1:{port}", *server],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    return process
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+def scratch_environment(scratch):
+    """Environment keeping the app's writable state in scratch, away from the repo's data
+
+    Orders go to a scratch database and incremental training is off. The model
+    registry is a copy of the current version (hard-linked where possible, since
+    published versions never change), so the app serves the real model but can
+    never publish into models/registry.
+    """
+    from models import registry
+
+    registry_dir = os.path.join(scratch, 'registry')
+    os.makedirs(registry_dir)
+    version = registry.current_version()
+    if version:
+        shutil.copytree(registry.version_dir(registry.REGISTRY_DIR, version),
+                        registry.version_dir(registry_dir, version), copy_function=_link_or_copy)
+        registry.set_current(registry_dir, version)
+    return {
+        # A separate forecast cache so load tests never mix with real NWS data
+        'FORECAST_CACHE_PATH': os.getenv('FORECAST_CACHE_PATH', 'data/loadtest_forecast_cache.sqlite3'),
+        'ORDER_DB_PATH': os.path.join(scratch, 'orders.sqlite3'),
+        'INCREMENTAL_TRAINING_INTERVAL': '0',
+        'MODEL_REGISTRY_DIR': registry_dir
+    }
+
+def wait_until_ready(url, timeout=60.0):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url + '/shadow/summary', timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+def stop_app(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        process.kill()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    upstream_options = argparse.ArgumentParser(add_help=False)
+    upstream_options.add_argument('--nws-latency', default='lognormal:80,0.4', help='NWS latency distribution')
+    upstream_options.add_argument('--openai-latency', default='lognormal:900,0.3', help='OpenAI latency distribution')
+    upstream_options.add_argument('--error-rate', type=float, default=0.0, help='fraction of upstream calls that get a 503')
+    upstream_options.add_argument('--forecast-max-age', type=int, default=60, help='Cache-Control max-age on forecasts')
+    upstream_options.add_argument('--replay', help='serve responses from this recording instead of generating them')
+
+    run_parser = commands.add_parser('run', parents=[upstream_options], help='load-test the app')
+    run_parser.add_argument('--target', help='URL of an already running app (its upstreams must point at the fakes)')
+    run_parser.add_argument('--concurrency', type=int, default=16)
+    run_parser.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    run_parser.add_argument('--requests', type=int, help='stop after this many requests instead of a duration')
+    run_parser.add_argument('--order-ratio', type=float, default=0.1, help='fraction of requests sent to /order')
+    run_parser.add_argument('--workers', type=int, default=2, help='gunicorn workers when the harness starts the app')
+    run_parser.add_argument('--port', type=int, default=5055, help='port for the app started by the harness')
+    run_parser.add_argument('--mode', default='llm', choices=('llm', 'rules'), help='WEATHER_RECOMMENDATION_MODE for the app')
+    run_parser.add_argument('--asgi', action='store_true', help='start the app with the ASGI worker and asgi:app')
+    run_parser.add_argument('--output', help='write the report as JSON to this file')
+
+    serve_parser = commands.add_parser('serve', parents=[upstream_options], help='run only the fake upstreams')
+    serve_parser.add_argument('--port', type=int, default=8099)
+
+    record_parser = commands.add_parser('record', help='record real upstream responses for replay')
+    record_parser.add_argument('--output', default='data/loadtest_recording.json')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        record_upstream(args.output)
+        return 0
+
+    recording = None
+    if args.replay:
+        with open(args.replay) as f:
+            recording = json.load(f)
+
+    fake = FakeUpstream(
+        port=args.port if args.command == 'serve' else 0,
+        nws_latency=args.nws_latency,
+        openai_latency=args.openai_latency,
+        error_rate=args.error_rate,
+        forecast_max_age=args.forecast_max_age,
+        recording=recording
+    ).start()
+
+    if args.command == 'serve':
+        print(f"Fake upstreams on {fake.url}; start the app with:")
+        print(f"  NWS_BASE_URL={fake.url} OPENAI_BASE_URL={fake.url}/v1 OPENAI_API_KEY=sk-loadtest "
+              f"WEATHER_RECOMMENDATION_MODE=llm gunicorn --config gunicorn.conf.py app:app")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            fake.stop()
+        return 0
+
+    process = None
+    scratch = None
+    target = args.target
+    if not target:
+        target = f"http://127.0.0.1:{args.port}"
+        scratch = tempfile.mkdtemp(prefix='garage-loadtest-')
+        process = start_app(fake.url, args.port, args.workers, args.mode, scratch_environment(scratch),
+                            asgi=args.asgi)
+        print(f"Starting app with {args.workers} gunicorn {'ASGI ' if args.asgi else ''}workers on {target}...")
+        if not wait_until_ready(target):
+            stop_app(process)
+            shutil.rmtree(scratch, ignore_errors=True)
+            fake.stop()
+            print("App did not become ready")
+            return 1
+
+    try:
+        print(f"Fake upstreams on {fake.url}; driving {target} at concurrency {args.concurrency}")
+        report = LoadDriver(
+            target, concurrency=args.concurrency, duration=args.duration,
+            requests_total=args.requests, order_ratio=args.order_ratio
+        ).run()
+    finally:
+        if process:
+            stop_app(process)
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+        fake.stop()
+
+    report['upstream_calls'] = dict(fake.counts)
+    print_report(report, fake.counts)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
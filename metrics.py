@@ -0,0 +1,84 @@
+"""
+Request stage timing and Prometheus metrics
+Stages are timed with perf_counter and recorded twice: into the current request's
+timings (sent back in the Server-Timing header) and into histograms served at
+/metrics. Under gunicorn, PROMETHEUS_MULTIPROC_DIR is set by gunicorn.conf.py so
+each worker writes its samples to files there and /metrics merges all workers.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+MULTIPROCESS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+
+# From sub-millisecond lookups up to slow OpenAI completions
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    'garage_stage_duration_seconds', 'Time spent in each request stage', ['stage'], buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    'garage_request_duration_seconds', 'Request latency by endpoint', ['endpoint'], buckets=LATENCY_BUCKETS
+)
+FALLBACKS = Counter(
+    'garage_fallback_activations', 'Requests answered by a fallback path', ['kind']
+)
+CACHE_LOOKUPS = Counter(
+    'garage_cache_lookups', 'Cache lookups by cache and result', ['cache', 'result']
+)
+UPSTREAM_ERRORS = Counter(
+    'garage_upstream_errors', 'Failed upstream calls by service and status or exception', ['service', 'kind']
+)
+
+# Stage durations in milliseconds for the request being handled; stage executor
+# threads see the same dict when they run in a copy of the request's context
+_request_timings = ContextVar('request_timings', default=None)
+
+def begin_request():
+    """Start collecting stage timings for a new request"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+def current_timings():
+    return _request_timings.get()
+
+def record_stage(name, seconds):
+    STAGE_SECONDS.labels(name).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds * 1000
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as one stage of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+def server_timing_header(timings):
+    return ', '.join(f"{name};dur={ms:.1f}" for name, ms in timings.items())
+
+def render():
+    """Return (body, content_type) for /metrics, merged across workers in multiprocess mode"""
+    if MULTIPROCESS_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live-only samples (called from gunicorn's child_exit)"""
+    if MULTIPROCESS_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid, MULTIPROCESS_DIR)
@@ -0,0 +1,209 @@
+import numpy as np
+import os
+import shutil
+
+from . import registry
+
+# In a directory written by publish(), names the version subdirectory being served
+CURRENT_FILE = 'CURRENT'
+
+def flatten_forest(forest):
+    """Flatten a fitted sklearn RandomForestClassifier into contiguous node arrays
+
+    All trees are concatenated into one set of arrays and child indices are made
+    absolute. Leaves point to themselves so a batch can be walked a fixed number
+    of steps without checking which rows have already reached a leaf.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        n_nodes = tree.node_count
+        node_ids = np.arange(n_nodes, dtype=np.int32)
+        is_leaf = tree.children_left == -1
+
+        feature = np.where(is_leaf, 0, tree.feature).astype(np.int32)
+        threshold = np.where(is_leaf, 0.0, tree.threshold).astype(np.float64)
+        left = np.where(is_leaf, node_ids, tree.children_left).astype(np.int32) + offset
+        right = np.where(is_leaf, node_ids, tree.children_right).astype(np.int32) + offset
+
+        # Normalize leaf counts to class probabilities, as DecisionTreeClassifier.predict_proba does
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        value = value / totals
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        values.append(value)
+        roots.append(offset)
+        offset += n_nodes
+        max_depth = max(max_depth, tree.max_depth)
+
+    return CompactForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        right=np.concatenate(rights),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=np.asarray(forest.classes_),
+        max_depth=max_depth
+    )
+
+class CompactForest:
+    """Array-backed random forest evaluated with NumPy only"""
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def _arrays(self):
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'roots': self.roots,
+            'classes': self.classes_,
+            'max_depth': np.asarray(self.max_depth)
+        }
+
+    def save(self, path, **extra_arrays):
+        """Write the forest, plus any extra named arrays, to a new path
+
+        A path ending in .npz gets a single uncompressed .npz file; any other path
+        a new directory with one .npy file per array, which load() memory-maps.
+        Use publish() to replace a forest that readers may be loading.
+        """
+        arrays = dict(self._arrays(), **extra_arrays)
+        if path.endswith('.npz'):
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, **arrays)
+            # Replace atomically so readers never load a half-written file
+            os.replace(tmp_path, path)
+            return
+
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(array), allow_pickle=False)
+        os.rename(tmp_path, path)
+
+    def publish(self, path, **extra_arrays):
+        """Save the forest as a new immutable version under the directory path; returns the version
+
+        Each version is a subdirectory written by save() and CURRENT is replaced
+        atomically to point at it, the way the model registry works, so a reader
+        resolving path gets one complete version or the other. The previous
+        version is kept for readers that resolved it just before the swap; older
+        ones are removed.
+        """
+        os.makedirs(path, exist_ok=True)
+        previous = self.current_version(path)
+        version = registry.new_version()
+        self.save(os.path.join(path, version), **extra_arrays)
+        registry.write_atomic(os.path.join(path, CURRENT_FILE), version + '\n')
+
+        for name in os.listdir(path):
+            entry = os.path.join(path, name)
+            if name in (version, previous, CURRENT_FILE) or name.startswith('.') or '.tmp' in name:
+                continue
+            # Arrays of the flat layout written before versioning, and versions two swaps old
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            elif name.endswith('.npy'):
+                os.remove(entry)
+        return version
+
+    @staticmethod
+    def current_version(path):
+        """Return the version CURRENT points at in a published directory, or None"""
+        try:
+            with open(os.path.join(path, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    @classmethod
+    def resolve(cls, path):
+        """Return the file or directory holding the arrays: a published directory's current version, else path"""
+        version = cls.current_version(path)
+        return os.path.join(path, version) if version else path
+
+    @staticmethod
+    def _read_arrays(path, mmap):
+        if os.path.isdir(path):
+            arrays = {
+                name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode='r' if mmap else None,
+                                             allow_pickle=False)
+                for name in os.listdir(path) if name.endswith('.npy')
+            }
+            # Plain ndarray views of the maps; the memmap subclass adds overhead to every indexing call
+            return {name: np.asarray(array) for name, array in arrays.items()}
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a forest saved with save() or publish(); returns (forest, extra_arrays)
+
+        Arrays in a directory are memory-mapped read-only unless mmap=False, so
+        every process loading the same files shares one page-cache copy.
+        """
+        while True:
+            resolved = cls.resolve(path)
+            try:
+                arrays = cls._read_arrays(resolved, mmap)
+                forest = cls(
+                    feature=arrays.pop('feature'),
+                    threshold=arrays.pop('threshold'),
+                    left=arrays.pop('left'),
+                    right=arrays.pop('right'),
+                    value=arrays.pop('value'),
+                    roots=arrays.pop('roots'),
+                    classes=arrays.pop('classes'),
+                    max_depth=arrays.pop('max_depth')
+                )
+                break
+            except (FileNotFoundError, KeyError):
+                # Files were removed while being read by publishes since resolving; read the new version
+                if cls.resolve(path) == resolved:
+                    raise
+        return forest, arrays
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+
+        # Walk every tree for every sample together; leaves loop back to themselves
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Average the per-tree class probabilities, matching RandomForestClassifier.predict_proba"""
+        return self.value[self.apply(X)].mean(axis=1)
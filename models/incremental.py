@@ -0,0 +1,282 @@
+"""
+Incremental training from placed orders
+Orders are copied into the order event buffer (order_events.py). When enough events
+have arrived since the serving model was built, the model is updated with a warm
+start: its existing trees are kept and a few new trees are grown on the new events
+alone, with the oldest trees retired past a cap. The newest events are held out of
+training, and the update is only published to the model registry if it scores at
+least as well on them as the serving model; the web workers then pick it up like
+any other version. Each version's manifest records how many buffered events it has
+consumed, so an update only ever reads the events after that position and costs
+time in proportion to the new data, not the whole history.
+
+The web app runs updates through IncrementalScheduler: a background thread in one
+process per host that syncs the buffer and, when there is enough new data, runs
+`python -m models.incremental --once` in a subprocess, so scikit-learn is never
+imported by a web worker and no request thread does any of the work. Both rely
+on fcntl file locks, so incremental training is off where those don't exist.
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from . import registry
+from .compact_forest import CompactForest, flatten_forest
+from .recommendation_model import FOREST_FILE, MODEL_FILE, ModelState
+
+log = logging.getLogger(__name__)
+
+EVENT_BUFFER_PATH = 'data/order_events'
+ORDER_DB_PATH = 'data/orders.sqlite3'
+
+# The event buffer and the scheduler's leader election use fcntl file locks, so
+# incremental training is unavailable without them (on Windows)
+AVAILABLE = fcntl is not None
+
+# New events needed before an update is worth running
+MIN_NEW_EVENTS = int(os.getenv('INCREMENTAL_MIN_EVENTS', '200'))
+
+# Trees grown on each batch of new events, and the most trees a model keeps
+TREES_PER_UPDATE = 10
+MAX_TREES = 300
+
+# Share of the new events, the most recent ones, held out to compare the update with the serving model
+HOLDOUT_FRACTION = 0.2
+
+def serving_artifacts(registry_dir=registry.REGISTRY_DIR):
+    """Return (version, directory, events_consumed) for the model currently served"""
+    version = registry.current_version(registry_dir)
+    if version is None:
+        return None, 'models', 0
+    manifest = registry.read_manifest(registry_dir, version)
+    return version, registry.version_dir(registry_dir, version), manifest.get('events_consumed', 0)
+
+def pending_events(buffer, registry_dir=registry.REGISTRY_DIR):
+    """Return how many buffered events the serving model hasn't been trained on"""
+    _, _, consumed = serving_artifacts(registry_dir)
+    return max(0, len(buffer) - consumed)
+
+def _forest_path(directory):
+    path = os.path.join(directory, FOREST_FILE)
+    return path if os.path.exists(path) or not os.path.exists(f"{path}.npz") else f"{path}.npz"
+
+def event_rows(state, events, categories):
+    """Encode events for the state's model, expanded over customer profiles
+
+    Returns (X, y, sample_weight, n_used): each event becomes one row per training
+    profile, weighted by the profile's share, with purchased as the target. Events
+    whose labels the model doesn't know are skipped.
+    """
+    codes = {}
+    for field in ('color', 'slate_width', 'product'):
+        index = state.label_index[field]
+        codes[field] = np.array([index.get(label, -1) for label in categories[field]] or [-1], dtype=np.int64)
+
+    color = codes['color'][events['color']]
+    slate_width = codes['slate_width'][events['slate_width']]
+    product = codes['product'][events['product']]
+    known = (color >= 0) & (slate_width >= 0) & (product >= 0)
+
+    configs = np.column_stack([color[known], slate_width[known], events['windows'][known].astype(np.int64)])
+    n_profiles = len(state.profile_weights)
+    X = state.feature_rows(configs, product[known])
+    y = np.repeat(events['purchased'][known].astype(np.int64), n_profiles)
+    sample_weight = np.tile(state.profile_weights, int(known.sum()))
+    return X, y, sample_weight, int(known.sum())
+
+def _progressive_metrics(state, X, y, n_events):
+    """Score a forest on events it hasn't learned from"""
+    from sklearn.metrics import accuracy_score, log_loss
+
+    n_profiles = len(state.profile_weights)
+    probabilities = state.predict_proba(X).reshape(n_events, n_profiles) @ state.profile_weights
+    purchased = y[::n_profiles]
+    return {
+        'log_loss': float(log_loss(purchased, probabilities, labels=[0, 1])),
+        'accuracy': float(accuracy_score(purchased, probabilities > 0.5)),
+        'purchase_rate': float(purchased.mean())
+    }
+
+def update(buffer, registry_dir=registry.REGISTRY_DIR, min_events=MIN_NEW_EVENTS,
+           trees_per_update=TREES_PER_UPDATE, max_trees=MAX_TREES):
+    """Grow the serving model on the events it hasn't seen and publish it; returns the new version or None"""
+    import joblib
+
+    start = time.perf_counter()
+    parent, directory, consumed = serving_artifacts(registry_dir)
+    events, categories = buffer.read(consumed)
+    if len(events) < min_events:
+        print(f"{len(events)} new events, waiting for {min_events}")
+        return None
+
+    forest, arrays = CompactForest.load(_forest_path(directory))
+    state = ModelState(forest, arrays)
+    events = np.asarray(events)
+    split = len(events) - max(1, int(len(events) * HOLDOUT_FRACTION))
+    X, y, sample_weight, n_used = event_rows(state, events[:split], categories)
+    X_holdout, y_holdout, _, n_holdout = event_rows(state, events[split:], categories)
+    # Trees grown on a single class would only ever predict that class
+    if n_used == 0 or len(np.unique(y)) < 2:
+        print(f"{len(events)} new events lack both purchased and passed-over products, waiting for more")
+        return None
+    if n_holdout == 0:
+        print(f"None of the newest {len(events) - split} events can be scored, waiting for more")
+        return None
+    parent_progressive = _progressive_metrics(state, X_holdout, y_holdout, n_holdout)
+
+    # Warm start keeps the fitted trees and fits only the added ones, on the new rows
+    model = joblib.load(os.path.join(directory, MODEL_FILE))
+    n_trees = len(model.estimators_)
+    model.set_params(warm_start=True, n_estimators=n_trees + trees_per_update, n_jobs=-1)
+    model.fit(X, y, sample_weight=sample_weight)
+
+    # Retire the oldest trees so recent behavior keeps its weight
+    dropped = max(0, len(model.estimators_) - max_trees)
+    if dropped:
+        model.estimators_ = model.estimators_[dropped:]
+        model.n_estimators = len(model.estimators_)
+    model.set_params(warm_start=False)
+    new_forest = flatten_forest(model)
+
+    # Quality gate: the update must do no worse than the serving model on the held-out events
+    progressive = _progressive_metrics(ModelState(new_forest, arrays), X_holdout, y_holdout, n_holdout)
+    if progressive['log_loss'] > parent_progressive['log_loss']:
+        print(f"Not publishing: log loss on the newest {n_holdout} events would rise from "
+              f"{parent_progressive['log_loss']:.4f} to {progressive['log_loss']:.4f}")
+        return None
+
+    def write_artifacts(version_directory):
+        new_forest.save(os.path.join(version_directory, FOREST_FILE), **arrays)
+        joblib.dump(model, os.path.join(version_directory, MODEL_FILE))
+
+    manifest = {
+        'params': model.get_params(),
+        'parent': parent,
+        # Held-out events are left for the next update to train on
+        'events_consumed': consumed + split,
+        'metrics': {'progressive': progressive, 'parent_progressive': parent_progressive},
+        'forest': {'n_trees': new_forest.n_trees, 'n_nodes': new_forest.n_nodes, 'max_depth': new_forest.max_depth},
+        'incremental': {
+            'new_events': len(events),
+            'events_used': n_used,
+            'holdout_events': n_holdout,
+            'trees_added': trees_per_update,
+            'trees_retired': dropped,
+            'seconds': time.perf_counter() - start
+        }
+    }
+    version = registry.publish(registry_dir, write_artifacts, manifest)
+    print(f"Published model version {version}: {n_used} new events, {new_forest.n_trees} trees "
+          f"(progressive log loss {progressive['log_loss']:.4f})")
+    return version
+
+def sync_and_update(order_db_path=ORDER_DB_PATH, buffer_path=EVENT_BUFFER_PATH, **kwargs):
+    from order_events import OrderEventBuffer
+    from order_store import OrderStore
+
+    buffer = OrderEventBuffer(buffer_path)
+    added = buffer.sync(OrderStore(order_db_path))
+    print(f"Buffered {added} new order events ({len(buffer)} total)")
+    return update(buffer, **kwargs)
+
+class IncrementalScheduler:
+    """Runs incremental updates in the background of one web process per host
+
+    Every process starts the thread, but only the one holding the lock file does
+    any work; if it exits, another process takes over on its next attempt.
+    """
+
+    def __init__(self, interval, order_store, buffer_path=EVENT_BUFFER_PATH,
+                 registry_dir=registry.REGISTRY_DIR, min_events=MIN_NEW_EVENTS):
+        self.interval = interval
+        self.order_store = order_store
+        self.buffer_path = buffer_path
+        self.registry_dir = registry_dir
+        self.min_events = min_events
+        self.counters = {'syncs': 0, 'updates': 0, 'failures': 0}
+        self.leader = False
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start this process's scheduler thread (threads don't survive a fork)"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    threading.Thread(target=self._run, name='incremental-training', daemon=True).start()
+                    self._pid = os.getpid()
+
+    def _run(self):
+        from order_events import OrderEventBuffer
+
+        buffer = OrderEventBuffer(self.buffer_path)
+        lock_file = open(os.path.join(self.buffer_path, 'scheduler.lock'), 'w')
+        while True:
+            time.sleep(self.interval)
+            if not self.leader:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self.leader = True
+                except BlockingIOError:
+                    continue
+            try:
+                buffer.sync(self.order_store)
+                self.counters['syncs'] += 1
+                if pending_events(buffer, self.registry_dir) >= self.min_events:
+                    self._run_update()
+            except Exception as e:
+                self.counters['failures'] += 1
+                log.error("Incremental training check failed: %s", e)
+
+    def _run_update(self):
+        result = subprocess.run(
+            [sys.executable, '-m', 'models.incremental', '--once', '--skip-sync',
+             '--buffer', self.buffer_path, '--registry', self.registry_dir, '--min-events', str(self.min_events)],
+            capture_output=True, text=True
+        )
+        if result.returncode == 0:
+            self.counters['updates'] += 1
+            log.info("Incremental training finished: %s", result.stdout.strip().splitlines()[-1:])
+        else:
+            self.counters['failures'] += 1
+            log.error("Incremental training failed: %s", result.stderr.strip()[-2000:])
+
+    def stats(self):
+        return dict(self.counters, pid=os.getpid(), leader=self.leader, interval=self.interval)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Update the recommendation model from placed orders")
+    parser.add_argument('--once', action='store_true', help='run one update and exit')
+    parser.add_argument('--interval', type=float, default=600, help='seconds between updates when looping')
+    parser.add_argument('--orders', default=os.getenv('ORDER_DB_PATH', ORDER_DB_PATH), help='order database')
+    parser.add_argument('--buffer', default=EVENT_BUFFER_PATH, help='order event buffer directory')
+    parser.add_argument('--registry', default=registry.REGISTRY_DIR)
+    parser.add_argument('--min-events', type=int, default=MIN_NEW_EVENTS)
+    parser.add_argument('--trees', type=int, default=TREES_PER_UPDATE, help='trees added per update')
+    parser.add_argument('--max-trees', type=int, default=MAX_TREES)
+    parser.add_argument('--skip-sync', action='store_true', help="don't copy new orders into the buffer first")
+    args = parser.parse_args()
+
+    options = dict(registry_dir=args.registry, min_events=args.min_events,
+                   trees_per_update=args.trees, max_trees=args.max_trees)
+    while True:
+        if args.skip_sync:
+            from order_events import OrderEventBuffer
+            update(OrderEventBuffer(args.buffer), **options)
+        else:
+            sync_and_update(args.orders, args.buffer, **options)
+        if args.once:
+            break
+        time.sleep(args.interval)
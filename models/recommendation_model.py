@@ -1,28 +1,252 @@
-import pandas as pd
+import logging
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import LabelEncoder
-from sklearn.ensemble import RandomForestClassifier
-import joblib
 import os
-import random
+import threading
+import time
+
+from . import registry
+from .compact_forest import CompactForest, flatten_forest
+
+# pandas, scikit-learn and joblib are only imported when training or converting
+# legacy pickles, so the serving path loads with NumPy alone.
+
+log = logging.getLogger(__name__)
+
+# Training data written by generate_data.py, and the columnar cache it is converted into
+TRAINING_DATA_PATH = 'data/product_recommendations.csv'
+TRAINING_CACHE_PATH = 'data/product_recommendations.columnar'
+
+# Columns read from the training CSV; categorical labels are coded as they are found (see columnar.convert_csv)
+TRAINING_COLUMNS = {
+    'color': (np.uint8, []),
+    'slate_width': (np.uint8, []),
+    'windows': (np.bool_, None),
+    'customer_budget': (np.uint8, []),
+    'tech_savvy': (np.bool_, None),
+    'security_conscious': (np.bool_, None),
+    'product': (np.uint8, []),
+    'product_category': (np.uint8, []),
+    'product_price': (np.float64, None),
+    'recommended': (np.uint8, None)
+}
+
+# Model inputs in column order. The customer profile isn't known when serving a
+# configuration, so predictions average over the profiles seen in training.
+FEATURE_COLUMNS = ['color', 'slate_width', 'windows', 'product', 'customer_budget', 'tech_savvy',
+                   'security_conscious', 'product_category', 'product_price']
+CONFIGURATION_COLUMNS = ['color', 'slate_width', 'windows']
+PRODUCT_COLUMNS = ['product_category', 'product_price']
+PROFILE_COLUMNS = ['customer_budget', 'tech_savvy', 'security_conscious']
+
+# Categorical columns encoded as integer codes
+CATEGORICAL_COLUMNS = ['color', 'slate_width', 'product', 'customer_budget', 'product_category']
+
+# Inputs of models trained before the profile features were used
+LEGACY_FEATURE_COLUMNS = ['color', 'slate_width', 'windows', 'product']
+
+# Rows sampled from the training table for one run, bounding training memory
+MAX_TRAINING_ROWS = int(os.getenv('MODEL_MAX_TRAINING_ROWS', '2000000'))
+
+# Number of recommendations returned for a configuration
+TOP_N = 4
+
+# Minimum probability for a product to be recommended
+RECOMMENDATION_THRESHOLD = 0.5
+
+# Seconds between checks of the model artifacts for changes
+ARTIFACT_CHECK_INTERVAL = 5.0
+
+# Artifact file names, in models/ and in each registry version; the forest is a
+# directory of .npy files that is memory-mapped when loaded (in models/, published
+# as immutable versions behind a CURRENT pointer)
+FOREST_FILE = 'recommendation_forest'
+MODEL_FILE = 'recommendation_model.pkl'
+
+def load_training_data(data_path=TRAINING_DATA_PATH, cache_path=TRAINING_CACHE_PATH, max_rows=MAX_TRAINING_ROWS):
+    """Read the training data through its columnar cache
+    
+    Returns (X, y, feature_arrays, info): the float32 feature matrix in
+    FEATURE_COLUMNS order, the target, the arrays describing the inputs that are
+    saved with a trained forest, and a summary of the data for manifests.
+    """
+    from columnar import load_csv_cached, source_signature
+    
+    if not os.path.exists(data_path):
+        raise FileNotFoundError(f"No training data at {data_path}; run `python generate_data.py` first")
+    table, meta = load_csv_cached(data_path, cache_path, TRAINING_COLUMNS)
+    
+    # Sample rows from large tables; sorted indices keep reads from the memory map sequential
+    n_rows = meta['n_rows']
+    if n_rows > max_rows:
+        rows = np.sort(np.random.default_rng(42).choice(n_rows, max_rows, replace=False))
+    else:
+        rows = slice(None)
+    columns = {col: np.asarray(table[col][rows]) for col in FEATURE_COLUMNS + ['recommended']}
+    
+    # Prepare features and target
+    X = np.column_stack([columns[col].astype(np.float32) for col in FEATURE_COLUMNS])
+    y = columns['recommended']
+    
+    # Profile mix of the training data, used to average predictions over profiles
+    profiles, counts = np.unique(
+        np.column_stack([columns[col] for col in PROFILE_COLUMNS]).astype(np.float64),
+        axis=0, return_counts=True
+    )
+    
+    # Category and price of each product code, from its first row
+    product_labels = meta['columns']['product']['categories']
+    codes, first_rows = np.unique(columns['product'], return_index=True)
+    by_product = {}
+    for col in PRODUCT_COLUMNS:
+        by_product[col] = np.zeros(len(product_labels), dtype=np.float64)
+        by_product[col][codes] = columns[col][first_rows]
+    
+    feature_arrays = {
+        'feature_columns': np.asarray(FEATURE_COLUMNS),
+        'profiles': profiles,
+        'profile_weights': counts / counts.sum(),
+        **{f'labels_{col}': np.asarray(meta['columns'][col]['categories']) for col in CATEGORICAL_COLUMNS},
+        **{f'by_product_{col}': values for col, values in by_product.items()}
+    }
+    info = {'path': data_path, 'source': source_signature(data_path), 'rows': n_rows, 'rows_used': len(y)}
+    return X, y, feature_arrays, info
+
+class ModelState:
+    """A loaded forest with everything needed to encode inputs and serve predictions
+    
+    States are built completely, lookup table included, before being swapped in,
+    and never change afterwards, so a request that takes a reference to one sees
+    a single consistent model.
+    """
+    
+    def __init__(self, forest, arrays, version=None, path=None, signature=None):
+        self.forest = forest
+        self.version = version
+        self.path = path
+        self.signature = signature
+        self.loaded_at = time.time()
+        
+        # Artifacts from before the profile features only have the configuration
+        # and product labels, the product's under labels_recommended_product
+        if 'feature_columns' in arrays:
+            self.feature_columns = [str(col) for col in arrays['feature_columns']]
+            # Customer profiles (rows of PROFILE_COLUMNS codes) and their share of the training data
+            self.profiles = np.asarray(arrays['profiles'], dtype=np.float64)
+            self.profile_weights = np.asarray(arrays['profile_weights'], dtype=np.float64)
+            # Product-derived feature values, indexed by product code
+            self.product_features = {
+                col: np.asarray(arrays[f'by_product_{col}'], dtype=np.float64)
+                for col in PRODUCT_COLUMNS if col in self.feature_columns
+            }
+            classes_by_column = {
+                col: arrays[f'labels_{col}'] for col in CATEGORICAL_COLUMNS if col in self.feature_columns
+            }
+        else:
+            self.feature_columns = LEGACY_FEATURE_COLUMNS
+            self.profiles = np.empty((1, 0))
+            self.profile_weights = np.ones(1)
+            self.product_features = {}
+            classes_by_column = {
+                'color': arrays['labels_color'],
+                'slate_width': arrays['labels_slate_width'],
+                'product': arrays['labels_recommended_product']
+            }
+        
+        # Label vocabulary used to encode inputs, in code order
+        self.label_classes = {col: [str(label) for label in classes] for col, classes in classes_by_column.items()}
+        self.label_index = {
+            col: {label: i for i, label in enumerate(classes)}
+            for col, classes in self.label_classes.items()
+        }
+        
+        # Precomputed top-N recommendations for every known configuration
+        self.lookup_table = {}
+    
+    def encode(self, column, value):
+        """Encode a categorical value, raising ValueError for unseen labels like LabelEncoder"""
+        try:
+            return self.label_index[column][value]
+        except (KeyError, TypeError):
+            raise ValueError(f"y contains previously unseen labels: {value!r}")
+    
+    def predict_proba(self, X):
+        """Return the probability that each encoded row is a recommended product"""
+        positive = list(self.forest.classes_).index(1)
+        return self.forest.predict_proba(X)[:, positive]
+    
+    def feature_rows(self, configs, product_codes):
+        """Build model inputs for configuration and product pairs, each expanded over every customer profile
+        
+        configs is an (n, 3) array of encoded color, slate_width and windows, paired
+        with n product codes. Rows are ordered by pair, then profile.
+        """
+        n_pairs, n_profiles = len(configs), len(self.profile_weights)
+        product_codes = np.asarray(product_codes)
+        X = np.empty((n_pairs * n_profiles, len(self.feature_columns)), dtype=np.float64)
+        for j, col in enumerate(self.feature_columns):
+            if col in CONFIGURATION_COLUMNS:
+                X[:, j] = np.repeat(configs[:, CONFIGURATION_COLUMNS.index(col)], n_profiles)
+            elif col == 'product' or col in self.product_features:
+                values = product_codes if col == 'product' else self.product_features[col][product_codes]
+                X[:, j] = np.repeat(values, n_profiles)
+            else:
+                X[:, j] = np.tile(self.profiles[:, PROFILE_COLUMNS.index(col)], n_pairs)
+        return X
+    
+    def feature_matrix(self, configs, product_codes):
+        """Build model inputs for every (configuration, product, customer profile) combination
+        
+        Rows are ordered by configuration, then product, then profile.
+        """
+        product_codes = np.asarray(product_codes)
+        return self.feature_rows(
+            np.repeat(configs, len(product_codes), axis=0), np.tile(product_codes, len(configs))
+        )
 
 class ProductRecommendationModel:
-    def __init__(self):
+    def __init__(self, train_if_missing=True, forest_path=None, registry_dir=registry.REGISTRY_DIR,
+                 check_interval=ARTIFACT_CHECK_INTERVAL):
         self.model = None
         self.encoders = {}
         self.products = self._get_products()
-        self.model_path = 'models/recommendation_model.pkl'
+        self.model_path = f'models/{MODEL_FILE}'
         self.encoders_path = 'models/encoders.pkl'
+        # An explicit forest_path pins the model to that file, which must already exist
+        # (shadow candidates); otherwise the registry's current version is served once
+        # one has been published
+        self.pinned = forest_path is not None
+        self.forest_path = forest_path or f'models/{FOREST_FILE}'
+        self.registry_dir = registry_dir if forest_path is None else None
+        
+        # The serving state; replaced as a whole, never modified in place
+        self._state = None
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._failed_signature = None
+        self._watcher_pid = None
+        self._lock = threading.Lock()
         
         # Create models directory if it doesn't exist
         os.makedirs('models', exist_ok=True)
         
         # Load or train model
-        if os.path.exists(self.model_path) and os.path.exists(self.encoders_path):
+        if self.pinned and not os.path.exists(self._serving_path()[1]):
+            raise FileNotFoundError(f"No compact forest at {self.forest_path}")
+        if os.path.exists(self._serving_path()[1]) or (
+                os.path.exists(self.model_path) and os.path.exists(self.encoders_path)):
             self.load_model()
-        else:
+        elif train_if_missing:
             self.train_model()
+        else:
+            raise FileNotFoundError(
+                f"No trained model at {self.forest_path}; run `python initialize_app.py` to train one"
+            )
+    
+    # Read-only views of the current state
+    forest = property(lambda self: self._state.forest if self._state else None)
+    version = property(lambda self: self._state.version if self._state else None)
+    label_classes = property(lambda self: self._state.label_classes if self._state else {})
+    lookup_table = property(lambda self: self._state.lookup_table if self._state else {})
     
     def _get_products(self):
         """Define available additional products"""
@@ -79,156 +303,369 @@ class ProductRecommendationModel:
             }
         }
     
-    def _generate_synthetic_data(self, n_samples=1000):
-        """Generate synthetic training data"""
-        np.random.seed(42)
-        random.seed(42)
+    def train_model(self, data_path=TRAINING_DATA_PATH, cache_path=TRAINING_CACHE_PATH):
+        """Train the recommendation model from the generated training data
         
-        data = []
+        The CSV is converted once into a memory-mapped columnar cache; later runs
+        read the cache directly until the CSV changes.
+        """
+        from sklearn.model_selection import train_test_split
+        from sklearn.ensemble import RandomForestClassifier
+        import joblib
         
-        for _ in range(n_samples):
-            # Base configuration
-            color = random.choice(['grey', 'white'])
-            slate_width = random.choice(['narrow', 'wide'])
-            windows = random.choice([True, False])
-            
-            # Generate realistic product recommendations based on configuration
-            recommended_products = []
-            
-            # Base recommendations (high probability for everyone)
-            if random.random() > 0.3:  # 70% chance
-                recommended_products.append('garage_door_opener')
-            if random.random() > 0.4:  # 60% chance
-                recommended_products.append('remote_control')
-            if random.random() > 0.5:  # 50% chance
-                recommended_products.append('safety_sensors')
-            
-            # Configuration-specific recommendations
-            if windows:
-                if random.random() > 0.3:  # Windows = more likely to want smart features
-                    recommended_products.append('smart_controller')
-                if random.random() > 0.4:
-                    recommended_products.append('keypad_entry')
-            
-            if slate_width == 'wide':
-                if random.random() > 0.4:  # Wider doors = more likely to need insulation
-                    recommended_products.append('insulation_kit')
-                if random.random() > 0.5:
-                    recommended_products.append('weather_stripping')
-            
-            if color == 'white':
-                if random.random() > 0.6:  # White doors = premium choice = more accessories
-                    recommended_products.append('backup_battery')
-                if random.random() > 0.5:
-                    recommended_products.append('installation_kit')
-            
-            # Always include maintenance for some variety
-            if random.random() > 0.7:
-                recommended_products.append('maintenance_kit')
-            
-            # Create individual records for each recommended product
-            for product in recommended_products:
-                data.append({
-                    'color': color,
-                    'slate_width': slate_width,
-                    'windows': windows,
-                    'recommended_product': product,
-                    'target': 1  # This product is recommended
-                })
-            
-            # Add some negative examples (products not recommended)
-            all_products = list(self.products.keys())
-            not_recommended = [p for p in all_products if p not in recommended_products]
-            
-            # Add a few negative examples
-            for product in random.sample(not_recommended, min(2, len(not_recommended))):
-                data.append({
-                    'color': color,
-                    'slate_width': slate_width,
-                    'windows': windows,
-                    'recommended_product': product,
-                    'target': 0  # This product is not recommended
-                })
-        
-        return pd.DataFrame(data)
-    
-    def train_model(self):
-        """Train the recommendation model"""
         print("Training recommendation model...")
-        
-        # Generate synthetic data
-        df = self._generate_synthetic_data()
-        
-        # Encode categorical variables
-        categorical_cols = ['color', 'slate_width', 'recommended_product']
-        
-        for col in categorical_cols:
-            self.encoders[col] = LabelEncoder()
-            df[col + '_encoded'] = self.encoders[col].fit_transform(df[col])
-        
-        # Convert boolean to int
-        df['windows_encoded'] = df['windows'].astype(int)
-        
-        # Prepare features and target
-        feature_cols = ['color_encoded', 'slate_width_encoded', 'windows_encoded', 'recommended_product_encoded']
-        X = df[feature_cols]
-        y = df['target']
+        X, y, feature_arrays, _ = load_training_data(data_path, cache_path)
         
         # Split data
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         # Train model
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
+        self.model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
         self.model.fit(X_train, y_train)
+        print(f"Model trained on {len(X_train)} rows with accuracy: {self.model.score(X_test, y_test):.3f}")
         
         # Save model and encoders
+        self.encoders = feature_arrays
         joblib.dump(self.model, self.model_path)
         joblib.dump(self.encoders, self.encoders_path)
         
-        print(f"Model trained with accuracy: {self.model.score(X_test, y_test):.3f}")
+        self.export_compact_forest()
+        # Serve from disk, like a restart would; a published registry version takes precedence
+        self.load_model()
+    
+    def _serving_path(self):
+        """Return (version, path) of the forest to serve: the registry's current version, else forest_path"""
+        version = registry.current_version(self.registry_dir) if self.registry_dir else None
+        if version:
+            path = os.path.join(registry.version_dir(self.registry_dir, version), FOREST_FILE)
+        else:
+            path = self.forest_path
+        # Artifacts written before the directory format are single .npz files
+        if not os.path.exists(path) and os.path.exists(f"{path}.npz"):
+            path = f"{path}.npz"
+        return version, path
     
     def load_model(self):
-        """Load pre-trained model and encoders"""
-        self.model = joblib.load(self.model_path)
-        self.encoders = joblib.load(self.encoders_path)
+        """Load the serving artifacts into a new state and swap it in"""
+        version, path = self._serving_path()
+        if version is None and not os.path.exists(path):
+            if self.pinned:
+                # Never write the live model's artifacts into a pinned candidate's path
+                raise FileNotFoundError(f"No compact forest at {path}")
+            # Convert legacy pickles once; later loads skip sklearn entirely
+            import joblib
+            
+            print("Converting pickled model to compact forest format...")
+            self.model = joblib.load(self.model_path)
+            self.encoders = joblib.load(self.encoders_path)
+            self.export_compact_forest()
+        
+        # Load exactly the version the signature describes, even if a newer one was published since
+        signature = self._get_artifact_signature()
+        if signature:
+            path = signature[1]
+        forest, arrays = CompactForest.load(path)
+        state = ModelState(forest, arrays, version, path, signature)
+        self.build_lookup_table(state)
+        
+        # A single reference assignment: requests see the old state or the new one
+        self._state = state
+        if version:
+            print(f"Loaded model version {version}")
+    
+    def export_compact_forest(self):
+        """Flatten the trained forest into NumPy node arrays for sklearn-free serving"""
+        forest = flatten_forest(self.model)
+        forest.publish(self.forest_path, **_encoder_arrays(self.encoders))
+        print(f"Exported compact forest: {forest.n_trees} trees, {forest.n_nodes} nodes")
+    
+    def _get_artifact_signature(self):
+        """Return the (version, path, inode, mtime) of the serving artifact, or None if missing
+        
+        path is the resolved forest version, which is never modified once written,
+        so a new version always has a new path or inode.
+        """
+        version, path = self._serving_path()
+        path = CompactForest.resolve(path)
+        try:
+            stat = os.stat(path)
+            return (version, path, stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return None
+    
+    def check_for_update(self):
+        """Load and swap in the artifacts if they changed on disk; returns True if a new state was swapped in"""
+        signature = self._get_artifact_signature()
+        if signature is None or signature == self._state.signature or signature == self._failed_signature:
+            return False
+        
+        log.info("Model artifacts changed on disk, reloading")
+        try:
+            self.load_model()
+        except Exception as e:
+            # Keep serving the current state; don't retry until the artifacts change again
+            log.error("Error reloading model, keeping version %s: %s", self.version, e)
+            self._failed_signature = signature
+            return False
+        self.reloads += 1
+        log.info("Now serving model version %s", self.version)
+        return True
+    
+    def _ensure_watcher(self):
+        """Start this process's artifact watcher (threads don't survive a fork)"""
+        if self._watcher_pid != os.getpid():
+            with self._lock:
+                if self._watcher_pid != os.getpid():
+                    threading.Thread(target=self._watch, name='model-watcher', daemon=True).start()
+                    self._watcher_pid = os.getpid()
+    
+    def _watch(self):
+        # Loads happen here, off the request threads; requests keep using the old state until the swap
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                self.check_for_update()
+            except Exception as e:
+                log.error("Error checking model artifacts: %s", e)
+    
+    def stats(self):
+        """Describe the state this process is serving"""
+        state = self._state
+        return {
+            'pid': os.getpid(),
+            'version': state.version,
+            'path': state.path,
+            'loaded_at': state.loaded_at,
+            'reloads': self.reloads,
+            'n_trees': state.forest.n_trees,
+            'n_nodes': state.forest.n_nodes,
+            'memory_mapped': isinstance(getattr(state.forest.value, 'base', None), np.memmap),
+            'lookup_configurations': len(state.lookup_table)
+        }
+    
+    def build_lookup_table(self, state):
+        """Precompute ranked recommendations for every configuration the state's labels know"""
+        keys = []
+        for color in state.label_classes['color']:
+            for slate_width in state.label_classes['slate_width']:
+                for windows in (True, False):
+                    keys.append((color, slate_width, windows))
+        
+        # Score the whole configuration space with a single batch call
+        results = self._predict_batch(state, [
+            {'color': color, 'slate_width': slate_width, 'windows': windows}
+            for color, slate_width, windows in keys
+        ])
+        
+        # Failed predictions are left out rather than cached as default products, so
+        # those configurations fall through to live prediction in predict()
+        table = {}
+        for key, result in zip(keys, results):
+            if 'recommendations' in result:
+                table[key] = tuple(result['recommendations'])
+        
+        state.lookup_table = table
+        print(f"Built recommendation lookup table for {len(table)} configurations")
+    
+    def predict_batch(self, configurations):
+        """Predict recommended products for many configurations at once
+        
+        Every (configuration, product, customer profile) combination is encoded
+        into one matrix and scored with a single predict_proba call. Returns one
+        entry per configuration, either {'recommendations': [...]} or
+        {'error': message}, so a bad row does not fail the rest of the batch.
+        """
+        self._ensure_watcher()
+        return self._predict_batch(self._state, configurations)
+    
+    def _predict_batch(self, state, configurations):
+        product_keys = list(self.products.keys())
+        product_codes = [state.encode('product', key) for key in product_keys]
+        color_index = state.label_index['color']
+        width_index = state.label_index['slate_width']
+        
+        results = [None] * len(configurations)
+        valid_rows = []
+        encoded_configs = []
+        
+        for i, config in enumerate(configurations):
+            if not isinstance(config, dict):
+                results[i] = {'error': 'Configuration must be an object'}
+                continue
+            color = config.get('color')
+            slate_width = config.get('slate_width')
+            windows = config.get('windows')
+            if not isinstance(color, str) or color not in color_index:
+                results[i] = {'error': f"Unknown color: {color!r}"}
+                continue
+            if not isinstance(slate_width, str) or slate_width not in width_index:
+                results[i] = {'error': f"Unknown slate_width: {slate_width!r}"}
+                continue
+            if not isinstance(windows, bool):
+                results[i] = {'error': f"windows must be a boolean, got {windows!r}"}
+                continue
+            valid_rows.append(i)
+            encoded_configs.append((color_index[color], width_index[slate_width], int(windows)))
+        
+        if not valid_rows:
+            return results
+        
+        # One row per (configuration, product, profile); profiles are averaged by their training share
+        n_products = len(product_keys)
+        configs = np.asarray(encoded_configs, dtype=np.int64)
+        X = state.feature_matrix(configs, product_codes)
+        
+        try:
+            probabilities = state.predict_proba(X).reshape(
+                len(configs), n_products, len(state.profile_weights)
+            ) @ state.profile_weights
+        except Exception as e:
+            log.error("Error in batch prediction: %s", e)
+            for i in valid_rows:
+                results[i] = {'error': 'Prediction failed'}
+            return results
+        
+        for row, i in enumerate(valid_rows):
+            probs = probabilities[row]
+            # Stable sort keeps catalog order for ties, like the per-product path
+            ranked = sorted(
+                (j for j in range(n_products) if probs[j] > RECOMMENDATION_THRESHOLD),
+                key=lambda j: probs[j],
+                reverse=True
+            )
+            recommendations = []
+            for j in ranked[:TOP_N]:
+                product_info = self.products[product_keys[j]].copy()
+                product_info['probability'] = float(probs[j])
+                product_info['key'] = product_keys[j]
+                recommendations.append(product_info)
+            results[i] = {'recommendations': recommendations}
+        
+        return results
     
     def predict(self, color, slate_width, windows):
         """Predict recommended products for given configuration"""
+        self._ensure_watcher()
+        state = self._state
+        
         try:
-            recommendations = []
-            
-            # Get probabilities for each product
-            for product_key in self.products.keys():
-                # Prepare input data
-                input_data = {
-                    'color': color,
-                    'slate_width': slate_width,
-                    'windows': windows,
-                    'recommended_product': product_key
-                }
-                
-                # Encode input
-                encoded_data = []
-                encoded_data.append(self.encoders['color'].transform([input_data['color']])[0])
-                encoded_data.append(self.encoders['slate_width'].transform([input_data['slate_width']])[0])
-                encoded_data.append(int(input_data['windows']))
-                encoded_data.append(self.encoders['recommended_product'].transform([input_data['recommended_product']])[0])
-                
-                # Predict probability
-                prob = self.model.predict_proba([encoded_data])[0][1]  # Probability of recommendation
-                
-                if prob > 0.5:  # Threshold for recommendation
-                    product_info = self.products[product_key].copy()
-                    product_info['probability'] = prob
-                    product_info['key'] = product_key
-                    recommendations.append(product_info)
-            
-            # Sort by probability and return top recommendations
-            recommendations.sort(key=lambda x: x['probability'], reverse=True)
-            return recommendations[:4]  # Return top 4 recommendations
-            
-        except Exception as e:
-            print(f"Error in prediction: {e}")
-            # Return default recommendations as fallback
-            default_products = ['garage_door_opener', 'remote_control', 'safety_sensors', 'weather_stripping']
-            return [self.products[key] for key in default_products]
\ No newline at end of file
+            cached = state.lookup_table.get((color, slate_width, bool(windows)))
+        except TypeError:
+            cached = None
+        if cached is not None:
+            # Copy so callers can't mutate the shared table entries
+            return [dict(product) for product in cached]
+        
+        # Unknown configuration, fall back to live inference
+        return self._predict_live(color, slate_width, windows, state)
+    
+    def _predict_live(self, color, slate_width, windows, state=None):
+        """Run the classifier for one configuration and return the top recommendations"""
+        state = state or self._state
+        result = self._predict_batch(state, [{'color': color, 'slate_width': slate_width, 'windows': windows}])[0]
+        if 'recommendations' in result:
+            return result['recommendations']
+        
+        log.error("Error in prediction: %s", result['error'])
+        # Return default recommendations as fallback
+        default_products = ['garage_door_opener', 'remote_control', 'safety_sensors', 'weather_stripping']
+        return [dict(self.products[key], key=key) for key in default_products]
+
+def _encoder_arrays(encoders):
+    """Return the feature arrays stored in an encoders pickle
+    
+    Older pickles hold a dict of fitted LabelEncoders instead.
+    """
+    if 'feature_columns' in encoders:
+        return encoders
+    return {f'labels_{col}': np.asarray(encoder.classes_).astype(str) for col, encoder in encoders.items()}
+
+def verify_compact_forest(model_path=None, forest_path=None, tolerance=1e-9):
+    """Check that the compact forest reproduces sklearn's predict_proba on every row served
+    
+    Defaults to the registry's current version, or the files in models/ when
+    nothing has been published.
+    """
+    import itertools
+    import joblib
+    
+    if model_path is None and forest_path is None:
+        version = registry.current_version()
+        directory = registry.version_dir(registry.REGISTRY_DIR, version) if version else 'models'
+        model_path, forest_path = os.path.join(directory, MODEL_FILE), os.path.join(directory, FOREST_FILE)
+    
+    sklearn_model = joblib.load(model_path)
+    model = ProductRecommendationModel(train_if_missing=False, forest_path=forest_path)
+    
+    # Every configuration and product, with every customer profile seen in training
+    configs = np.array(list(itertools.product(
+        range(len(model.label_classes['color'])),
+        range(len(model.label_classes['slate_width'])),
+        (0, 1)
+    )), dtype=np.int64)
+    X = model._state.feature_matrix(configs, np.arange(len(model.label_classes['product'])))
+    
+    expected = sklearn_model.predict_proba(X)
+    actual = model.forest.predict_proba(X)
+    max_diff = float(np.abs(expected - actual).max())
+    print(f"Compared {len(X)} rows: max |difference| = {max_diff:.3e} (tolerance {tolerance:.0e})")
+    return max_diff <= tolerance
+
+def compare_load_cost(model_path='models/recommendation_model.pkl', encoders_path='models/encoders.pkl',
+                      forest_path=f'models/{FOREST_FILE}'):
+    """Measure startup time and peak RSS of the pickle load against the compact load in fresh interpreters"""
+    import json
+    import subprocess
+    import sys
+    
+    measure = (
+        "import json, resource, sys, time\n"
+        "start = time.perf_counter()\n"
+        "{load}\n"
+        "print(json.dumps({{'seconds': time.perf_counter() - start, "
+        "'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "
+        "'sklearn_loaded': 'sklearn' in sys.modules, 'pandas_loaded': 'pandas' in sys.modules}}))\n"
+    )
+    loaders = {
+        'pickle (joblib + sklearn)': (
+            f"import joblib\n"
+            f"joblib.load({model_path!r})\n"
+            f"joblib.load({encoders_path!r})"
+        ),
+        'compact (numpy only)': (
+            f"from models.compact_forest import CompactForest\n"
+            f"CompactForest.load({forest_path!r})"
+        )
+    }
+    
+    results = {}
+    for name, load in loaders.items():
+        output = subprocess.run(
+            [sys.executable, '-c', measure.format(load=load)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+        stats = results[name]
+        print(f"{name:28s} {stats['seconds'] * 1000:8.1f} ms  {stats['max_rss_mb']:7.1f} MB peak RSS  "
+              f"sklearn={stats['sklearn_loaded']} pandas={stats['pandas_loaded']}")
+    return results
+
+if __name__ == '__main__':
+    import sys
+    
+    command = sys.argv[1] if len(sys.argv) > 1 else 'export'
+    if command == 'export':
+        # Train if needed, then (re)write the compact forest from the pickles
+        model = ProductRecommendationModel()
+        if model.model is None:
+            import joblib
+            model.model = joblib.load(model.model_path)
+            model.encoders = joblib.load(model.encoders_path)
+            model.export_compact_forest()
+    elif command == 'verify':
+        sys.exit(0 if verify_compact_forest() else 1)
+    elif command == 'compare-load':
+        compare_load_cost()
+    else:
+        print("Usage: python -m models.recommendation_model [export|verify|compare-load]")
+        sys.exit(2)
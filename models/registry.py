@@ -0,0 +1,149 @@
+"""
+Versioned model registry
+Every published model is an immutable directory, models/registry/<version>/, holding
+its artifacts and a manifest.json with the parameters, metrics, training data and a
+hash of each file. CURRENT names the version being served and is replaced atomically,
+so readers see either the old version or the new one, never a mix of the two.
+Publishing prunes the registry down to the newest versions plus the current one.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+# MODEL_REGISTRY_DIR points a process at another registry, e.g. a load test's scratch copy
+REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', 'models/registry')
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+
+# Versions kept when pruning, besides whichever one CURRENT names
+KEEP_VERSIONS = int(os.getenv('MODEL_REGISTRY_KEEP', '10'))
+
+def new_version():
+    """Return a version name that sorts by publication time
+
+    Microseconds keep versions published within the same second in order, which pruning relies on.
+    """
+    now = time.time()
+    return f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}.{int(now % 1 * 1e6):06d}Z-{uuid.uuid4().hex[:6]}"
+
+def version_dir(registry_dir, version):
+    return os.path.join(registry_dir, version)
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def write_atomic(path, text):
+    """Write a small file durably and swap it into place"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def publish(registry_dir, write_artifacts, manifest, make_current=True, keep=KEEP_VERSIONS):
+    """Publish a new version and return its name
+
+    write_artifacts(directory) writes the model files into a staging directory.
+    The manifest is completed with the version, creation time and file hashes,
+    and the finished directory is renamed into place before CURRENT points at it.
+    Older versions past the newest keep are then pruned.
+    """
+    os.makedirs(registry_dir, exist_ok=True)
+    version = new_version()
+    staging = os.path.join(registry_dir, f".staging-{version}")
+    os.makedirs(staging)
+    try:
+        write_artifacts(staging)
+        files = sorted(
+            os.path.relpath(os.path.join(root, name), staging)
+            for root, _, names in os.walk(staging) for name in names
+            if name != MANIFEST_FILE
+        )
+        manifest = dict(
+            manifest,
+            version=version,
+            created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            files={name: _sha256(os.path.join(staging, name)) for name in files}
+        )
+        write_atomic(os.path.join(staging, MANIFEST_FILE), json.dumps(manifest, indent=2, default=str))
+        os.rename(staging, version_dir(registry_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if make_current:
+        set_current(registry_dir, version)
+    prune(registry_dir, keep)
+    return version
+
+def set_current(registry_dir, version):
+    """Point CURRENT at a published version (also used to roll back)"""
+    if not os.path.exists(os.path.join(version_dir(registry_dir, version), MANIFEST_FILE)):
+        raise ValueError(f"No published version {version!r} in {registry_dir}")
+    write_atomic(os.path.join(registry_dir, CURRENT_FILE), version + '\n')
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Return the version CURRENT points at, or None if nothing has been published"""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def read_manifest(registry_dir, version):
+    with open(os.path.join(version_dir(registry_dir, version), MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def _version_names(registry_dir):
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(registry_dir)
+        if os.path.exists(os.path.join(registry_dir, name, MANIFEST_FILE))
+    )
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Return the manifests of all published versions, oldest first"""
+    return [read_manifest(registry_dir, version) for version in _version_names(registry_dir)]
+
+def prune(registry_dir=REGISTRY_DIR, keep=KEEP_VERSIONS):
+    """Delete all but the newest keep versions, never the current one; returns the deleted names"""
+    current = current_version(registry_dir)
+    versions = _version_names(registry_dir)
+    stale = [version for version in versions[:max(0, len(versions) - keep)] if version != current]
+    for version in stale:
+        shutil.rmtree(version_dir(registry_dir, version), ignore_errors=True)
+    return stale
+
+if __name__ == '__main__':
+    import sys
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'list'
+    if command == 'list':
+        current = current_version()
+        for manifest in list_versions():
+            marker = '*' if manifest['version'] == current else ' '
+            metrics = manifest.get('metrics', {})
+            # Incremental updates are scored on the new events, not a held-out split
+            test = metrics.get('test') or metrics.get('progressive', {})
+            print(f"{marker} {manifest['version']}  {manifest['created_at']}  "
+                  f"log_loss={test.get('log_loss', float('nan')):.4f}  "
+                  f"accuracy={test.get('accuracy', float('nan')):.3f}  {manifest.get('params')}")
+    elif command == 'promote' and len(sys.argv) == 3:
+        set_current(REGISTRY_DIR, sys.argv[2])
+        print(f"CURRENT -> {sys.argv[2]}")
+    elif command == 'prune' and len(sys.argv) <= 3:
+        deleted = prune(REGISTRY_DIR, int(sys.argv[2]) if len(sys.argv) == 3 else KEEP_VERSIONS)
+        print(f"Deleted {len(deleted)} versions" + ''.join(f"\n  {version}" for version in deleted))
+    else:
+        print("Usage: python -m models.registry [list|promote <version>|prune [keep]]")
+        sys.exit(2)
@@ -0,0 +1,180 @@
+"""
+Parallel hyperparameter search for the recommendation forest
+Every (parameter set, cross-validation fold) pair is an independent fit, fanned out
+over a process pool with one worker per core. The training split is written once
+to .npy files that each worker memory-maps, so the data isn't copied per task. The
+best parameter set is refit on the whole training split, scored on the held-out
+test split and published to the model registry as a new version.
+
+    python -m models.tuning --folds 3 --workers 8
+"""
+
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from . import registry
+from .compact_forest import flatten_forest
+from .recommendation_model import (
+    FOREST_FILE, MAX_TRAINING_ROWS, MODEL_FILE, TRAINING_CACHE_PATH, TRAINING_DATA_PATH, load_training_data
+)
+
+# Parameters searched by default: 2 * 2 * 3 * 2 = 24 candidates
+DEFAULT_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [None, 16],
+    'min_samples_leaf': [1, 5, 20],
+    'max_features': ['sqrt', None]
+}
+
+DEFAULT_FOLDS = 3
+
+# Candidates are ranked by mean validation log loss: serving ranks products by
+# probability and applies a threshold, so calibration matters more than accuracy
+RANKING_METRIC = 'log_loss'
+
+def expand_grid(grid):
+    """Return every combination of a {parameter: [values]} grid as a list of dicts"""
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def score(model, X, y):
+    """Return the metrics recorded for a fitted model on (X, y)"""
+    from sklearn.metrics import accuracy_score, log_loss, roc_auc_score
+
+    probabilities = model.predict_proba(X)[:, list(model.classes_).index(1)]
+    return {
+        'log_loss': float(log_loss(y, probabilities, labels=[0, 1])),
+        'accuracy': float(accuracy_score(y, probabilities > 0.5)),
+        'roc_auc': float(roc_auc_score(y, probabilities))
+    }
+
+# Training split, memory-mapped once per worker process
+_X = None
+_y = None
+
+def _init_worker(x_path, y_path):
+    global _X, _y
+    _X = np.load(x_path, mmap_mode='r')
+    _y = np.load(y_path, mmap_mode='r')
+
+def _fit_fold(params, train_rows, validation_rows, random_state):
+    """Fit one candidate on one fold and return its validation metrics (runs in a worker)"""
+    from sklearn.ensemble import RandomForestClassifier
+
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=random_state, n_jobs=1, **params)
+    model.fit(_X[train_rows], _y[train_rows])
+    metrics = score(model, _X[validation_rows], _y[validation_rows])
+    metrics['fit_seconds'] = time.perf_counter() - start
+    return metrics
+
+def search(X_train, y_train, grid=None, folds=DEFAULT_FOLDS, workers=None, random_state=42):
+    """Cross-validate every candidate in parallel; returns the candidates sorted best first
+
+    Each candidate is {'params', 'folds': [metrics...], 'mean': {metric: value}}.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    candidates = [{'params': params, 'folds': []} for params in expand_grid(grid or DEFAULT_GRID)]
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=random_state).split(X_train, y_train))
+    workers = workers or os.cpu_count() or 1
+
+    scratch = tempfile.mkdtemp(prefix='garage-search-')
+    try:
+        x_path, y_path = os.path.join(scratch, 'X.npy'), os.path.join(scratch, 'y.npy')
+        np.save(x_path, X_train)
+        np.save(y_path, y_train)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(x_path, y_path)) as pool:
+            futures = {
+                pool.submit(_fit_fold, candidate['params'], train_rows, validation_rows, random_state): candidate
+                for candidate in candidates
+                for train_rows, validation_rows in splits
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                futures[future]['folds'].append(future.result())
+                print(f"\r  {done}/{len(futures)} fits", end='', flush=True)
+        print()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    for candidate in candidates:
+        candidate['mean'] = {
+            name: float(np.mean([fold[name] for fold in candidate['folds']]))
+            for name in candidate['folds'][0]
+        }
+    return sorted(candidates, key=lambda candidate: candidate['mean'][RANKING_METRIC])
+
+def train_and_publish(data_path=TRAINING_DATA_PATH, cache_path=TRAINING_CACHE_PATH, grid=None,
+                      folds=DEFAULT_FOLDS, workers=None, max_rows=MAX_TRAINING_ROWS,
+                      registry_dir=registry.REGISTRY_DIR, make_current=True):
+    """Search, refit the winner and publish it; returns the new version's name"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.model_selection import train_test_split
+    import joblib
+
+    workers = workers or os.cpu_count() or 1
+    X, y, feature_arrays, data_info = load_training_data(data_path, cache_path, max_rows)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    n_candidates = len(expand_grid(grid or DEFAULT_GRID))
+    print(f"Searching {n_candidates} candidates x {folds} folds on {len(X_train)} rows with {workers} workers...")
+    start = time.perf_counter()
+    candidates = search(X_train, y_train, grid, folds, workers)
+    search_seconds = time.perf_counter() - start
+
+    best = candidates[0]
+    print(f"Best: {best['params']} (mean validation {RANKING_METRIC} {best['mean'][RANKING_METRIC]:.4f})")
+
+    # Refit the winner on the whole training split, using every core for its trees
+    start = time.perf_counter()
+    model = RandomForestClassifier(random_state=42, n_jobs=workers, **best['params'])
+    model.fit(X_train, y_train)
+    refit_seconds = time.perf_counter() - start
+    test_metrics = score(model, X_test, y_test)
+    print(f"Test: log_loss {test_metrics['log_loss']:.4f}, accuracy {test_metrics['accuracy']:.3f}, "
+          f"ROC AUC {test_metrics['roc_auc']:.3f}")
+
+    forest = flatten_forest(model)
+
+    def write_artifacts(directory):
+        forest.save(os.path.join(directory, FOREST_FILE), **feature_arrays)
+        joblib.dump(model, os.path.join(directory, MODEL_FILE))
+
+    manifest = {
+        'params': best['params'],
+        'metrics': {'cv': best['mean'], 'test': test_metrics},
+        'training_data': dict(data_info, train_rows=len(X_train), test_rows=len(X_test)),
+        'forest': {'n_trees': forest.n_trees, 'n_nodes': forest.n_nodes, 'max_depth': forest.max_depth},
+        'search': {
+            'folds': folds,
+            'workers': workers,
+            'ranking_metric': RANKING_METRIC,
+            'search_seconds': search_seconds,
+            'refit_seconds': refit_seconds,
+            'candidates': [{'params': c['params'], 'mean': c['mean']} for c in candidates]
+        }
+    }
+    version = registry.publish(registry_dir, write_artifacts, manifest, make_current)
+    print(f"Published model version {version}" + (" (current)" if make_current else ""))
+    return version
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search for the recommendation model")
+    parser.add_argument('--data', default=TRAINING_DATA_PATH, help='training CSV')
+    parser.add_argument('--grid', type=json.loads, help='JSON {parameter: [values]} replacing the default grid')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS)
+    parser.add_argument('--workers', type=int, help='processes to use (default: all cores)')
+    parser.add_argument('--max-rows', type=int, default=MAX_TRAINING_ROWS, help='rows sampled from the data')
+    parser.add_argument('--no-promote', action='store_true', help="publish without pointing CURRENT at it")
+    args = parser.parse_args()
+    train_and_publish(args.data, grid=args.grid, folds=args.folds, workers=args.workers,
+                      max_rows=args.max_rows, make_current=not args.no_promote)
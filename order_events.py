@@ -0,0 +1,140 @@
+"""
+Order event buffer for incremental training
+Every placed order becomes one event per product involved: each recommendation the
+customer was shown and each product they bought, with flags for both. Events are
+appended to events.bin as fixed-size binary records (22 bytes each), so the events
+after a given position are one slice of a memory map, however long the history.
+
+meta.json holds the number of committed events, the last order id copied from the
+order store and the label vocabularies behind the categorical codes. A vocabulary
+holds at most 256 labels; events with a label that no longer fits are skipped
+rather than stopping the sync. meta.json is replaced
+atomically after each append; bytes beyond its event count are left over from an
+interrupted append and are truncated before the next one.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, so the buffer is unavailable
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+EVENT_DTYPE = np.dtype([
+    ('order_id', '<i8'),
+    ('created_at', '<f8'),
+    ('color', 'u1'),
+    ('slate_width', 'u1'),
+    ('windows', 'u1'),
+    ('product', 'u1'),
+    ('shown', 'u1'),
+    ('purchased', 'u1')
+])
+
+CATEGORICAL_FIELDS = ('color', 'slate_width', 'product')
+
+EVENTS_FILE = 'events.bin'
+META_FILE = 'meta.json'
+
+class OrderEventBuffer:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def meta(self):
+        try:
+            with open(self._file(META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'n_events': 0, 'last_order_id': 0, 'categories': {field: [] for field in CATEGORICAL_FIELDS}}
+
+    def _write_meta(self, meta):
+        tmp_path = self._file(f"{META_FILE}.tmp-{os.getpid()}")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._file(META_FILE))
+
+    def __len__(self):
+        return self.meta()['n_events']
+
+    def sync(self, order_store):
+        """Append events for every order placed since the last sync; returns the number of new events"""
+        if fcntl is None:
+            raise RuntimeError("The order event buffer needs fcntl file locks, which this platform lacks")
+        # One writer at a time across processes
+        with open(self._file('sync.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            meta = self.meta()
+            categories = meta['categories']
+            index = {field: {label: i for i, label in enumerate(categories[field])} for field in CATEGORICAL_FIELDS}
+
+            skipped = 0
+
+            def encode(field, label):
+                """Return the code for label, or None once the field's vocabulary is full"""
+                codes = index[field]
+                if label not in codes:
+                    if len(codes) > np.iinfo(EVENT_DTYPE[field]).max:
+                        return None
+                    codes[label] = len(categories[field])
+                    categories[field].append(label)
+                return codes[label]
+
+            records = []
+            last_order_id = meta['last_order_id']
+            for order_id, created_at, color, slate_width, windows, recommended, purchased in \
+                    order_store.iter_since(last_order_id):
+                last_order_id = order_id
+                shown = [key for key in recommended if isinstance(key, str)]
+                bought = {key for key in purchased if isinstance(key, str)}
+                # Shown products in display order, then anything bought that wasn't shown
+                products = shown + sorted(bought.difference(shown))
+                if not products:
+                    continue
+                color_code, slate_width_code = encode('color', color), encode('slate_width', slate_width)
+                if color_code is None or slate_width_code is None:
+                    skipped += len(products)
+                    continue
+                for key in products:
+                    product_code = encode('product', key)
+                    if product_code is None:
+                        skipped += 1
+                        continue
+                    records.append((order_id, created_at, color_code, slate_width_code,
+                                    windows, product_code, key in shown, key in bought))
+
+            if skipped:
+                log.warning("Skipped %d order events whose labels no longer fit the vocabularies", skipped)
+
+            if last_order_id == meta['last_order_id']:
+                return 0
+
+            events = np.array(records, dtype=EVENT_DTYPE)
+            with open(self._file(EVENTS_FILE), 'ab') as f:
+                # Drop anything an interrupted append left past the committed events
+                f.truncate(meta['n_events'] * EVENT_DTYPE.itemsize)
+                f.write(events.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_meta(dict(meta, n_events=meta['n_events'] + len(events), last_order_id=last_order_id))
+            return len(events)
+
+    def read(self, start=0):
+        """Return (events, categories) for the committed events from position start on, memory-mapped"""
+        meta = self.meta()
+        n_events = meta['n_events']
+        if start >= n_events:
+            return np.empty(0, dtype=EVENT_DTYPE), meta['categories']
+        events = np.memmap(self._file(EVENTS_FILE), dtype=EVENT_DTYPE, mode='r', shape=(n_events,))
+        return events[start:], meta['categories']
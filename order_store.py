@@ -0,0 +1,220 @@
+"""
+Durable order storage with group commit
+Orders go into a SQLite database in WAL mode with synchronous=FULL, so an order is
+on disk before /order answers. Request threads hand their order to a writer thread
+and wait; the writer inserts everything that arrived while the previous commit was
+syncing in a single transaction, so concurrent submissions share one fsync.
+
+Order IDs come from the table's AUTOINCREMENT key, which SQLite assigns under its
+write lock: they increase monotonically, are never reused, and are unique across
+every gunicorn worker writing to the same database. An order placed again with the
+same idempotency key returns the first order's ID instead of inserting a duplicate.
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    color TEXT NOT NULL,
+    slate_width TEXT NOT NULL,
+    windows INTEGER NOT NULL,
+    recommendations TEXT NOT NULL,
+    request_id TEXT,
+    purchased TEXT NOT NULL DEFAULT '[]',
+    idempotency_key TEXT
+)
+"""
+
+# NULL keys never collide, so orders placed without one are always inserted
+IDEMPOTENCY_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS orders_idempotency_key ON orders (idempotency_key)"
+
+# Columns added after the first release, created on databases that predate them
+MIGRATIONS = {
+    'purchased': "ALTER TABLE orders ADD COLUMN purchased TEXT NOT NULL DEFAULT '[]'",
+    'idempotency_key': "ALTER TABLE orders ADD COLUMN idempotency_key TEXT"
+}
+
+# Orders inserted in one transaction at most
+MAX_BATCH_SIZE = 256
+
+# Seconds a request waits for its order to be committed
+COMMIT_TIMEOUT = 10.0
+
+def format_order_id(row_id):
+    return f"GD{row_id:06d}"
+
+class _PendingOrder:
+    def __init__(self, order):
+        self.order = order
+        self.event = threading.Event()
+        self.order_id = None
+        self.error = None
+
+class OrderStore:
+    def __init__(self, path, max_batch_size=MAX_BATCH_SIZE, commit_timeout=COMMIT_TIMEOUT):
+        self.path = path
+        self.max_batch_size = max_batch_size
+        self.commit_timeout = commit_timeout
+        self._queue = None
+        self._writer_pid = None
+        self._lock = threading.Lock()
+        self.counters = {'orders': 0, 'commits': 0, 'errors': 0, 'max_batch': 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.execute(SCHEMA)
+        columns = {row[1] for row in connection.execute('PRAGMA table_info(orders)')}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                connection.execute(statement)
+        connection.execute(IDEMPOTENCY_INDEX)
+        connection.close()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Sync the WAL on every commit: a confirmed order survives power loss
+        connection.execute('PRAGMA synchronous=FULL')
+        return connection
+
+    def _ensure_writer(self):
+        """Start this process's writer thread (threads don't survive a fork)"""
+        if self._writer_pid != os.getpid():
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._queue,), name='order-writer', daemon=True).start()
+                    self._writer_pid = os.getpid()
+        return self._queue
+
+    def place(self, color, slate_width, windows, recommendations, request_id=None, purchased=(),
+              idempotency_key=None):
+        """Persist an order and return its ID once it is durably committed
+        
+        purchased lists the keys of the products bought with the door. An order
+        placed again with the same idempotency_key returns the ID of the first one.
+        A TimeoutError means the order is still queued and may yet be committed, so
+        the caller should retry with the same key rather than treat it as failed.
+        """
+        pending = _PendingOrder((
+            time.time(), color, slate_width, int(bool(windows)),
+            json.dumps(recommendations, separators=(',', ':')), request_id,
+            json.dumps(list(purchased), separators=(',', ':')), idempotency_key
+        ))
+        self._ensure_writer().put(pending)
+        if not pending.event.wait(self.commit_timeout):
+            raise TimeoutError("Timed out waiting for the order to be saved")
+        if pending.error is not None:
+            raise pending.error
+        return pending.order_id
+
+    def _run(self, pending_queue):
+        connection = self._connect()
+        while True:
+            # Block for the first order, then take whatever else queued up meanwhile
+            batch = [pending_queue.get()]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(pending_queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(connection, batch)
+
+    def _commit(self, connection, batch):
+        try:
+            # IMMEDIATE takes the write lock up front, so other workers queue on busy_timeout
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row_ids = [self._insert(connection, pending.order) for pending in batch]
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        except Exception as e:
+            log.error("Error saving %d orders: %s", len(batch), e)
+            with self._lock:
+                self.counters['errors'] += len(batch)
+            for pending in batch:
+                pending.error = e
+                pending.event.set()
+            return
+
+        with self._lock:
+            self.counters['orders'] += len(batch)
+            self.counters['commits'] += 1
+            self.counters['max_batch'] = max(self.counters['max_batch'], len(batch))
+        for pending, row_id in zip(batch, row_ids):
+            pending.order_id = format_order_id(row_id)
+            pending.event.set()
+
+    def _insert(self, connection, order):
+        """Insert one order and return its row ID, or the existing row's for a repeated idempotency key"""
+        cursor = connection.execute(
+            'INSERT INTO orders (created_at, color, slate_width, windows, recommendations, request_id, '
+            'purchased, idempotency_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (idempotency_key) DO NOTHING', order
+        )
+        if cursor.rowcount:
+            return cursor.lastrowid
+        return connection.execute('SELECT id FROM orders WHERE idempotency_key = ?', (order[-1],)).fetchone()[0]
+
+    def get(self, order_id):
+        """Return a stored order by its ID, or None"""
+        if not order_id.startswith('GD') or not order_id[2:].isdigit():
+            return None
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            row = connection.execute(
+                'SELECT id, created_at, color, slate_width, windows, recommendations, purchased '
+                'FROM orders WHERE id = ?',
+                (int(order_id[2:]),)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        return {
+            'order_id': format_order_id(row[0]),
+            'created_at': row[1],
+            'color': row[2],
+            'slate_width': row[3],
+            'windows': bool(row[4]),
+            'recommendations': json.loads(row[5]),
+            'purchased': json.loads(row[6])
+        }
+    
+    def iter_since(self, last_id, batch_size=1000):
+        """Yield (id, created_at, color, slate_width, windows, recommended keys, purchased keys) for orders after last_id"""
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            while True:
+                rows = connection.execute(
+                    'SELECT id, created_at, color, slate_width, windows, recommendations, purchased '
+                    'FROM orders WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch_size)
+                ).fetchall()
+                for row in rows:
+                    recommended = [product.get('key') for product in json.loads(row[5]) if isinstance(product, dict)]
+                    yield row[0], row[1], row[2], row[3], bool(row[4]), recommended, json.loads(row[6])
+                if len(rows) < batch_size:
+                    return
+                last_id = rows[-1][0]
+        finally:
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        counters['mean_batch'] = counters['orders'] / counters['commits'] if counters['commits'] else None
+        return counters
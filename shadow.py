@@ -0,0 +1,163 @@
+"""
+Shadow evaluation of candidate recommendation models
+Candidates are scored against live /configure traffic on background threads, off the request path
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+def _percentile(values, fraction):
+    """Return the value at the given fraction of a sorted copy of values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class ShadowEvaluator:
+    def __init__(self, candidates, workers=1, queue_size=256, window=1000):
+        """candidates maps a name to any object with predict(color, slate_width, windows)"""
+        self.candidates = dict(candidates)
+        self.workers = workers
+        self.window = window
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._threads_pid = None
+
+        # Rolling per-candidate samples of (top1_match, overlap, latency_ms, error)
+        self._samples = {name: deque(maxlen=window) for name in self.candidates}
+        self._submit_overhead_us = deque(maxlen=window)
+        self.submitted = 0
+        self.dropped = 0
+
+    def _ensure_workers(self):
+        """Start worker threads in this process (threads do not survive a gunicorn fork)"""
+        if self._threads_pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads_pid == os.getpid():
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"shadow-{i}", daemon=True)
+                thread.start()
+            self._threads_pid = os.getpid()
+
+    def submit(self, configuration, served):
+        """Queue a configuration and the recommendations served for it; never blocks"""
+        start = time.perf_counter()
+        self._ensure_workers()
+        try:
+            self._queue.put_nowait((configuration, served))
+            accepted = True
+        except queue.Full:
+            accepted = False
+        elapsed_us = (time.perf_counter() - start) * 1e6
+
+        with self._lock:
+            if accepted:
+                self.submitted += 1
+            else:
+                self.dropped += 1
+            self._submit_overhead_us.append(elapsed_us)
+        return accepted
+
+    def _run(self):
+        while True:
+            configuration, served = self._queue.get()
+            try:
+                self._evaluate(configuration, served)
+            except Exception:
+                log.exception("Shadow evaluation error")
+            finally:
+                self._queue.task_done()
+
+    def _evaluate(self, configuration, served):
+        served_keys = [product.get('key') for product in served]
+        for name, candidate in self.candidates.items():
+            start = time.perf_counter()
+            try:
+                predicted = candidate.predict(
+                    configuration['color'], configuration['slate_width'], configuration['windows']
+                )
+                error = False
+            except Exception:
+                predicted = []
+                error = True
+            latency_ms = (time.perf_counter() - start) * 1000
+
+            candidate_keys = [product.get('key') for product in predicted]
+            top1_match = bool(served_keys) and bool(candidate_keys) and served_keys[0] == candidate_keys[0]
+            union = set(served_keys) | set(candidate_keys)
+            overlap = len(set(served_keys) & set(candidate_keys)) / len(union) if union else 1.0
+
+            with self._lock:
+                self._samples[name].append((top1_match, overlap, latency_ms, error))
+
+    def summary(self):
+        """Return rolling agreement and latency stats for each candidate"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+            overhead = list(self._submit_overhead_us)
+            submitted, dropped = self.submitted, self.dropped
+
+        candidates = {}
+        for name, values in samples.items():
+            latencies = [latency for _, _, latency, _ in values]
+            count = len(values)
+            candidates[name] = {
+                'samples': count,
+                'top1_agreement': sum(match for match, _, _, _ in values) / count if count else None,
+                'mean_overlap': sum(overlap for _, overlap, _, _ in values) / count if count else None,
+                'errors': sum(error for _, _, _, error in values),
+                'latency_ms_p50': _percentile(latencies, 0.5),
+                'latency_ms_p95': _percentile(latencies, 0.95)
+            }
+
+        return {
+            'pid': os.getpid(),
+            'window': self.window,
+            'submitted': submitted,
+            'dropped': dropped,
+            'queue_depth': self._queue.qsize(),
+            'request_overhead_us_mean': sum(overhead) / len(overhead) if overhead else None,
+            'request_overhead_us_p99': _percentile(overhead, 0.99),
+            'candidates': candidates
+        }
+
+def load_shadow_evaluator():
+    """Build an evaluator from SHADOW_MODEL_PATHS, or return None when shadowing is off
+
+    SHADOW_MODEL_PATHS is a comma-separated list of compact forest files, each
+    optionally prefixed with a name, e.g. "deeper=models/candidates/deeper.npz".
+    """
+    spec = os.getenv('SHADOW_MODEL_PATHS', '').strip()
+    if not spec:
+        return None
+
+    from models.recommendation_model import ProductRecommendationModel
+
+    candidates = {}
+    for entry in spec.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, path = entry.rpartition('=')
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        try:
+            candidates[name] = ProductRecommendationModel(train_if_missing=False, forest_path=path)
+            print(f"✓ Shadow candidate loaded: {name} ({path})")
+        except Exception as e:
+            print(f"⚠️ Shadow candidate {name} failed to load: {e}")
+
+    if not candidates:
+        return None
+    return ShadowEvaluator(
+        candidates,
+        workers=int(os.getenv('SHADOW_WORKERS', '1')),
+        queue_size=int(os.getenv('SHADOW_QUEUE_SIZE', '256'))
+    )
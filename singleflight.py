@@ -0,0 +1,199 @@
+"""
+Single-flight request coalescing
+The first caller for a key does the work; concurrent callers for the same key wait
+for and share its result. Optionally the leader also holds a per-key lock file, so
+leaders in other gunicorn workers queue behind it and can reuse what it stored in
+a shared cache instead of calling upstream again.
+
+AsyncSingleFlight is the same for coroutines on one event loop (the ASGI app):
+followers await the leader's future, and the lock file is polled so that waiting
+for another worker never blocks the loop.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+def _lock_path(lock_dir, key):
+    return os.path.join(lock_dir, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.lock")
+
+class SingleFlight:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def begin(self, key):
+        """Register interest in key; returns (call, is_leader)
+
+        The leader must call finish() exactly once. Followers wait with join().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                return call, True
+            self.followers += 1
+            return call, False
+
+    def finish(self, key, call, result=None, error=None):
+        """Publish the leader's result (or error) to every waiting follower"""
+        call.result = result
+        call.error = error
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.event.set()
+
+    def join(self, call, timeout=None):
+        """Wait for a leader's call to finish and return its result"""
+        if not call.event.wait(timeout):
+            raise TimeoutError("Timed out waiting for in-flight request")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key, func, cross_process=False):
+        """Run func once for all concurrent callers with the same key"""
+        call, is_leader = self.begin(key)
+        if not is_leader:
+            return self.join(call)
+
+        result = error = None
+        try:
+            if cross_process:
+                with self._file_lock(key):
+                    result = func()
+            else:
+                result = func()
+            return result
+        except Exception as e:
+            error = e
+            raise
+        except BaseException:
+            # An interrupted leader (e.g. worker shutdown) must not re-raise that in its followers
+            error = RuntimeError("In-flight request was interrupted")
+            raise
+        finally:
+            self.finish(key, call, result=result, error=error)
+
+    @contextmanager
+    def _file_lock(self, key):
+        """Hold an exclusive per-key lock file shared by all processes on this host"""
+        if not self.lock_dir or fcntl is None:
+            yield
+            return
+        with open(_lock_path(self.lock_dir, key), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        with self._lock:
+            return {'leaders': self.leaders, 'coalesced': self.followers, 'in_flight': len(self._calls)}
+
+# Seconds between attempts to take a lock file held by another worker
+LOCK_POLL_INTERVAL = 0.02
+
+class AsyncSingleFlight:
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}
+        self.leaders = 0
+        self.followers = 0
+
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def begin(self, key):
+        """Register interest in key; returns (future, is_leader)
+
+        The leader must call finish() exactly once. Followers await join().
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.get_running_loop().create_future()
+            self.leaders += 1
+            return future, True
+        self.followers += 1
+        return future, False
+
+    def finish(self, key, future, result=None, error=None):
+        """Publish the leader's result (or error) to every waiting follower"""
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if future.done():
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            # A cancelled leader (client went away) must not cancel its followers
+            future.set_exception(error if isinstance(error, Exception)
+                                 else RuntimeError("In-flight request was cancelled"))
+            future.exception()  # Nobody may be waiting; don't log it as unretrieved
+
+    async def join(self, future):
+        """Wait for a leader's call to finish and return its result"""
+        return await asyncio.shield(future)
+
+    async def do(self, key, func, cross_process=False):
+        """Await func() once for all concurrent callers with the same key"""
+        future, is_leader = self.begin(key)
+        if not is_leader:
+            return await self.join(future)
+
+        result = error = None
+        try:
+            if cross_process:
+                async with self._file_lock(key):
+                    result = await func()
+            else:
+                result = await func()
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.finish(key, future, result=result, error=error)
+
+    @asynccontextmanager
+    async def _file_lock(self, key):
+        """Hold the per-key lock file shared with SingleFlight, polling instead of blocking"""
+        if not self.lock_dir or fcntl is None:
+            yield
+            return
+        with open(_lock_path(self.lock_dir, key), 'a') as lock_file:
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        return {'leaders': self.leaders, 'coalesced': self.followers, 'in_flight': len(self._calls)}
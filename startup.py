@@ -0,0 +1,34 @@
+"""
+Startup timing for the web application
+Records how long each import and initialization step takes so cold starts can be profiled
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+class StartupTimer:
+    def __init__(self):
+        self.steps = []
+        self.started = time.perf_counter()
+        self.pid = os.getpid()
+
+    @contextmanager
+    def step(self, name):
+        """Time a block of initialization work"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps.append((name, time.perf_counter() - start))
+
+    def report(self):
+        """Print a breakdown of startup time per step"""
+        total = time.perf_counter() - self.started
+        print(f"Startup timing (pid {self.pid}):")
+        for name, seconds in self.steps:
+            print(f"  {name:40s} {seconds * 1000:8.1f} ms")
+        print(f"  {'total':40s} {total * 1000:8.1f} ms")
+
+# Started as early as possible so the total covers the whole app import
+startup_timer = StartupTimer()
@@ -0,0 +1,181 @@
+"""
+Non-blocking structured logging
+Request threads only filter a record and put it on a bounded in-memory queue; a
+listener thread in each process formats it (JSON lines by default) and writes it
+to stdout. Every record carries the id of the request that logged it, and verbose
+message types can be sampled.
+
+Modules log through the standard library (logging.getLogger(__name__)). Pass values
+as arguments, log.info("Fetched %d periods", n), rather than pre-formatting them,
+so a disabled level costs one level check and nothing is formatted on the request
+thread. Verbose payloads are tagged with extra={'log_type': ...} so they can be
+sampled with LOG_SAMPLE_RATES, and structured values go in extra={'fields': {...}}.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# 'json' for one JSON object per line, 'text' for human-readable lines
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+
+# Records waiting for the listener; further records are dropped rather than block a request
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# Fraction of records kept per log_type, e.g. "openai_response=0.1,weather_text=0.1"
+DEFAULT_SAMPLE_RATES = 'openai_response=0.1,weather_text=0.1'
+
+# Third-party loggers that log every HTTP call at INFO
+QUIET_LOGGERS = ('httpx', 'openai', 'urllib3')
+
+_request_id = ContextVar('request_id', default=None)
+
+def start_request(incoming_id=None):
+    """Set the request id for the current context, reusing a sane incoming X-Request-ID"""
+    if incoming_id and len(incoming_id) <= 64 and incoming_id.isprintable():
+        request_id = incoming_id
+    else:
+        request_id = uuid.uuid4().hex[:16]
+    _request_id.set(request_id)
+    return request_id
+
+def get_request_id():
+    return _request_id.get()
+
+def parse_sample_rates(spec):
+    rates = {}
+    for entry in (spec or '').split(','):
+        name, _, rate = entry.strip().partition('=')
+        if name and rate:
+            rates[name] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+class ContextFilter(logging.Filter):
+    """Stamps the request id and applies per-type sampling
+
+    Attached to the QueueHandler, so it runs on the thread that logged the record,
+    before it is enqueued; that is what lets it read the request's context variables.
+    """
+
+    def __init__(self, sample_rates):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record):
+        rate = self.sample_rates.get(getattr(record, 'log_type', None))
+        if rate is not None and random.random() >= rate:
+            return False
+        record.request_id = _request_id.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'request_id': getattr(record, 'request_id', None)
+        }
+        if getattr(record, 'log_type', None):
+            entry['type'] = record.log_type
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(process)d %(request_id)s] %(name)s: %(message)s')
+
+    def format(self, record):
+        record.request_id = getattr(record, 'request_id', None) or '-'
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to a per-process listener thread without formatting or blocking
+
+    The queue and listener are recreated after a fork, since neither the thread
+    nor the queue's locks survive it. Records are dropped when the queue is full.
+    """
+
+    def __init__(self, target_handler, queue_size=LOG_QUEUE_SIZE):
+        super().__init__(None)
+        self.target_handler = target_handler
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._listener = None
+        self._listener_pid = None
+        self._stopped_pid = None
+        self._listener_lock = threading.Lock()
+
+    def _ensure_listener(self):
+        if self._listener_pid != os.getpid():
+            with self._listener_lock:
+                if self._listener_pid != os.getpid():
+                    self.queue = queue.Queue(self.queue_size)
+                    self._listener = logging.handlers.QueueListener(self.queue, self.target_handler)
+                    self._listener.start()
+                    self._listener_pid = os.getpid()
+                    atexit.register(self.flush_and_stop)
+
+    def prepare(self, record):
+        # Unlike the stdlib handler, leave msg/args unformatted for the listener
+        return record
+
+    def enqueue(self, record):
+        if self._stopped_pid == os.getpid():
+            # Records logged during shutdown are written directly; a new listener
+            # thread can't be started while the interpreter is finalizing
+            self.target_handler.handle(record)
+            return
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush_and_stop(self):
+        """Write out everything queued so far (at exit)"""
+        if self._listener is not None and self._listener_pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._listener_pid = None
+            self._stopped_pid = os.getpid()
+
+_handler = None
+
+def setup_logging():
+    """Route the root logger through the queue handler (idempotent)"""
+    global _handler
+    if _handler is not None:
+        return _handler
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if LOG_FORMAT == 'text' else JsonFormatter())
+
+    _handler = NonBlockingQueueHandler(stream_handler)
+    _handler.addFilter(ContextFilter(parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', DEFAULT_SAMPLE_RATES))))
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    for name in QUIET_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, root.level))
+    return _handler
@@ -0,0 +1,27 @@
+"""
+Shared test setup
+Puts the repo on the import path and points everything the app creates at import
+(order store, forecast cache, door previews, incremental training) at a scratch
+directory, so tests never touch data/ or models/registry.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRATCH = tempfile.mkdtemp(prefix='garage-tests-')
+os.environ.update(
+    ORDER_DB_PATH=os.path.join(SCRATCH, 'orders.sqlite3'),
+    DOOR_IMAGE_CACHE_DIR=os.path.join(SCRATCH, 'door_cache'),
+    MODEL_REGISTRY_DIR=os.path.join(SCRATCH, 'registry'),
+    FORECAST_CACHE_ENABLED='0',
+    INCREMENTAL_TRAINING_INTERVAL='0',
+    WEATHER_RECOMMENDATION_MODE='rules'
+)
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(SCRATCH, ignore_errors=True)
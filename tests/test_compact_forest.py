@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from models.compact_forest import CompactForest, flatten_forest
+
+@pytest.fixture(scope='module')
+def fitted():
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(0)
+    X = rng.random((2000, 6)).astype(np.float32)
+    y = ((X[:, 0] + X[:, 1] * X[:, 2] > 0.7) ^ (X[:, 3] > 0.9)).astype(int)
+    forest = RandomForestClassifier(n_estimators=25, max_depth=12, random_state=0, n_jobs=1).fit(X, y)
+    X_test = rng.random((500, 6)).astype(np.float32)
+    return forest, X_test
+
+def test_predict_proba_matches_sklearn(fitted):
+    forest, X = fitted
+    compact = flatten_forest(forest)
+    assert compact.n_trees == 25
+    np.testing.assert_allclose(compact.predict_proba(X), forest.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compact.classes_, forest.classes_)
+
+def test_apply_matches_sklearn_leaves(fitted):
+    forest, X = fitted
+    compact = flatten_forest(forest)
+    leaves = compact.apply(X) - compact.roots
+    np.testing.assert_array_equal(leaves, forest.apply(X))
+
+@pytest.mark.parametrize('name', ['forest', 'forest.npz'])
+def test_save_and_load_round_trip(fitted, tmp_path, name):
+    forest, X = fitted
+    compact = flatten_forest(forest)
+    path = str(tmp_path / name)
+    compact.save(path, extra=np.arange(3))
+
+    loaded, arrays = CompactForest.load(path)
+    np.testing.assert_array_equal(arrays['extra'], np.arange(3))
+    np.testing.assert_allclose(loaded.predict_proba(X), forest.predict_proba(X), rtol=0, atol=1e-12)
+
+def test_publish_swaps_versions_behind_current(fitted, tmp_path):
+    forest, X = fitted
+    compact = flatten_forest(forest)
+    path = str(tmp_path / 'forest')
+    # A flat directory from before versioning is loaded, then migrated by the next publish
+    compact.save(path, generation=np.asarray(0))
+    assert CompactForest.current_version(path) is None
+
+    versions = [compact.publish(path, generation=np.asarray(i)) for i in range(1, 4)]
+    assert CompactForest.current_version(path) == versions[-1]
+    _, arrays = CompactForest.load(path)
+    assert int(arrays['generation']) == 3
+    # The current and previous versions are kept; older ones and the flat files are removed
+    assert sorted(entry.name for entry in tmp_path.joinpath('forest').iterdir()) == sorted(
+        ['CURRENT', versions[-2], versions[-1]]
+    )
@@ -0,0 +1,28 @@
+import os
+
+import door_images
+from door_images import DoorImageCache
+
+def fake_render(color, slate_width, window_style=None):
+    return b'x' * 100
+
+def test_disk_cache_evicts_least_recently_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(door_images, 'render_door', fake_render)
+    stale = tmp_path / 'sand-wide.v0.webp'
+    stale.write_bytes(b'x' * 100)
+    os.utime(stale, (1, 1))
+
+    cache = DoorImageCache(str(tmp_path), max_bytes=0, max_disk_bytes=250)
+    cache.get('brown', 'narrow', 'panoramic')
+    cache.get('green', 'narrow', 'panoramic')
+    assert not stale.exists()  # An old RENDER_VERSION goes first
+
+    # Reading brown makes green the least recently used
+    os.utime(cache._disk_path('green-narrow-panoramic'), (2, 2))
+    os.utime(cache._disk_path('brown-narrow-panoramic'), (2, 2))
+    cache.get('brown', 'narrow', 'panoramic')
+    cache.get('sand', 'narrow', 'panoramic')
+
+    names = sorted(os.listdir(tmp_path))
+    assert names == [os.path.basename(cache._disk_path(name)) for name in ('brown-narrow-panoramic', 'sand-narrow-panoramic')]
+    assert cache.stats()['disk_hits'] == 1
@@ -0,0 +1,82 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import forecast_cache
+from forecast_cache import ForecastCache, cache_lifetime
+
+URL = 'https://api.weather.gov/gridpoints/CLE/80,62/forecast'
+
+def response(status_code, text='', **headers):
+    return SimpleNamespace(status_code=status_code, text=text, headers=headers)
+
+class FakeUpstream:
+    """Stands in for upstream.get(), answering from a list of responses or exceptions"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.requests = []
+
+    def __call__(self, url, headers=None, timeout=None):
+        self.requests.append(headers or {})
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+@pytest.fixture
+def cache(tmp_path):
+    return ForecastCache(str(tmp_path / 'forecast_cache.sqlite3'))
+
+def expire(cache, url=URL):
+    cache.touch(url, time.time() - 1)
+
+def test_fresh_entry_is_served_without_a_request(cache, monkeypatch):
+    fake = FakeUpstream(response(200, '{"periods": 1}', **{'Cache-Control': 'max-age=300'}))
+    monkeypatch.setattr(forecast_cache.upstream, 'get', fake)
+
+    assert cache.get_json(URL) == {'periods': 1}
+    assert cache.get_json(URL) == {'periods': 1}
+    assert len(fake.requests) == 1
+    assert cache.counters['misses'] == 1 and cache.counters['hits'] == 1
+
+def test_stale_entry_is_revalidated(cache, monkeypatch):
+    fake = FakeUpstream(
+        response(200, '{"periods": 1}', ETag='"v1"', **{'Cache-Control': 'max-age=300'}),
+        response(304, **{'Cache-Control': 'max-age=300'})
+    )
+    monkeypatch.setattr(forecast_cache.upstream, 'get', fake)
+
+    cache.get_json(URL)
+    expire(cache)
+    assert cache.get_json(URL) == {'periods': 1}
+    assert fake.requests[1]['If-None-Match'] == '"v1"'
+    assert cache.get(URL)['expires_at'] > time.time()
+    assert cache.counters['revalidated'] == 1
+
+@pytest.mark.parametrize('failure', [ConnectionError('connection refused'), response(503)])
+def test_stale_entry_is_served_when_upstream_fails(cache, monkeypatch, failure):
+    fake = FakeUpstream(response(200, '{"periods": 1}', **{'Cache-Control': 'max-age=300'}), failure)
+    monkeypatch.setattr(forecast_cache.upstream, 'get', fake)
+
+    cache.get_json(URL)
+    expire(cache)
+    assert cache.get_json(URL) == {'periods': 1}
+    assert cache.counters['errors'] == 1 and cache.counters['stale_served'] == 1
+
+def test_failure_without_an_entry_returns_none(cache, monkeypatch):
+    monkeypatch.setattr(forecast_cache.upstream, 'get', FakeUpstream(response(500)))
+    assert cache.get_json(URL) is None
+    assert cache.get(URL) is None
+
+@pytest.mark.parametrize('headers, lifetime', [
+    ({'Cache-Control': 'public, max-age=600'}, 600),
+    ({'Cache-Control': 'max-age=600', 'Age': '100'}, 500),
+    ({'Cache-Control': 's-maxage=60, max-age=600'}, 60),
+    ({'Cache-Control': 'no-cache'}, 0),
+    ({'Expires': 'Sun, 18 Oct 2026 10:10:00 GMT', 'Date': 'Sun, 18 Oct 2026 10:00:00 GMT'}, 600),
+    ({}, None)
+])
+def test_cache_lifetime(headers, lifetime):
+    assert cache_lifetime(headers) == lifetime
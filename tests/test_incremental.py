@@ -0,0 +1,81 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import generate_data
+from models import incremental, registry
+from models.compact_forest import flatten_forest
+from models.recommendation_model import FOREST_FILE, MODEL_FILE, load_training_data
+from order_events import EVENT_DTYPE
+
+PRODUCTS = ['garage_door_opener', 'remote_control']
+
+class FakeBuffer:
+    def __init__(self, events):
+        self.events = events
+        self.categories = {'color': ['grey'], 'slate_width': ['wide'], 'product': PRODUCTS}
+
+    def __len__(self):
+        return len(self.events)
+
+    def read(self, start=0):
+        return self.events[start:], self.categories
+
+def events(n, opener_bought):
+    """n events alternating between the two products, with the opener bought or passed over"""
+    records = np.zeros(n, dtype=EVENT_DTYPE)
+    records['order_id'] = np.arange(n) // 2 + 1
+    records['windows'] = 1
+    records['shown'] = 1
+    records['product'] = np.arange(n) % 2
+    records['purchased'] = (records['product'] == 0) == opener_bought
+    return records
+
+@pytest.fixture(scope='module')
+def published(tmp_path_factory):
+    from sklearn.ensemble import RandomForestClassifier
+    import joblib
+
+    directory = tmp_path_factory.mktemp('incremental')
+    csv_path = str(directory / 'training.csv')
+    generate_data.save_training_data(n_samples=2000, csv_path=csv_path)
+    X, y, arrays, _ = load_training_data(csv_path, str(directory / 'training.columnar'))
+    model = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0, n_jobs=1).fit(X, y)
+    forest = flatten_forest(model)
+
+    def write_artifacts(version_directory):
+        forest.save(os.path.join(version_directory, FOREST_FILE), **arrays)
+        joblib.dump(model, os.path.join(version_directory, MODEL_FILE))
+
+    registry_dir = str(directory / 'registry')
+    registry.publish(registry_dir, write_artifacts, {'params': model.get_params()})
+    return registry_dir
+
+@pytest.fixture
+def registry_dir(published, tmp_path):
+    path = str(tmp_path / 'registry')
+    shutil.copytree(published, path)
+    return path
+
+def test_update_is_published_when_it_scores_better(registry_dir):
+    parent = registry.current_version(registry_dir)
+    buffer = FakeBuffer(np.concatenate([events(200, True), events(50, True)]))
+    version = incremental.update(buffer, registry_dir, min_events=100)
+
+    assert version and registry.current_version(registry_dir) == version
+    manifest = registry.read_manifest(registry_dir, version)
+    assert manifest['parent'] == parent
+    # The held-out events are left for the next update
+    assert manifest['events_consumed'] == 200
+    metrics = manifest['metrics']
+    assert metrics['progressive']['log_loss'] <= metrics['parent_progressive']['log_loss']
+
+def test_update_that_scores_worse_is_not_published(registry_dir):
+    parent = registry.current_version(registry_dir)
+    # The newest events contradict what the update learns from the rest
+    buffer = FakeBuffer(np.concatenate([events(200, True), events(50, False)]))
+    assert incremental.update(buffer, registry_dir, min_events=100) is None
+    assert registry.current_version(registry_dir) == parent
+    assert len(registry.list_versions(registry_dir)) == 1
@@ -0,0 +1,35 @@
+import numpy as np
+
+from order_events import EVENT_DTYPE, OrderEventBuffer
+
+class FakeOrderStore:
+    def __init__(self, orders):
+        self.orders = orders
+
+    def iter_since(self, last_id):
+        return (order for order in self.orders if order[0] > last_id)
+
+def order(order_id, color='grey', product='remote_control'):
+    return order_id, 0.0, color, 'wide', True, [product], [product]
+
+def test_sync_appends_shown_and_purchased_events(tmp_path):
+    buffer = OrderEventBuffer(str(tmp_path))
+    store = FakeOrderStore([order(1), (2, 0.0, 'white', 'narrow', False, ['remote_control'], ['safety_sensors'])])
+    assert buffer.sync(store) == 3
+
+    events, categories = buffer.read()
+    assert categories['product'] == ['remote_control', 'safety_sensors']
+    assert events['shown'].tolist() == [1, 1, 0]
+    assert events['purchased'].tolist() == [1, 0, 1]
+
+def test_sync_skips_labels_past_a_full_vocabulary(tmp_path):
+    capacity = np.iinfo(EVENT_DTYPE['color']).max + 1
+    buffer = OrderEventBuffer(str(tmp_path))
+    store = FakeOrderStore([order(i + 1, color=f"color-{i}") for i in range(capacity + 10)])
+    assert buffer.sync(store) == capacity
+
+    # Later orders with known labels are still recorded
+    store.orders.append(order(capacity + 11, color='color-0'))
+    assert buffer.sync(store) == 1
+    assert buffer.meta()['last_order_id'] == capacity + 11
+    assert len(buffer.read()[1]['color']) == capacity
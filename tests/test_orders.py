@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+import app
+from order_store import OrderStore
+
+ORDER = {'color': 'grey', 'slate_width': 'wide', 'windows': 'yes'}
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+def test_order_is_stored_with_its_recommendations(client):
+    recommendations = [{'key': 'remote_control', 'name': 'Remote', 'price': 49.99, 'probability': 0.9}]
+    response = client.post('/order', json=dict(ORDER, recommendations=recommendations))
+    assert response.status_code == 200
+    order_id = response.json['order_id']
+    assert order_id.startswith('GD')
+
+    stored = app.order_store.get(order_id)
+    assert (stored['color'], stored['slate_width'], stored['windows']) == ('grey', 'wide', True)
+    # Only the product fields an order keeps are stored
+    assert stored['recommendations'] == [{'key': 'remote_control', 'name': 'Remote', 'price': 49.99}]
+
+@pytest.mark.parametrize('order', [
+    {},
+    {'color': 'grey', 'slate_width': 'wide'},
+    {'color': 'grey', 'slate_width': 'wide', 'windows': 'maybe'},
+    {'color': 1, 'slate_width': 'wide', 'windows': 'no'},
+    {'color': 'purple', 'slate_width': 'wide', 'windows': 'no'},
+    {'color': 'grey', 'slate_width': ['wide'], 'windows': 'no'},
+    dict(ORDER, recommendations={'key': 'remote_control'}),
+    dict(ORDER, recommendations=[{'key': 'free_upgrade', 'name': 'Free upgrade', 'price': 0}])
+])
+def test_invalid_order_is_rejected(client, order):
+    response = client.post('/order', json=order)
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+def test_non_json_order_is_rejected(client):
+    assert client.post('/order', data='color=grey').status_code == 400
+
+def test_purchased_keys_are_stored_once(client):
+    response = client.post('/order', json=dict(ORDER, purchased=['remote_control', 'remote_control', 'safety_sensors']))
+    assert response.status_code == 200
+    assert app.order_store.get(response.json['order_id'])['purchased'] == ['remote_control', 'safety_sensors']
+
+def test_resent_order_is_placed_once(client):
+    headers = {'Idempotency-Key': 'resent-order'}
+    first = client.post('/order', json=ORDER, headers=headers)
+    second = client.post('/order', json=ORDER, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json['order_id'] == second.json['order_id']
+
+def test_slow_commit_answers_pending_and_commits_once(client, tmp_path, monkeypatch):
+    store = OrderStore(str(tmp_path / 'orders.sqlite3'), commit_timeout=0.05)
+    release = threading.Event()
+    commit = store._commit
+    monkeypatch.setattr(store, '_commit', lambda connection, batch: (release.wait(5), commit(connection, batch)))
+    monkeypatch.setattr(app, 'order_store', store)
+
+    headers = {'Idempotency-Key': 'slow-order'}
+    response = client.post('/order', json=ORDER, headers=headers)
+    assert response.status_code == 202
+    assert response.json == dict(response.json, status='pending', idempotency_key='slow-order')
+
+    # The queued order still commits; resending it returns that order instead of a second one
+    release.set()
+    store.commit_timeout = 5
+    response = client.post('/order', json=ORDER, headers=headers)
+    assert response.status_code == 200
+    assert len(list(store.iter_since(0))) == 1
+    assert store.get(response.json['order_id']) is not None
+
+@pytest.mark.parametrize('purchased', [[None], ['remote_control', 3], 'remote_control', ['x' * 65], ['free_upgrade']])
+def test_invalid_purchased_is_rejected(client, purchased):
+    assert client.post('/order', json=dict(ORDER, purchased=purchased)).status_code == 400
+
+@pytest.mark.parametrize('color, slate_width', [('grey', 'wide'), ('white', 'narrow'), ('black', 'narrow')])
+def test_fallback_recommendations_can_be_ordered(client, monkeypatch, color, slate_width):
+    # Without a model every product shown comes from the rules, and each must carry a key
+    monkeypatch.setattr(app, 'recommendation_model', None)
+    recommendations = app.get_recommendations(color, slate_width, True)
+    assert recommendations and all(product.get('key') for product in recommendations)
+
+    purchased = [product['key'] for product in recommendations]
+    response = client.post('/order', json={
+        'color': color, 'slate_width': slate_width, 'windows': 'yes',
+        'recommendations': recommendations, 'purchased': purchased
+    })
+    assert response.status_code == 200
+    assert app.order_store.get(response.json['order_id'])['purchased'] == purchased
+
+def test_model_default_products_have_keys():
+    from models.recommendation_model import ProductRecommendationModel
+
+    # The products returned when the live prediction fails
+    model = ProductRecommendationModel.__new__(ProductRecommendationModel)
+    model.products = model._get_products()
+    model._state = None
+    model._predict_batch = lambda state, configurations: [{'error': 'unavailable'}]
+    recommendations = model._predict_live('grey', 'wide', True)
+    assert [product['key'] for product in recommendations] == [
+        'garage_door_opener', 'remote_control', 'safety_sensors', 'weather_stripping'
+    ]
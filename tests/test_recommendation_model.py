@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from models.recommendation_model import ProductRecommendationModel
+
+def bare_model():
+    """A model with its catalog but no artifacts, for testing the serving logic alone"""
+    model = ProductRecommendationModel.__new__(ProductRecommendationModel)
+    model.products = model._get_products()
+    model._state = None
+    model._watcher_pid = None
+    model._ensure_watcher = lambda: None
+    return model
+
+def test_failed_predictions_are_not_cached_in_the_lookup_table():
+    model = bare_model()
+    state = SimpleNamespace(label_classes={'color': ['grey', 'white'], 'slate_width': ['wide']}, lookup_table={})
+    recommendation = dict(model.products['remote_control'], key='remote_control', probability=0.9)
+
+    def predict_batch(state, configurations):
+        return [{'error': 'Prediction failed'} if config['color'] == 'white' else {'recommendations': [recommendation]}
+                for config in configurations]
+
+    model._predict_batch = predict_batch
+    model.build_lookup_table(state)
+    assert set(state.lookup_table) == {('grey', 'wide', True), ('grey', 'wide', False)}
+
+    # A configuration whose build failed is predicted live
+    model._state = state
+    live_calls = []
+    model._predict_live = lambda *args: live_calls.append(args) or []
+    assert model.predict('grey', 'wide', True) == [recommendation]
+    model.predict('white', 'wide', True)
+    assert live_calls == [('white', 'wide', True, state)]
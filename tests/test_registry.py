@@ -0,0 +1,20 @@
+import os
+
+from models import registry
+
+def write_nothing(directory):
+    pass
+
+def test_publish_prunes_to_the_newest_versions(tmp_path):
+    registry_dir = str(tmp_path)
+    versions = [registry.publish(registry_dir, write_nothing, {}, keep=3) for _ in range(5)]
+    assert [manifest['version'] for manifest in registry.list_versions(registry_dir)] == versions[-3:]
+    assert registry.current_version(registry_dir) == versions[-1]
+
+def test_prune_keeps_current(tmp_path):
+    registry_dir = str(tmp_path)
+    versions = [registry.publish(registry_dir, write_nothing, {}, keep=10) for _ in range(4)]
+    registry.set_current(registry_dir, versions[0])  # Rolled back
+
+    assert registry.prune(registry_dir, keep=2) == versions[1:2]
+    assert sorted(os.listdir(registry_dir)) == sorted([registry.CURRENT_FILE, versions[0], *versions[2:]])
@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+import shadow
+from models.recommendation_model import ProductRecommendationModel
+
+@pytest.fixture
+def live_pickles(tmp_path, monkeypatch):
+    """A working directory holding the live model's pickles but no compact forest"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('models')
+    for name in ('recommendation_model.pkl', 'encoders.pkl'):
+        open(os.path.join('models', name), 'wb').close()
+    return tmp_path
+
+def test_missing_candidate_is_never_converted_from_the_live_model(live_pickles, monkeypatch):
+    loads = []
+    monkeypatch.setattr(ProductRecommendationModel, 'load_model', lambda self: loads.append(self))
+    path = 'models/candidates/deeper.npz'
+    with pytest.raises(FileNotFoundError):
+        ProductRecommendationModel(train_if_missing=False, forest_path=path)
+    assert loads == []
+    assert not os.path.exists(path)
+    assert not os.path.exists('models/candidates')
+
+def test_missing_candidate_is_skipped(live_pickles, monkeypatch):
+    monkeypatch.setenv('SHADOW_MODEL_PATHS', 'deeper=models/candidates/deeper.npz')
+    assert shadow.load_shadow_evaluator() is None
+    assert not os.path.exists('models/candidates')
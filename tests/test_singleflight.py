@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from singleflight import AsyncSingleFlight, SingleFlight
+
+class Interrupted(BaseException):
+    pass
+
+def interrupt():
+    raise Interrupted()
+
+def test_result_is_shared_and_flight_cleared():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 42) == 42
+    assert flight.stats()['in_flight'] == 0
+
+def test_base_exception_clears_the_flight():
+    flight = SingleFlight()
+    call, _ = flight.begin('other')
+    with pytest.raises(Interrupted):
+        flight.do('key', interrupt)
+    assert flight.stats()['in_flight'] == 1  # Only 'other' is left
+    # A later caller leads a fresh flight instead of waiting on the dead one
+    assert flight.do('key', lambda: 'fresh') == 'fresh'
+    flight.finish('other', call)
+
+def test_follower_of_interrupted_leader_gets_an_error():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    outcomes = {}
+
+    def leader():
+        started.set()
+        release.wait()
+        raise Interrupted()
+
+    def run(name, func):
+        try:
+            outcomes[name] = flight.do('key', func)
+        except BaseException as e:
+            outcomes[name] = e
+
+    leader_thread = threading.Thread(target=run, args=('leader', leader))
+    leader_thread.start()
+    started.wait()
+    follower_thread = threading.Thread(target=run, args=('follower', lambda: 'unused'))
+    follower_thread.start()
+    while flight.stats()['coalesced'] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader_thread.join()
+    follower_thread.join()
+
+    assert isinstance(outcomes['leader'], Interrupted)
+    assert isinstance(outcomes['follower'], RuntimeError)
+    assert flight.stats()['in_flight'] == 0
+
+def test_async_cancelled_leader_clears_the_flight():
+    async def scenario():
+        flight = AsyncSingleFlight()
+        leader = asyncio.ensure_future(flight.do('key', lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        assert flight.stats()['in_flight'] == 0
+
+        async def fresh():
+            return 'fresh'
+        assert await flight.do('key', fresh) == 'fresh'
+
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+import app
+
+START = datetime(2026, 6, 1, 6)
+
+def forecast(days=7):
+    """A week of NWS periods, day and night, like the gridpoint forecast returns"""
+    periods = []
+    for i in range(days * 2):
+        start = START + timedelta(hours=12 * i)
+        periods.append({
+            'name': start.strftime('%A') + ('' if i % 2 == 0 else ' Night'),
+            'startTime': start.isoformat(),
+            'isDaytime': i % 2 == 0,
+            'temperature': 70,
+            'temperatureUnit': 'F',
+            'probabilityOfPrecipitation': {'value': 10},
+            'windSpeed': '5 mph',
+            'shortForecast': 'Sunny',
+            'detailedForecast': f"Period {i}."
+        })
+    return periods
+
+def test_rules_score_days_past_the_prompt_window():
+    periods = forecast()
+    delivery = START + timedelta(days=4)
+    result = app.rule_based_recommendation(periods, delivery, delivery + timedelta(days=1), delivery + timedelta(days=2))
+    assert "doesn't" not in result['recommendation']
+    assert delivery.strftime('%A, %B %d') in result['recommendation']
+
+def test_prompt_keeps_the_first_periods_only():
+    periods = forecast()
+    prompt = app.build_weather_prompt(periods, START, START, START)
+    assert f"Period {app.LLM_PROMPT_PERIODS - 1}." in prompt
+    assert f"Period {app.LLM_PROMPT_PERIODS}." not in prompt
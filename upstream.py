@@ -0,0 +1,172 @@
+"""
+Shared HTTP client for upstream services
+One pooled, keep-alive requests.Session per process with explicit timeouts and
+bounded exponential-backoff retries on connection errors, timeouts, 429 and 5xx
+responses, all inside an overall deadline per call. The ASGI app uses
+get_async(), the same policy on one aiohttp session per process.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+import metrics
+
+# (connect, read) timeouts in seconds
+CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '10'))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Retries for idempotent requests: waits of backoff * 2**n seconds, capped by Retry-After
+MAX_RETRIES = int(os.getenv('UPSTREAM_MAX_RETRIES', '2'))
+BACKOFF_FACTOR = float(os.getenv('UPSTREAM_BACKOFF_FACTOR', '0.5'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Longest Retry-After honored, so a request isn't parked for minutes
+MAX_RETRY_AFTER = 30
+
+# Seconds one call may take across every attempt and backoff wait. /configure makes
+# two NWS calls in sequence, and both must fit well inside gunicorn's 30s worker timeout.
+DEADLINE = float(os.getenv('UPSTREAM_DEADLINE', '8'))
+
+# Number of distinct hosts kept in the pool, and keep-alive connections per host
+POOL_HOSTS = 4
+POOL_CONNECTIONS_PER_HOST = int(os.getenv('UPSTREAM_POOL_SIZE', '10'))
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+def _build_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    # Retries are done by get() so they can respect the deadline
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_CONNECTIONS_PER_HOST
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """Return this process's shared session, creating it on first use and after a fork"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                # Sockets inherited from a parent process must not be reused
+                _session = _build_session()
+                _session_pid = os.getpid()
+    return _session
+
+def _attempt_timeout(timeout, expires):
+    """(connect, read) timeouts for one attempt, cut short by the time left before expires"""
+    connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+    remaining = max(expires - time.monotonic(), 0.01)
+    return min(connect_timeout, remaining), min(read_timeout, remaining)
+
+def _retry_delay(headers, attempt):
+    """Seconds to wait before retry number attempt + 1, honoring a numeric Retry-After"""
+    try:
+        return min(float(headers.get('Retry-After')), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return BACKOFF_FACTOR * 2 ** attempt
+
+def _can_retry(attempt, delay, expires):
+    """Whether another attempt is allowed and would still start before the deadline"""
+    return attempt < MAX_RETRIES and time.monotonic() + delay < expires
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, deadline=DEADLINE, **kwargs):
+    """GET through the pooled session with connect/read timeouts and retries
+
+    Every attempt and backoff wait fits inside deadline seconds. Failures left
+    after retrying are counted by host and status or exception type.
+    """
+    import requests
+
+    host = urlsplit(url).hostname
+    expires = time.monotonic() + deadline
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            response = get_session().get(url, headers=headers, timeout=_attempt_timeout(timeout, expires), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            delay = _retry_delay({}, attempt)
+            if not _can_retry(attempt, delay, expires):
+                metrics.UPSTREAM_ERRORS.labels(host, type(e).__name__).inc()
+                raise
+            time.sleep(delay)
+            continue
+        except Exception as e:
+            metrics.UPSTREAM_ERRORS.labels(host, type(e).__name__).inc()
+            raise
+
+        if response.status_code not in RETRY_STATUSES:
+            return response
+        delay = _retry_delay(response.headers, attempt)
+        if not _can_retry(attempt, delay, expires):
+            metrics.UPSTREAM_ERRORS.labels(host, str(response.status_code)).inc()
+            return response
+        response.close()
+        time.sleep(delay)
+
+# What get_async() returns: the parts of a response callers use, read before the
+# connection goes back to the pool. headers is case-insensitive.
+AsyncResponse = namedtuple('AsyncResponse', ['status_code', 'headers', 'text'])
+
+_async_session = None
+_async_session_key = None
+
+def get_async_session():
+    """Return this process's aiohttp session for the running event loop, creating it on first use"""
+    import asyncio
+    import aiohttp
+
+    global _async_session, _async_session_key
+    key = (os.getpid(), asyncio.get_running_loop())
+    if _async_session is None or _async_session_key != key or _async_session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=POOL_CONNECTIONS_PER_HOST, ttl_dns_cache=300)
+        _async_session = aiohttp.ClientSession(connector=connector)
+        _async_session_key = key
+    return _async_session
+
+async def close_async_session():
+    global _async_session
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+
+async def get_async(url, headers=None, timeout=DEFAULT_TIMEOUT, deadline=DEADLINE):
+    """Awaitable get() with the same timeouts, deadline, retries and error counting; returns an AsyncResponse"""
+    import asyncio
+    import aiohttp
+
+    host = urlsplit(url).hostname
+    expires = time.monotonic() + deadline
+    for attempt in range(MAX_RETRIES + 1):
+        connect_timeout, read_timeout = _attempt_timeout(timeout, expires)
+        client_timeout = aiohttp.ClientTimeout(
+            total=max(expires - time.monotonic(), 0.01), sock_connect=connect_timeout, sock_read=read_timeout
+        )
+        try:
+            async with get_async_session().get(url, headers=headers, timeout=client_timeout) as response:
+                result = AsyncResponse(response.status, response.headers, await response.text())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            delay = _retry_delay({}, attempt)
+            if not _can_retry(attempt, delay, expires):
+                metrics.UPSTREAM_ERRORS.labels(host, type(e).__name__).inc()
+                raise
+            await asyncio.sleep(delay)
+            continue
+
+        if result.status_code not in RETRY_STATUSES:
+            return result
+        delay = _retry_delay(result.headers, attempt)
+        if not _can_retry(attempt, delay, expires):
+            metrics.UPSTREAM_ERRORS.labels(host, str(result.status_code)).inc()
+            return result
+        await asyncio.sleep(delay)
@@ -0,0 +1,145 @@
+"""
+Rule-based installation day scoring
+Scores each delivery-day option from the structured NWS forecast periods and writes a
+templated recommendation paragraph, with no LLM round trip.
+"""
+
+import re
+from datetime import datetime
+
+# Words in shortForecast that make outdoor installation work unpleasant or unsafe
+BAD_WEATHER_WORDS = ('thunderstorm', 'storm', 'snow', 'sleet', 'freezing', 'ice', 'rain', 'showers', 'drizzle', 'fog')
+
+# Comfortable temperature range for installation work, in Fahrenheit
+MIN_COMFORTABLE_TEMP = 40
+MAX_COMFORTABLE_TEMP = 90
+
+# Wind speed (mph) above which working with a large door panel gets harder
+MAX_CALM_WIND = 10
+
+def _parse_wind_mph(wind_speed):
+    """Return the highest speed in an NWS windSpeed string such as '5 to 10 mph'"""
+    numbers = [int(n) for n in re.findall(r'\d+', str(wind_speed or ''))]
+    return max(numbers) if numbers else 0
+
+def _to_fahrenheit(temperature, unit):
+    if temperature is None:
+        return None
+    return temperature * 9 / 5 + 32 if unit == 'C' else temperature
+
+def parse_period(period):
+    """Extract the fields used for scoring from one NWS forecast period"""
+    precipitation = (period.get('probabilityOfPrecipitation') or {}).get('value')
+    return {
+        'name': period.get('name', ''),
+        'date': datetime.fromisoformat(period['startTime']).date(),
+        'is_daytime': bool(period.get('isDaytime')),
+        'temperature': _to_fahrenheit(period.get('temperature'), period.get('temperatureUnit', 'F')),
+        'precipitation': precipitation or 0,
+        'wind_mph': _parse_wind_mph(period.get('windSpeed')),
+        'short_forecast': period.get('shortForecast', '')
+    }
+
+def score_period(period):
+    """Score a parsed period from 0 (worst) to 100 (ideal installation weather)"""
+    score = 100.0
+    score -= 0.6 * period['precipitation']
+    score -= 2.0 * max(0, period['wind_mph'] - MAX_CALM_WIND)
+
+    temperature = period['temperature']
+    if temperature is not None:
+        if temperature < MIN_COMFORTABLE_TEMP:
+            score -= 1.5 * (MIN_COMFORTABLE_TEMP - temperature)
+        elif temperature > MAX_COMFORTABLE_TEMP:
+            score -= 1.5 * (temperature - MAX_COMFORTABLE_TEMP)
+
+    forecast = period['short_forecast'].lower()
+    if any(word in forecast for word in BAD_WEATHER_WORDS):
+        score -= 15
+    return max(0.0, min(100.0, score))
+
+def score_days(weather_data, dates):
+    """Score each date from its forecast periods
+
+    Installation happens during the day, so a date's daytime period is used
+    when there is one, otherwise its night period. Dates beyond the forecast
+    get no score.
+    """
+    by_date = {}
+    for period in weather_data:
+        try:
+            parsed = parse_period(period)
+        except (KeyError, TypeError, ValueError):
+            continue
+        by_date.setdefault(parsed['date'], []).append(parsed)
+
+    days = []
+    for date in dates:
+        periods = by_date.get(date.date() if isinstance(date, datetime) else date, [])
+        daytime = [p for p in periods if p['is_daytime']]
+        chosen = (daytime or periods or [None])[0]
+        days.append({
+            'date': date,
+            'period': chosen,
+            'score': score_period(chosen) if chosen else None
+        })
+    return days
+
+def _describe(period):
+    """Summarize a period's conditions in one clause"""
+    parts = []
+    if period['temperature'] is not None:
+        word = 'high' if period['is_daytime'] else 'low'
+        parts.append(f"a {word} near {period['temperature']:.0f}°F")
+    parts.append(f"a {period['precipitation']:.0f}% chance of precipitation")
+    parts.append(f"winds up to {period['wind_mph']} mph")
+    conditions = period['short_forecast'].lower() or 'as forecast'
+    return f"{conditions}, with " + ', '.join(parts[:-1]) + f" and {parts[-1]}"
+
+def recommend_installation_day(weather_data, delivery_date, delivery_plus_1, delivery_plus_2):
+    """Pick the best of the three installation days and write the recommendation paragraph
+
+    Returns the /configure weather fields plus the chosen date and per-day scores.
+    """
+    days = score_days(weather_data, [delivery_date, delivery_plus_1, delivery_plus_2])
+    scored = [day for day in days if day['score'] is not None]
+    scores = [
+        {'date': day['date'].strftime('%Y-%m-%d'), 'score': None if day['score'] is None else round(day['score'], 1)}
+        for day in days
+    ]
+
+    if not scored:
+        return {
+            'description': '',
+            'recommendation': (
+                f"For your garage door installation, the current forecast doesn't yet reach "
+                f"{delivery_date.strftime('%A, %B %d')}, so we recommend checking closer to delivery "
+                f"and scheduling installation on a clear day when possible."
+            ),
+            'best_date': None,
+            'scores': scores
+        }
+
+    # Highest score wins; ties go to the earliest date
+    best = max(scored, key=lambda day: (day['score'], -days.index(day)))
+    sentences = [
+        f"For your garage door installation, we recommend {best['date'].strftime('%A, %B %d')}.",
+        f"The forecast is {_describe(best['period'])}."
+    ]
+
+    others = [day for day in scored if day is not best]
+    if others:
+        worst = min(others, key=lambda day: day['score'])
+        if worst['score'] < best['score']:
+            sentences.append(
+                f"{worst['date'].strftime('%A')} looks less suitable: {_describe(worst['period'])}."
+            )
+    if len(scored) < len(days):
+        sentences.append("The forecast doesn't cover every installation option yet, so conditions may change.")
+
+    return {
+        'description': '',
+        'recommendation': ' '.join(sentences),
+        'best_date': best['date'].strftime('%Y-%m-%d'),
+        'scores': scores
+    }